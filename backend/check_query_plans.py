@@ -0,0 +1,118 @@
+"""查询计划检查：对各路由 / 服务的热点查询执行 EXPLAIN QUERY PLAN，
+出现全表扫描（SCAN 且未使用索引）、带 WHERE 的语句整段扫描普通索引（过滤条件没被索引覆盖，
+实际仍是逐行过滤；部分索引除外）或临时 B 树排序即视为回归，退出码非 0。tests/test_query_plans.py 在 pytest 里跑同一套检查。
+
+用法（在 backend 目录下）：python check_query_plans.py
+在临时目录建库，不会碰到正式数据库。检查的都是代码里实际执行的语句（各模块的 *_SQL 常量和 *_query 构造函数），
+不要在这里抄写 SQL；新增查询时先把它提成常量 / 构造函数，再加到 QUERIES 里。
+"""
+
+import asyncio
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+from itertools import product
+
+import database
+from routers import articles, hotspots, summaries, uploads, feynman, auth, custom_sources
+from services import search, retention, ingestion, bodies, llm_cache, source_health
+from config import RETENTION_POLICIES
+
+# (名称, SQL, 参数, 豁免)
+# 豁免 "全表"：整表列出的小配置表（订阅源、上传文件、源状态），本来就要读全部行；
+# 豁免 "排序"：全文搜索按相关度排序，只能对命中的行排序（命中行由 FTS 索引定位）
+QUERIES = [
+    *(
+        (f"文章列表 {c}/{t}/{s}{' 翻页' if cur else ''}", *articles.list_query(c, t, s, cur), None)
+        for c, t, s, cur in product(
+            ["全部", "科技"], ["全部", "文章"], ["全部", "未读", "已读"], [None, articles.encode_cursor("2025-01-01", 1)]
+        )
+    ),
+    ("文章详情", articles.DETAIL_SQL, (1,), None),
+    *(
+        (f"{name}{' 翻页' if cur else ''}", *articles.flag_query(flag, cur), None)
+        for (name, flag), cur in product(
+            [("收藏列表", "is_favorite"), ("稍后读列表", "read_later")], [None, articles.encode_cursor(100)]
+        )
+    ),
+    ("链接判重（含墓碑）", *ingestion.seen_keys_query(["a", "b"]), None),
+    *((f"保留策略 {name}", *retention.candidate_query(cond, days or 30), None) for name, cond, days in RETENTION_POLICIES),
+    ("墓碑过期", retention.TOMBSTONE_EXPIRE_SQL, ("2025-01-01",), None),
+    ("AI 缓存读取", llm_cache.GET_SQL, ("k", 0.0), None),
+    ("AI 缓存过期", llm_cache.PURGE_SQL, (0.0,), None),
+    ("指纹补算", ingestion.BACKFILL_SQL, (0, 500), None),
+    ("SimHash 候选", *ingestion.near_duplicate_query(0x123456789ABCDEF), None),
+    ("正文读取", bodies.GET_SQL, (bodies.ARTICLE, 1), None),
+    ("正文迁移", bodies.MIGRATE_SQL, (0, 500), None),
+    ("文章总结", summaries.LIST_SQL, (1,), None),
+    ("文件总结", uploads.SUMMARIES_SQL, (1,), None),
+    ("删除文件总结", uploads.DELETE_SUMMARIES_SQL, (1,), None),
+    *(
+        (f"热点列表 {p}/{c}", *hotspots.list_query(p, c), None)
+        for p, c in [("全部", "today"), ("知乎", "today"), ("全部", "classic")]
+    ),
+    ("热点评论", hotspots.COMMENTS_SQL, (1,), None),
+    ("评论回复校验", hotspots.COMMENT_IN_HOTSPOT_SQL, (1, 1), None),
+    ("费曼消息", feynman.MESSAGES_SQL, (1,), None),
+    ("费曼对话历史", feynman.HISTORY_SQL, (1,), None),
+    ("用户登录", auth.LOGIN_SQL, ("a@b.c",), None),
+    ("订阅源列表", custom_sources.LIST_SQL, (), "全表"),
+    ("上传文件列表", uploads.LIST_SQL, (), "全表"),
+    ("源健康度", source_health.LOAD_SQL, (), "全表"),
+    *(
+        (f"全文搜索 {kind or '全部'}{' 翻页' if after else ''}", *search.query('"金 融"', kind, after, 20), "排序")
+        for kind, after in product([None, "article"], [None, [-1.5, 100]])
+    ),
+]
+
+
+def partial_indexes(conn) -> set[str]:
+    """带 WHERE 的部分索引：只收录满足条件的行，按它顺序扫描本身就等于按条件过滤"""
+    rows = conn.execute("SELECT name FROM sqlite_master WHERE type='index' AND sql LIKE '% WHERE %'")
+    return {name for (name,) in rows}
+
+
+def problems(plan: list[str], allow: str | None, filtered: bool = False, partial: set[str] = frozenset()) -> list[str]:
+    """找出计划里的回归行。filtered 表示语句带 WHERE：此时按普通索引整段扫描（SCAN … USING INDEX）
+    只是借索引的顺序省掉排序，过滤条件仍要逐行判断，不满足的行多时同样是全表扫描，只有部分索引例外"""
+    bad = []
+    for detail in plan:
+        if detail.startswith("SCAN ") and "VIRTUAL TABLE INDEX" not in detail:
+            if "USING" not in detail:
+                bad.append(detail)
+            elif filtered and "INDEX" in detail and detail.split()[-1] not in partial:
+                bad.append(detail)
+        elif "USE TEMP B-TREE" in detail and allow != "排序":
+            bad.append(detail)
+    return bad
+
+
+def check(conn, sql: str, params, allow: str | None, partial: set[str]) -> tuple[list[str], list[str]]:
+    """返回 (查询计划, 有问题的行)"""
+    plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+    if allow == "全表":
+        return plan, []
+    return plan, problems(plan, allow, re.search(r"\bWHERE\b", sql, re.I) is not None, partial)
+
+
+def main() -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, "plans.db")
+        asyncio.run(database.init_db())
+        conn = sqlite3.connect(database.DB_PATH)
+        partial = partial_indexes(conn)
+        failed = 0
+        for name, sql, params, allow in QUERIES:
+            plan, bad = check(conn, sql, params, allow, partial)
+            mark = "FAIL" if bad else "ok  "
+            print(f"{mark} {name}: {' | '.join(plan)}")
+            failed += bool(bad)
+        conn.close()
+    print(f"\n{len(QUERIES)} 条查询，{failed} 条存在全表扫描、未覆盖过滤条件的索引扫描或临时排序")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
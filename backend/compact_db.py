@@ -0,0 +1,39 @@
+"""整理数据库文件，并把旧库切换为增量回收空间（auto_vacuum=INCREMENTAL）
+
+用法（停服后，在 backend 目录下）：python compact_db.py
+
+整库 VACUUM 会重写整个文件，期间数据库被独占，库大时要花一段时间，所以不在启动时自动执行。
+切换后，文章保留清理删除的空间会由 PRAGMA incremental_vacuum 分批还给文件系统（见 services/retention.py）。
+"""
+
+import os
+import sqlite3
+import sys
+
+from database import DB_PATH
+
+
+def main() -> int:
+    if not os.path.exists(DB_PATH):
+        print(f"数据库不存在：{DB_PATH}")
+        return 1
+    before = os.path.getsize(DB_PATH)
+    # VACUUM 不能在事务中执行，isolation_level=None 关闭自动开启事务
+    db = sqlite3.connect(DB_PATH, isolation_level=None)
+    try:
+        db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        print("整理数据库文件……")
+        db.execute("VACUUM")
+        mode = db.execute("PRAGMA auto_vacuum").fetchone()[0]
+    except sqlite3.OperationalError as e:
+        print(f"整理失败（服务是否仍在运行？）：{e}")
+        return 1
+    finally:
+        db.close()
+    after = os.path.getsize(DB_PATH)
+    print(f"完成：{before / 1024 / 1024:.1f} MB -> {after / 1024 / 1024:.1f} MB，增量回收空间{'已开启' if mode == 2 else '未开启'}")
+    return 0 if mode == 2 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -105,3 +105,120 @@ CATEGORIES = ["全部", "AI", "科技", "金融", "商业", "安全", "文化"]
 CONTENT_TYPES = ["全部", "文章", "简讯"]
 
 HOTSPOT_PLATFORMS = ["全部", "微博", "知乎", "小红书", "抖音"]
+
+# ===== 抓取引擎参数 =====
+HTTP_MAX_CONNECTIONS = 64       # 共享 HTTP 客户端总连接数
+HTTP_MAX_KEEPALIVE = 32         # 保持复用的空闲连接数
+FEED_CONCURRENCY = 16           # 同时抓取的 RSS 源数量上限
+FEED_TIMEOUT = 15.0             # 单个 RSS 源请求超时（秒）
+REFRESH_DEADLINE = 45.0         # 一次刷新的总时限（秒），超时未完成的源本轮放弃
+
+# ===== 后台轮询调度 =====
+SCHEDULER_TICK = 30             # 调度循环间隔（秒）
+SCHEDULER_MAX_PER_TICK = 24     # 每轮最多抓取的到期源数量，把负载摊开
+POLL_MIN_INTERVAL = 180         # 单源最短轮询间隔（秒）
+POLL_MAX_INTERVAL = 6 * 3600    # 单源最长轮询间隔（秒）
+POLL_DEFAULT_INTERVAL = {"简讯": 300, "文章": 3600}  # 按内容类型的初始间隔（秒）
+
+# ===== 入库 =====
+INGEST_CHUNK_SIZE = 500         # 批量写入时每个事务的最大行数
+
+# ===== 源健康度 / 熔断 =====
+HEALTH_FAILURE_THRESHOLD = 3    # 连续失败多少次后熔断
+HEALTH_BACKOFF_BASE = 600       # 首次熔断时长（秒），之后每多失败一次翻倍
+HEALTH_BACKOFF_MAX = 24 * 3600  # 熔断时长上限（秒）
+
+# ===== 全文预取 =====
+PREFETCH_WORKERS = 4            # 全文预取并发数
+PREFETCH_QUEUE_MAX = 2000       # 待预取队列上限，溢出的文章留给阅读时按需抓取
+
+# ===== 正文提取（独立进程池）=====
+EXTRACT_WORKERS = 2             # 提取进程数
+EXTRACT_CPU_TIMEOUT = 2.0       # 单个页面提取的 CPU 时间上限（秒）
+
+# ===== 全文下载 =====
+FULLTEXT_TIMEOUT = 12.0                 # 全文页面请求超时（秒）
+FULLTEXT_MAX_BYTES = 2 * 1024 * 1024    # 单个页面最多读取的字节数
+FULLTEXT_ENOUGH_BYTES = 200 * 1024      # 已收集到这么多 <p> 段落内容时提前停止读取
+
+# ===== 增量游标 =====
+FEED_MAX_ENTRIES = 50           # 每次轮询单个源最多入库的新条目数
+FEED_FIRST_POLL_ENTRIES = 10    # 首次抓取（尚无游标）时单个源入库的条目数
+
+# ===== 近似重复检测 =====
+SIMHASH_MAX_DISTANCE = 4        # SimHash 汉明距离不超过该值视为同一篇（分段索引保证 ≤4 不漏检）
+SIMHASH_MIN_TOKENS = 16         # 特征过少（如只有短标题）时不做近似判重，避免误伤
+
+# ===== 出站请求按站点限速（令牌桶）=====
+HOST_RATE = 1.0                 # 每个站点每秒补充的请求令牌数
+HOST_BURST = 4                  # 每个站点的令牌桶容量（允许的突发请求数）
+HOST_RATE_OVERRIDES = {         # 个别站点单独限速：host -> (rate, burst)
+    "rsshub.app": (0.5, 2),
+    "substack.com": (1.0, 2),
+}
+RETRY_AFTER_DEFAULT = 30.0      # 429/503 未给出 Retry-After 时的暂停时长（秒）
+RETRY_AFTER_MAX_WAIT = 20.0     # Retry-After 不超过该值时等待后重试一次，否则直接返回
+
+# ===== OPML 导入 =====
+OPML_VALIDATE_CONCURRENCY = 16  # 导入时并发校验的订阅数
+OPML_MAX_FEEDS = 1000           # 单个 OPML 文件最多导入的订阅数
+OPML_MAX_BYTES = 2 * 1024 * 1024
+
+# ===== SQLite 连接池 =====
+DB_POOL_SIZE = 8                        # 连接池大小
+DB_POOL_OVERFLOW = 8                    # 池借空时最多额外临时建的连接数
+DB_POOL_TIMEOUT = 10.0                  # 临时连接也用完时等待归还的时长（秒），超时返回 503
+DB_CACHE_SIZE_KB = 32 * 1024            # 每个连接的页缓存（KB）
+DB_MMAP_SIZE = 256 * 1024 * 1024        # 内存映射读取上限（字节）
+DB_BUSY_TIMEOUT_MS = 5000               # 写锁被占用时的等待时间（毫秒）
+
+# ===== 数据迁移 =====
+DATA_MIGRATION_BATCH = 500              # 每批处理行数（每批一个事务）
+DATA_MIGRATION_PAUSE = 0.05             # 批次间让出连接和写锁的间隔（秒）
+
+# ===== 文章列表分页 =====
+ARTICLE_PAGE_SIZE = 30                  # 默认每页条数
+ARTICLE_PAGE_MAX = 100                  # 每页条数上限
+LIST_SUMMARY_CHARS = 300                # 列表只返回摘要前若干字（卡片最多显示三行）
+
+# ===== 正文存储 =====
+BODY_COMPRESS_LEVEL = 6                 # zlib 压缩级别
+
+# ===== 全文搜索 =====
+SEARCH_BODY_CHARS = 20000               # 正文只索引前若干字（长文后半部分很少是检索目标）
+SEARCH_SNIPPET_TOKENS = 24              # 结果片段长度（词数，中文为字数）
+SEARCH_PAGE_SIZE = 20
+
+# ===== 文章状态写缓冲 =====
+STATE_FLUSH_INTERVAL = 0.5              # 已读 / 收藏 / 稍后读变更的合并写入间隔（秒）
+STATE_FLUSH_MAX_PENDING = 1000          # 缓冲的文章数达到该值时提前写入
+
+# ===== 文章保留 =====
+# (名称, 附加条件, 保留天数)：发布和入库都早于该天数的文章会被清理，天数为 None 表示不清理。
+# 默认全部不清理（删除的文章找不回来），需要时自行填天数开启，如未读 60、已读 180。
+# 收藏、稍后读、写过总结或做过费曼练习的文章不受任何策略影响
+RETENTION_POLICIES = [
+    ("未读", "is_read=0", None),
+    ("已读", "is_read=1", None),
+]
+RETENTION_INTERVAL = 6 * 3600           # 清理周期（秒）
+RETENTION_START_DELAY = 600             # 启动后首次清理的延迟（秒），避开启动时的抓取高峰
+RETENTION_BATCH = 200                   # 每批删除的文章数（每批一个事务）
+RETENTION_PAUSE = 0.05                  # 批次间让出写锁的间隔（秒）
+RETENTION_VACUUM_PAGES = 1024           # 每次增量回收的页数
+RETENTION_TOMBSTONE_DAYS = 365          # 墓碑保留天数（超过后源里一般也不会再出现该链接）
+
+# ===== AI 客户端 =====
+AI_MAX_CONNECTIONS = 20                 # 每个 (base_url, api_key) 客户端的最大连接数
+AI_MAX_KEEPALIVE = 10                   # 保持复用的空闲连接数
+AI_KEEPALIVE_EXPIRY = 120.0             # 空闲连接保留时长（秒），AI 请求间隔较长，比默认的 5 秒久
+AI_CONNECT_TIMEOUT = 10.0               # 建连超时（秒）
+AI_READ_TIMEOUT = 300.0                 # 请求超时（秒），长文翻译生成较慢
+AI_REQUEST_DEADLINE = 180.0             # 一次请求里并发的多路 AI 调用的总截止时间（秒）
+
+# ===== 流式生成 =====
+STREAM_SHUTDOWN_GRACE = 30.0            # 停机时等待进行中的流式生成写库的时长（秒）
+
+# ===== AI 响应缓存 =====
+LLM_CACHE_MEMORY_ITEMS = 256            # 进程内 LRU 条数
+LLM_CACHE_TTL_DAYS = 30                 # 库里缓存的有效期（天）
@@ -1,6 +1,14 @@
 import aiosqlite
+import asyncio
 import os
+import sqlite3
+from contextlib import asynccontextmanager
 from datetime import datetime
+from config import (
+    DB_POOL_SIZE, DB_POOL_OVERFLOW, DB_POOL_TIMEOUT, DB_CACHE_SIZE_KB, DB_MMAP_SIZE, DB_BUSY_TIMEOUT_MS,
+)
+from services.bodies import decompress
+from services.search import search_text
 
 DB_PATH = os.path.join(os.path.dirname(__file__), "talking_skills.db")
 
@@ -78,311 +86,731 @@ PYRAMID_CONTENT = """金字塔原理（The Pyramid Principle）是麦肯锡咨
 - 日常沟通：回答问题时先给答案
 """
 
-async def get_db():
+async def _register_functions(db: aiosqlite.Connection):
+    """注册触发器里用到的 SQL 函数（正文解压、搜索分词），每个连接都要注册"""
+    await db.create_function("body_text", 1, lambda data: decompress(data) if data is not None else None,
+                             deterministic=True)
+    await db.create_function("search_text", 1, search_text, deterministic=True)
+
+
+async def _open_connection() -> aiosqlite.Connection:
+    """新建连接并设置 PRAGMA：WAL 模式下读写互不阻塞，synchronous=NORMAL 减少 fsync"""
     db = await aiosqlite.connect(DB_PATH)
     db.row_factory = aiosqlite.Row
+    await _register_functions(db)
+    await db.execute("PRAGMA journal_mode=WAL")
+    await db.execute("PRAGMA synchronous=NORMAL")
+    await db.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}")
+    await db.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+    await db.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+    await db.execute("PRAGMA temp_store=MEMORY")
+    return db
+
+
+class PoolTimeout(Exception):
+    """连接池和临时连接都已用完，等待超时（main 中转成 503）"""
+
+
+class ConnectionPool:
+    """固定大小的 aiosqlite 连接池，连接在应用生命周期内复用"""
+
+    def __init__(self, size: int, overflow: int = 0, timeout: float = 0):
+        self._size = size
+        self._overflow_limit = overflow
+        self._timeout = timeout
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._all: list[aiosqlite.Connection] = []
+        self._overflow = 0   # 存活的临时连接数
+        self._waiting = 0    # 等待归还的借用者数
+
+    async def open(self):
+        for _ in range(self._size):
+            db = await _open_connection()
+            self._all.append(db)
+            self._idle.put_nowait(db)
+
+    async def acquire(self) -> aiosqlite.Connection:
+        """优先取空闲连接；池已借空时临时建连（最多 overflow 个，归还时关闭），
+        避免持有连接的请求再借连接（如读取 AI 配置）时互相等待；
+        临时连接也用完时等待归还，超过 timeout 秒抛 PoolTimeout"""
+        try:
+            return self._idle.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+        if self._overflow < self._overflow_limit:
+            self._overflow += 1
+            try:
+                return await _open_connection()
+            except BaseException:
+                self._overflow -= 1
+                raise
+        self._waiting += 1
+        try:
+            return await asyncio.wait_for(self._idle.get(), self._timeout)
+        except asyncio.TimeoutError:
+            raise PoolTimeout(f"数据库连接已用完（{self._size} + {self._overflow_limit}），等待 {self._timeout:g} 秒超时")
+        finally:
+            self._waiting -= 1
+
+    async def release(self, db: aiosqlite.Connection):
+        # 请求中途出错留下的未提交事务，归还前回滚
+        if db.in_transaction:
+            await db.rollback()
+        if db in self._all or self._waiting:
+            # 有人在等时临时连接也直接转交，不关了再建
+            self._idle.put_nowait(db)
+        else:
+            self._overflow -= 1
+            await db.close()
+
+    async def close(self):
+        # 空闲队列里可能还有转交出来的临时连接
+        while not self._idle.empty():
+            db = self._idle.get_nowait()
+            if db not in self._all:
+                await db.close()
+        for db in self._all:
+            await db.close()
+        self._all.clear()
+
+
+_pool: ConnectionPool | None = None
+
+
+async def init_pool():
+    """在 lifespan 中创建连接池（init_db 之后）"""
+    global _pool
+    if _pool is None:
+        _pool = ConnectionPool(DB_POOL_SIZE, DB_POOL_OVERFLOW, DB_POOL_TIMEOUT)
+        await _pool.open()
+
+
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+@asynccontextmanager
+async def connection():
+    """从连接池借一个连接；连接池未创建时（脚本、初始化阶段）临时建连"""
+    if _pool is None:
+        db = await _open_connection()
+        try:
+            yield db
+        finally:
+            await db.close()
+        return
+    db = await _pool.acquire()
     try:
         yield db
     finally:
-        await db.close()
+        await _pool.release(db)
+
+
+async def get_db():
+    """请求级连接：FastAPI 对同一请求内的同一依赖只求值一次，
+    路由和 get_current_user_optional 等子依赖拿到的是同一个连接"""
+    async with connection() as db:
+        yield db
+
+
+async def _execute_script(db, script: str):
+    """逐条执行多语句 SQL。executescript 会先隐式 COMMIT，不能用在迁移事务里"""
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            await db.execute(statement)
+            statement = ""
+
+
+async def _add_column(db, table: str, column: str, decl: str):
+    """列不存在时补列（老库从 user_version=0 升级时才会真正执行）"""
+    cursor = await db.execute(f"PRAGMA table_info({table})")
+    if column not in {row[1] for row in await cursor.fetchall()}:
+        await db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+async def _m001_base_tables(db):
+    """业务表（文章、总结、上传文件、热点、评论、费曼对话、订阅源、用户、AI 配置）"""
+    await _execute_script(db, """
+        CREATE TABLE IF NOT EXISTS articles (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            summary TEXT,
+            content TEXT,
+            translated_content TEXT,
+            link TEXT UNIQUE,
+            source TEXT,
+            category TEXT DEFAULT '科技',
+            content_type TEXT DEFAULT '文章',
+            published_at TEXT,
+            is_favorite INTEGER DEFAULT 0,
+            is_read INTEGER DEFAULT 0,
+            read_later INTEGER DEFAULT 0,
+            created_at TEXT DEFAULT (datetime('now', 'localtime'))
+        );
+
+        CREATE TABLE IF NOT EXISTS summaries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            article_id INTEGER,
+            original_text TEXT NOT NULL,
+            ai_optimized TEXT,
+            ai_direct TEXT,
+            created_at TEXT DEFAULT (datetime('now', 'localtime')),
+            FOREIGN KEY (article_id) REFERENCES articles(id)
+        );
+
+        CREATE TABLE IF NOT EXISTS uploaded_files (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            file_path TEXT,
+            file_type TEXT,
+            content TEXT,
+            ai_summary TEXT,
+            upload_at TEXT DEFAULT (datetime('now', 'localtime'))
+        );
+
+        CREATE TABLE IF NOT EXISTS file_summaries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            file_id INTEGER,
+            original_text TEXT NOT NULL,
+            ai_optimized TEXT,
+            ai_direct TEXT,
+            created_at TEXT DEFAULT (datetime('now', 'localtime')),
+            FOREIGN KEY (file_id) REFERENCES uploaded_files(id)
+        );
+
+        CREATE TABLE IF NOT EXISTS hotspots (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            content TEXT,
+            platform TEXT,
+            source TEXT,
+            image_url TEXT,
+            published_at TEXT,
+            created_at TEXT DEFAULT (datetime('now', 'localtime'))
+        );
+
+        CREATE TABLE IF NOT EXISTS comments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            hotspot_id INTEGER,
+            nickname TEXT DEFAULT '匿名用户',
+            content TEXT NOT NULL,
+            created_at TEXT DEFAULT (datetime('now', 'localtime')),
+            FOREIGN KEY (hotspot_id) REFERENCES hotspots(id)
+        );
+
+        CREATE TABLE IF NOT EXISTS feynman_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            file_id INTEGER,
+            article_id INTEGER,
+            created_at TEXT DEFAULT (datetime('now', 'localtime')),
+            FOREIGN KEY (file_id) REFERENCES uploaded_files(id),
+            FOREIGN KEY (article_id) REFERENCES articles(id)
+        );
+
+        CREATE TABLE IF NOT EXISTS feynman_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id INTEGER NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            created_at TEXT DEFAULT (datetime('now', 'localtime')),
+            FOREIGN KEY (session_id) REFERENCES feynman_sessions(id)
+        );
+
+        CREATE TABLE IF NOT EXISTS custom_sources (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            url TEXT UNIQUE NOT NULL,
+            name TEXT,
+            category TEXT DEFAULT '科技',
+            content_type TEXT DEFAULT '文章',
+            created_at TEXT DEFAULT (datetime('now', 'localtime'))
+        );
+
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT UNIQUE NOT NULL,
+            hashed_password TEXT NOT NULL,
+            nickname TEXT,
+            avatar_url TEXT,
+            is_admin BOOLEAN DEFAULT 0,
+            created_at TEXT DEFAULT (datetime('now', 'localtime'))
+        );
+
+        CREATE TABLE IF NOT EXISTS ai_config (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            api_key TEXT,
+            base_url TEXT,
+            model_name TEXT,
+            updated_at TEXT DEFAULT (datetime('now', 'localtime'))
+        );
+    """)
+    # 早期版本建的表缺这些列
+    for table, column, decl in [
+        ("articles", "translated_content", "TEXT"),
+        ("articles", "content_type", "TEXT DEFAULT '文章'"),
+        ("articles", "is_read", "INTEGER DEFAULT 0"),
+        ("articles", "read_later", "INTEGER DEFAULT 0"),
+        ("comments", "user_id", "INTEGER REFERENCES users(id)"),
+        ("comments", "likes", "INTEGER DEFAULT 0"),
+        ("comments", "parent_id", "INTEGER REFERENCES comments(id)"),
+        ("hotspots", "category", "TEXT DEFAULT 'today'"),
+    ]:
+        await _add_column(db, table, column, decl)
+
+
+async def _m002_fingerprints(db):
+    """文章指纹：归一化链接索引 + SimHash 分段索引（近似判重）；旧文章的指纹由数据迁移补算"""
+    await _add_column(db, "articles", "url_key", "TEXT")
+    await _add_column(db, "articles", "simhash", "INTEGER")
+    await _execute_script(db, """
+        CREATE INDEX IF NOT EXISTS idx_articles_url_key ON articles(url_key);
+
+        CREATE TABLE IF NOT EXISTS article_simhash_bands (
+            band INTEGER NOT NULL,
+            value INTEGER NOT NULL,
+            article_id INTEGER NOT NULL,
+            PRIMARY KEY (band, value, article_id)
+        ) WITHOUT ROWID;
+
+        CREATE INDEX IF NOT EXISTS idx_simhash_bands_article ON article_simhash_bands(article_id);
+
+        CREATE TRIGGER IF NOT EXISTS trg_articles_delete_bands AFTER DELETE ON articles BEGIN
+            DELETE FROM article_simhash_bands WHERE article_id = old.id;
+        END;
+    """)
+
+
+async def _m003_feed_states(db):
+    """RSS 源抓取状态表（条件请求：ETag / Last-Modified / 内容哈希；轮询间隔；增量游标）"""
+    await _execute_script(db, """
+        CREATE TABLE IF NOT EXISTS feed_states (
+            url TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            content_hash TEXT,
+            checked_at TEXT,
+            updated_at TEXT,
+            poll_interval INTEGER,
+            next_poll_at TEXT,
+            cursor_guid TEXT,
+            cursor_published TEXT
+        );
+    """)
+    for column, decl in [
+        ("poll_interval", "INTEGER"),
+        ("next_poll_at", "TEXT"),
+        ("cursor_guid", "TEXT"),
+        ("cursor_published", "TEXT"),
+    ]:
+        await _add_column(db, "feed_states", column, decl)
+
+
+async def _m004_source_health(db):
+    """RSS 源健康度表（成功/失败统计、耗时、熔断）"""
+    await _execute_script(db, """
+        CREATE TABLE IF NOT EXISTS source_health (
+            url TEXT PRIMARY KEY,
+            name TEXT,
+            success_count INTEGER DEFAULT 0,
+            failure_count INTEGER DEFAULT 0,
+            consecutive_failures INTEGER DEFAULT 0,
+            last_latency_ms INTEGER,
+            avg_latency_ms INTEGER,
+            last_error TEXT,
+            last_success_at TEXT,
+            last_failure_at TEXT,
+            circuit_open_until TEXT
+        );
+    """)
+
+
+async def _m005_indexes(db):
+    """二级索引：按各路由的实际查询设计（WHERE 等值列在前，ORDER BY 列在后，
+    id 是 rowid 别名、隐含在每个索引末尾），检查脚本见 check_query_plans.py"""
+    await _execute_script(db, """
+        CREATE INDEX IF NOT EXISTS idx_articles_published ON articles(published_at);
+        CREATE INDEX IF NOT EXISTS idx_articles_category_published ON articles(category, published_at);
+        CREATE INDEX IF NOT EXISTS idx_articles_type_published ON articles(content_type, published_at);
+        CREATE INDEX IF NOT EXISTS idx_articles_category_type_published
+            ON articles(category, content_type, published_at);
+        CREATE INDEX IF NOT EXISTS idx_articles_unread ON articles(published_at) WHERE is_read=0;
+        CREATE INDEX IF NOT EXISTS idx_articles_favorite ON articles(is_favorite) WHERE is_favorite=1;
+        CREATE INDEX IF NOT EXISTS idx_articles_read_later ON articles(read_later) WHERE read_later=1;
+
+        CREATE INDEX IF NOT EXISTS idx_summaries_article ON summaries(article_id);
+        CREATE INDEX IF NOT EXISTS idx_file_summaries_file ON file_summaries(file_id);
+        CREATE INDEX IF NOT EXISTS idx_comments_hotspot ON comments(hotspot_id);
+        CREATE INDEX IF NOT EXISTS idx_feynman_messages_session ON feynman_messages(session_id);
+        CREATE INDEX IF NOT EXISTS idx_hotspots_kind ON hotspots(IFNULL(category, 'today'));
+        CREATE INDEX IF NOT EXISTS idx_hotspots_kind_platform ON hotspots(IFNULL(category, 'today'), platform);
+    """)
+
+
+async def _m006_seed_data(db):
+    """示例资料、热点话题、经典辩题（老库可能已有，按数量判断）"""
+    cursor = await db.execute("SELECT COUNT(*) as cnt FROM uploaded_files")
+    row = await cursor.fetchone()
+    if row["cnt"] == 0:
+        await db.execute(
+            """INSERT INTO uploaded_files (title, filename, file_type, content, ai_summary, upload_at)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            (
+                "金字塔原理学习资料",
+                "pyramid_principle.txt",
+                "txt",
+                PYRAMID_CONTENT,
+                "金字塔原理是一种结论先行的结构化表达方法，核心是：先给出结论，再陈述支撑论据。四大原则：结论先行、以上统下、归类分组（MECE）、逻辑递进。适用于工作汇报、商业写作、演讲展示等场景，帮助表达更清晰、逻辑更严密。",
+                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            ),
+        )
+
+    # 初始化热点话题
+    cursor = await db.execute("SELECT COUNT(*) as cnt FROM hotspots")
+    row = await cursor.fetchone()
+    if row["cnt"] == 0:
+        hotspots = [
+            (
+                "2024年AI大模型年度回顾：谁赢了这场军备竞赛？",
+                "2024年是AI大模型爆发的关键年份。GPT-4、Claude 3、Gemini Ultra相继发布，国内百模大战也进入白热化阶段。智谱、百度、阿里、字节跳动纷纷推出自己的旗舰模型……",
+                "微博",
+                "科技日报",
+                None,
+                "2024-12-31",
+            ),
+            (
+                "年轻人为什么不爱上班了？",
+                "最近，一个关于「上班」的话题引发了广泛讨论。越来越多的年轻人表示，他们并非不想工作，而是不想「上班」——不想被固定的时间和地点束缚，不想在重复性劳动中消耗人生……",
+                "知乎",
+                "知乎热榜",
+                None,
+                "2025-01-15",
+            ),
+            (
+                "如何用500块钱过好一个月？真实记录",
+                "本月初立了个flag：用500块钱度过整个月。今天来分享一下我的具体规划和实操经验：早餐控制在5元以内，自己带饭，周末可以加餐……",
+                "小红书",
+                "生活记录",
+                None,
+                "2025-01-20",
+            ),
+            (
+                "2025年最值得期待的10款游戏盘点",
+                "2025年游戏阵容相当豪华！《黑神话：悟空》DLC确认、《GTA6》全球同步首发、《最终幻想XVII》正式公布……作为游戏爱好者，你最期待哪款？",
+                "抖音",
+                "游戏up主",
+                None,
+                "2025-01-10",
+            ),
+            (
+                "程序员35岁真的是坎吗？过来人亲身经历",
+                "作为一个刚过35岁的程序员，我来说说亲身经历。确实，这个年龄在求职市场上会面临更多挑战，但绝不是「进了保险箱就失业」……",
+                "知乎",
+                "知乎经验",
+                None,
+                "2025-02-01",
+            ),
+        ]
+        await db.executemany(
+            """INSERT INTO hotspots (title, content, platform, source, image_url, published_at)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            hotspots,
+        )
+
+    # 初始化经典辩题（category='classic'）
+    cursor = await db.execute("SELECT COUNT(*) as cnt FROM hotspots WHERE category='classic'")
+    row = await cursor.fetchone()
+    if row["cnt"] == 0:
+        classic_debates = [
+            (
+                "西红柿炒鸡蛋，到底放不放糖？",
+                "这是中国家庭餐桌上最激烈的争论之一。放糖派说：甜咸结合才是灵魂，少了糖就是失了魂。不放糖派说：放糖简直是暴殄天物，咸鲜才是正道。你家怎么做的？",
+                "经典辩题",
+                "别吵架精选",
+                None,
+                "永久有效",
+                "classic",
+            ),
+            (
+                "梅西和C罗，谁才是真正的足球之王？",
+                "这场争论持续了整整二十年，双方粉丝都有充足数据和荣誉支撑。梅西派：天赋、创造力、巴萨王朝。C罗派：进球数、自律、全面性。如果只能选一个，你选谁？理由呢？",
+                "经典辩题",
+                "别吵架精选",
+                None,
+                "永久有效",
+                "classic",
+            ),
+            (
+                "粽子到底是甜的香还是咸的香？",
+                "每年端午节，南北方必有一战。北方：放红枣、豆沙，甜粽才对。南方：猪肉、蛋黄、咸蛋，咸粽才是灵魂。还有无糖无盐纯白粽派……你站哪边？",
+                "经典辩题",
+                "别吵架精选",
+                None,
+                "永久有效",
+                "classic",
+            ),
+            (
+                "猫和狗，哪个更适合当宠物？",
+                "猫派：独立、不粘人、安静、优雅，养猫就是养了一个大爷。狗派：忠诚、热情、互动多，养狗是真朋友。你更偏向哪边？如果必须选一个，选什么？",
+                "经典辩题",
+                "别吵架精选",
+                None,
+                "永久有效",
+                "classic",
+            ),
+            (
+                "先有鸡还是先有蛋？2025年版争论",
+                "这道古老哲学题到今天依然争论不休。生物学家说：先有蛋，因为基因突变在蛋里。哲学家说：概念定义先于存在。民间说：你不吃饭，就别来烦我。你怎么看？能说清楚吗？",
+                "经典辩题",
+                "别吵架精选",
+                None,
+                "永久有效",
+                "classic",
+            ),
+            (
+                "早上起床：先穿上衣还是先穿裤子？",
+                "看似荒谬，实则是一道隐藏人格测试题。先穿裤子派：下半身稳定才有安全感。先穿上衣派：上半身是灵魂核心，要先保护。你的答案是什么？能给出有说服力的理由吗？",
+                "经典辩题",
+                "别吵架精选",
+                None,
+                "永久有效",
+                "classic",
+            ),
+            (
+                "火锅蘸料：油碟派 vs 芝麻酱派，谁才是正统？",
+                "重庆火锅圣地流行油碟+蒜泥+香菜。北京涮肉阵地坚守芝麻酱+韭菜花+腐乳。四川人说：不用油碟的都是异端。北京人说：火锅不配芝麻酱是犯罪。你选哪边？",
+                "经典辩题",
+                "别吵架精选",
+                None,
+                "永久有效",
+                "classic",
+            ),
+            (
+                "《哈利·波特》里，拿出魔杖是赫敏厉害，还是伏地魔厉害？",
+                "赫敏派：全书最强技能实体，几乎每次危机都靠她解决，战斗力碾压大部分成年巫师。伏地魔派：恐吓整个魔法世界二十年，打死直接对决，差距明显。你觉得谁魔法更强？",
+                "经典辩题",
+                "别吵架精选",
+                None,
+                "永久有效",
+                "classic",
+            ),
+        ]
+        await db.executemany(
+            """INSERT INTO hotspots (title, content, platform, source, image_url, published_at, category)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            classic_debates,
+        )
+
+
+async def _m007_data_migrations(db):
+    """分批数据迁移的进度表，见 services/data_migrations.py"""
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS data_migrations (
+            name TEXT PRIMARY KEY,
+            processed INTEGER DEFAULT 0,
+            started_at TEXT,
+            finished_at TEXT
+        )
+    """)
+
+
+async def _m008_bodies(db):
+    """正文独立存储（压缩），旧数据由数据迁移搬运，见 services/bodies.py"""
+    await _execute_script(db, """
+        CREATE TABLE IF NOT EXISTS bodies (
+            kind TEXT NOT NULL,
+            owner_id INTEGER NOT NULL,
+            data BLOB NOT NULL,
+            raw_size INTEGER NOT NULL,
+            PRIMARY KEY (kind, owner_id)
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_articles_inline_body ON articles(id)
+            WHERE content IS NOT NULL OR translated_content IS NOT NULL;
+
+        CREATE TRIGGER IF NOT EXISTS trg_articles_delete_bodies AFTER DELETE ON articles BEGIN
+            DELETE FROM bodies WHERE kind IN ('article', 'translation') AND owner_id = old.id;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_uploads_delete_bodies AFTER DELETE ON uploaded_files BEGIN
+            DELETE FROM bodies WHERE kind = 'upload' AND owner_id = old.id;
+        END;
+    """)
+
+
+async def _m009_search_index(db):
+    """全文搜索索引（FTS5）及同步触发器，已有数据由数据迁移补建索引，见 services/search.py；
+    数据迁移进度表增加游标列"""
+    await _add_column(db, "data_migrations", "cursor", "INTEGER DEFAULT 0")
+    await _execute_script(db, """
+        CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+            kind UNINDEXED, owner_id UNINDEXED, title, summary, body,
+            tokenize = 'unicode61 remove_diacritics 2'
+        );
+
+        CREATE TRIGGER IF NOT EXISTS trg_articles_search_insert AFTER INSERT ON articles BEGIN
+            INSERT INTO search_index (rowid, kind, owner_id, title, summary, body)
+            VALUES (new.id * 4 + 1, 'article', new.id,
+                    search_text(new.title), search_text(new.summary), search_text(new.content));
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_articles_search_update AFTER UPDATE OF title, summary ON articles BEGIN
+            UPDATE search_index SET title = search_text(new.title), summary = search_text(new.summary)
+            WHERE rowid = new.id * 4 + 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_articles_search_delete AFTER DELETE ON articles BEGIN
+            DELETE FROM search_index WHERE rowid = old.id * 4 + 1;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_uploads_search_insert AFTER INSERT ON uploaded_files BEGIN
+            INSERT INTO search_index (rowid, kind, owner_id, title, summary, body)
+            VALUES (new.id * 4 + 2, 'upload', new.id,
+                    search_text(new.title), search_text(new.ai_summary), search_text(new.content));
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_uploads_search_update AFTER UPDATE OF title, ai_summary ON uploaded_files BEGIN
+            UPDATE search_index SET title = search_text(new.title), summary = search_text(new.ai_summary)
+            WHERE rowid = new.id * 4 + 2;
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_uploads_search_delete AFTER DELETE ON uploaded_files BEGIN
+            DELETE FROM search_index WHERE rowid = old.id * 4 + 2;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_hotspots_search_insert AFTER INSERT ON hotspots BEGIN
+            INSERT INTO search_index (rowid, kind, owner_id, title, summary, body)
+            VALUES (new.id * 4 + 3, 'hotspot', new.id, search_text(new.title), NULL, search_text(new.content));
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_hotspots_search_update AFTER UPDATE OF title, content ON hotspots BEGIN
+            UPDATE search_index SET title = search_text(new.title), body = search_text(new.content)
+            WHERE rowid = new.id * 4 + 3;
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_hotspots_search_delete AFTER DELETE ON hotspots BEGIN
+            DELETE FROM search_index WHERE rowid = old.id * 4 + 3;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_bodies_search_insert AFTER INSERT ON bodies
+        WHEN new.kind IN ('article', 'upload') BEGIN
+            UPDATE search_index SET body = search_text(body_text(new.data))
+            WHERE rowid = new.owner_id * 4 + (CASE new.kind WHEN 'article' THEN 1 ELSE 2 END);
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_bodies_search_update AFTER UPDATE OF data ON bodies
+        WHEN new.kind IN ('article', 'upload') BEGIN
+            UPDATE search_index SET body = search_text(body_text(new.data))
+            WHERE rowid = new.owner_id * 4 + (CASE new.kind WHEN 'article' THEN 1 ELSE 2 END);
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_bodies_search_delete AFTER DELETE ON bodies
+        WHEN old.kind IN ('article', 'upload') BEGIN
+            UPDATE search_index SET body = NULL
+            WHERE rowid = old.owner_id * 4 + (CASE old.kind WHEN 'article' THEN 1 ELSE 2 END);
+        END;
+    """)
+
+
+async def _m010_retention(db):
+    """文章保留策略：被清理文章的墓碑（按归一化链接，防止重新入库），
+    以及判断文章是否被引用（费曼练习）所需的索引，见 services/retention.py"""
+    await _execute_script(db, """
+        CREATE TABLE IF NOT EXISTS article_tombstones (
+            url_key TEXT PRIMARY KEY,
+            deleted_at TEXT NOT NULL
+        ) WITHOUT ROWID;
+
+        CREATE INDEX IF NOT EXISTS idx_article_tombstones_deleted ON article_tombstones(deleted_at);
+        CREATE INDEX IF NOT EXISTS idx_feynman_sessions_article ON feynman_sessions(article_id);
+    """)
+
+
+async def _m011_llm_cache(db):
+    """AI 响应缓存（压缩存储，过期时间为时间戳），见 services/llm_cache.py"""
+    await _execute_script(db, """
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            key TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            data BLOB NOT NULL,
+            created_at REAL NOT NULL,
+            expires_at REAL NOT NULL
+        ) WITHOUT ROWID;
+
+        CREATE INDEX IF NOT EXISTS idx_llm_cache_expires ON llm_cache(expires_at);
+    """)
+
+
+async def _m012_read_index(db):
+    """“已读”列表的部分索引：之前只有未读有，已读列表只能沿 idx_articles_published 逐行过滤，
+    未读占多数时每页都要走过几乎整张表"""
+    await _execute_script(db, """
+        CREATE INDEX IF NOT EXISTS idx_articles_read ON articles(published_at) WHERE is_read=1;
+    """)
+
+
+# 结构迁移：按版本号顺序执行，已执行到的版本记在 PRAGMA user_version。
+# 只能在末尾追加新步骤，不要修改已发布的步骤
+MIGRATIONS = [
+    (1, "基础表", _m001_base_tables),
+    (2, "文章指纹", _m002_fingerprints),
+    (3, "源抓取状态", _m003_feed_states),
+    (4, "源健康度", _m004_source_health),
+    (5, "二级索引", _m005_indexes),
+    (6, "初始数据", _m006_seed_data),
+    (7, "数据迁移进度表", _m007_data_migrations),
+    (8, "正文独立存储", _m008_bodies),
+    (9, "全文搜索索引", _m009_search_index),
+    (10, "文章保留策略", _m010_retention),
+    (11, "AI 响应缓存", _m011_llm_cache),
+    (12, "已读列表索引", _m012_read_index),
+]
+
+
+async def schema_version(db) -> int:
+    cursor = await db.execute("PRAGMA user_version")
+    return (await cursor.fetchone())[0]
+
+
+async def migrate(db) -> list[int]:
+    """执行未完成的结构迁移，每步一个事务，返回本次执行的版本号
+
+    多个 worker 同时启动时，BEGIN IMMEDIATE 拿到写锁后再确认一次版本号，已被别的进程执行的步骤跳过
+    """
+    applied = []
+    if await schema_version(db) >= MIGRATIONS[-1][0]:
+        return applied
+    for version, name, step in MIGRATIONS:
+        await db.execute("BEGIN IMMEDIATE")
+        try:
+            if await schema_version(db) >= version:
+                await db.rollback()
+                continue
+            await step(db)
+            await db.execute(f"PRAGMA user_version={version}")
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        applied.append(version)
+        print(f"[数据库] 迁移 {version}：{name}")
+    return applied
+
+
+async def _enable_incremental_vacuum(db):
+    """auto_vacuum 设为 INCREMENTAL：删除留下的空闲页由 PRAGMA incremental_vacuum 分批归还给文件系统。
+    只有新库（建表前）在这里设置；已有的库切换要整库 VACUUM，会独占并重写整个文件，
+    库大时启动要卡很久，所以不在启动时做，由 compact_db.py 停服后执行"""
+    cursor = await db.execute("PRAGMA auto_vacuum")
+    if (await cursor.fetchone())[0] == 2:
+        return
+    cursor = await db.execute("SELECT COUNT(*) FROM sqlite_master")
+    if (await cursor.fetchone())[0]:
+        print("[数据库] 未开启增量回收空间，清理出的空间不会还给文件系统；可停服后运行 python compact_db.py")
+        return
+    await db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+
 
 async def init_db():
     async with aiosqlite.connect(DB_PATH) as db:
         db.row_factory = aiosqlite.Row
-        await db.executescript("""
-            CREATE TABLE IF NOT EXISTS articles (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                summary TEXT,
-                content TEXT,
-                translated_content TEXT,
-                link TEXT UNIQUE,
-                source TEXT,
-                category TEXT DEFAULT '科技',
-                content_type TEXT DEFAULT '文章',
-                published_at TEXT,
-                is_favorite INTEGER DEFAULT 0,
-                is_read INTEGER DEFAULT 0,
-                read_later INTEGER DEFAULT 0,
-                created_at TEXT DEFAULT (datetime('now', 'localtime'))
-            );
-
-            CREATE TABLE IF NOT EXISTS summaries (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                article_id INTEGER,
-                original_text TEXT NOT NULL,
-                ai_optimized TEXT,
-                ai_direct TEXT,
-                created_at TEXT DEFAULT (datetime('now', 'localtime')),
-                FOREIGN KEY (article_id) REFERENCES articles(id)
-            );
-
-            CREATE TABLE IF NOT EXISTS uploaded_files (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                filename TEXT NOT NULL,
-                file_path TEXT,
-                file_type TEXT,
-                content TEXT,
-                ai_summary TEXT,
-                upload_at TEXT DEFAULT (datetime('now', 'localtime'))
-            );
-
-            CREATE TABLE IF NOT EXISTS file_summaries (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                file_id INTEGER,
-                original_text TEXT NOT NULL,
-                ai_optimized TEXT,
-                ai_direct TEXT,
-                created_at TEXT DEFAULT (datetime('now', 'localtime')),
-                FOREIGN KEY (file_id) REFERENCES uploaded_files(id)
-            );
-
-            CREATE TABLE IF NOT EXISTS hotspots (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                content TEXT,
-                platform TEXT,
-                source TEXT,
-                image_url TEXT,
-                published_at TEXT,
-                created_at TEXT DEFAULT (datetime('now', 'localtime'))
-            );
-
-            CREATE TABLE IF NOT EXISTS comments (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                hotspot_id INTEGER,
-                nickname TEXT DEFAULT '匿名用户',
-                content TEXT NOT NULL,
-                created_at TEXT DEFAULT (datetime('now', 'localtime')),
-                FOREIGN KEY (hotspot_id) REFERENCES hotspots(id)
-            );
-
-            CREATE TABLE IF NOT EXISTS feynman_sessions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                file_id INTEGER,
-                article_id INTEGER,
-                created_at TEXT DEFAULT (datetime('now', 'localtime')),
-                FOREIGN KEY (file_id) REFERENCES uploaded_files(id),
-                FOREIGN KEY (article_id) REFERENCES articles(id)
-            );
-
-            CREATE TABLE IF NOT EXISTS feynman_messages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_id INTEGER NOT NULL,
-                role TEXT NOT NULL,
-                content TEXT NOT NULL,
-                created_at TEXT DEFAULT (datetime('now', 'localtime')),
-                FOREIGN KEY (session_id) REFERENCES feynman_sessions(id)
-            );
-        """)
-        await db.commit()
-
-        # 迁移：添加列（如果不存在）
-        for col_def in [
-            "ALTER TABLE articles ADD COLUMN translated_content TEXT",
-            "ALTER TABLE articles ADD COLUMN content_type TEXT DEFAULT '文章'",
-            "ALTER TABLE articles ADD COLUMN is_read INTEGER DEFAULT 0",
-            "ALTER TABLE articles ADD COLUMN read_later INTEGER DEFAULT 0",
-            "ALTER TABLE comments ADD COLUMN user_id INTEGER REFERENCES users(id)",
-            "ALTER TABLE comments ADD COLUMN likes INTEGER DEFAULT 0",
-            "ALTER TABLE comments ADD COLUMN parent_id INTEGER REFERENCES comments(id)",
-            "ALTER TABLE hotspots ADD COLUMN category TEXT DEFAULT 'today'",
-        ]:
-            try:
-                await db.execute(col_def)
-                await db.commit()
-            except Exception:
-                pass  # 列已存在，忽略
-
-
-        # 用户自定义 RSS 源表
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS custom_sources (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                url TEXT UNIQUE NOT NULL,
-                name TEXT,
-                category TEXT DEFAULT '科技',
-                content_type TEXT DEFAULT '文章',
-                created_at TEXT DEFAULT (datetime('now', 'localtime'))
-            )
-        """)
-
-        # 用户表
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                email TEXT UNIQUE NOT NULL,
-                hashed_password TEXT NOT NULL,
-                nickname TEXT,
-                avatar_url TEXT,
-                is_admin BOOLEAN DEFAULT 0,
-                created_at TEXT DEFAULT (datetime('now', 'localtime'))
-            )
-        """)
-
-        # AI 配置表
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS ai_config (
-                id INTEGER PRIMARY KEY CHECK (id = 1),
-                api_key TEXT,
-                base_url TEXT,
-                model_name TEXT,
-                updated_at TEXT DEFAULT (datetime('now', 'localtime'))
-            )
-        """)
-        await db.commit()
-
-        cursor = await db.execute("SELECT COUNT(*) as cnt FROM uploaded_files")
-        row = await cursor.fetchone()
-        if row["cnt"] == 0:
-            await db.execute(
-                """INSERT INTO uploaded_files (title, filename, file_type, content, ai_summary, upload_at)
-                   VALUES (?, ?, ?, ?, ?, ?)""",
-                (
-                    "金字塔原理学习资料",
-                    "pyramid_principle.txt",
-                    "txt",
-                    PYRAMID_CONTENT,
-                    "金字塔原理是一种结论先行的结构化表达方法，核心是：先给出结论，再陈述支撑论据。四大原则：结论先行、以上统下、归类分组（MECE）、逻辑递进。适用于工作汇报、商业写作、演讲展示等场景，帮助表达更清晰、逻辑更严密。",
-                    datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                ),
-            )
-
-        # 初始化热点话题
-        cursor = await db.execute("SELECT COUNT(*) as cnt FROM hotspots")
-        row = await cursor.fetchone()
-        if row["cnt"] == 0:
-            hotspots = [
-                (
-                    "2024年AI大模型年度回顾：谁赢了这场军备竞赛？",
-                    "2024年是AI大模型爆发的关键年份。GPT-4、Claude 3、Gemini Ultra相继发布，国内百模大战也进入白热化阶段。智谱、百度、阿里、字节跳动纷纷推出自己的旗舰模型……",
-                    "微博",
-                    "科技日报",
-                    None,
-                    "2024-12-31",
-                ),
-                (
-                    "年轻人为什么不爱上班了？",
-                    "最近，一个关于「上班」的话题引发了广泛讨论。越来越多的年轻人表示，他们并非不想工作，而是不想「上班」——不想被固定的时间和地点束缚，不想在重复性劳动中消耗人生……",
-                    "知乎",
-                    "知乎热榜",
-                    None,
-                    "2025-01-15",
-                ),
-                (
-                    "如何用500块钱过好一个月？真实记录",
-                    "本月初立了个flag：用500块钱度过整个月。今天来分享一下我的具体规划和实操经验：早餐控制在5元以内，自己带饭，周末可以加餐……",
-                    "小红书",
-                    "生活记录",
-                    None,
-                    "2025-01-20",
-                ),
-                (
-                    "2025年最值得期待的10款游戏盘点",
-                    "2025年游戏阵容相当豪华！《黑神话：悟空》DLC确认、《GTA6》全球同步首发、《最终幻想XVII》正式公布……作为游戏爱好者，你最期待哪款？",
-                    "抖音",
-                    "游戏up主",
-                    None,
-                    "2025-01-10",
-                ),
-                (
-                    "程序员35岁真的是坎吗？过来人亲身经历",
-                    "作为一个刚过35岁的程序员，我来说说亲身经历。确实，这个年龄在求职市场上会面临更多挑战，但绝不是「进了保险箱就失业」……",
-                    "知乎",
-                    "知乎经验",
-                    None,
-                    "2025-02-01",
-                ),
-            ]
-            await db.executemany(
-                """INSERT INTO hotspots (title, content, platform, source, image_url, published_at)
-                   VALUES (?, ?, ?, ?, ?, ?)""",
-                hotspots,
-            )
-        await db.commit()
-
-        # 初始化经典辩题（category='classic'）
-        cursor = await db.execute("SELECT COUNT(*) as cnt FROM hotspots WHERE category='classic'")
-        row = await cursor.fetchone()
-        if row["cnt"] == 0:
-            classic_debates = [
-                (
-                    "西红柿炒鸡蛋，到底放不放糖？",
-                    "这是中国家庭餐桌上最激烈的争论之一。放糖派说：甜咸结合才是灵魂，少了糖就是失了魂。不放糖派说：放糖简直是暴殄天物，咸鲜才是正道。你家怎么做的？",
-                    "经典辩题",
-                    "别吵架精选",
-                    None,
-                    "永久有效",
-                    "classic",
-                ),
-                (
-                    "梅西和C罗，谁才是真正的足球之王？",
-                    "这场争论持续了整整二十年，双方粉丝都有充足数据和荣誉支撑。梅西派：天赋、创造力、巴萨王朝。C罗派：进球数、自律、全面性。如果只能选一个，你选谁？理由呢？",
-                    "经典辩题",
-                    "别吵架精选",
-                    None,
-                    "永久有效",
-                    "classic",
-                ),
-                (
-                    "粽子到底是甜的香还是咸的香？",
-                    "每年端午节，南北方必有一战。北方：放红枣、豆沙，甜粽才对。南方：猪肉、蛋黄、咸蛋，咸粽才是灵魂。还有无糖无盐纯白粽派……你站哪边？",
-                    "经典辩题",
-                    "别吵架精选",
-                    None,
-                    "永久有效",
-                    "classic",
-                ),
-                (
-                    "猫和狗，哪个更适合当宠物？",
-                    "猫派：独立、不粘人、安静、优雅，养猫就是养了一个大爷。狗派：忠诚、热情、互动多，养狗是真朋友。你更偏向哪边？如果必须选一个，选什么？",
-                    "经典辩题",
-                    "别吵架精选",
-                    None,
-                    "永久有效",
-                    "classic",
-                ),
-                (
-                    "先有鸡还是先有蛋？2025年版争论",
-                    "这道古老哲学题到今天依然争论不休。生物学家说：先有蛋，因为基因突变在蛋里。哲学家说：概念定义先于存在。民间说：你不吃饭，就别来烦我。你怎么看？能说清楚吗？",
-                    "经典辩题",
-                    "别吵架精选",
-                    None,
-                    "永久有效",
-                    "classic",
-                ),
-                (
-                    "早上起床：先穿上衣还是先穿裤子？",
-                    "看似荒谬，实则是一道隐藏人格测试题。先穿裤子派：下半身稳定才有安全感。先穿上衣派：上半身是灵魂核心，要先保护。你的答案是什么？能给出有说服力的理由吗？",
-                    "经典辩题",
-                    "别吵架精选",
-                    None,
-                    "永久有效",
-                    "classic",
-                ),
-                (
-                    "火锅蘸料：油碟派 vs 芝麻酱派，谁才是正统？",
-                    "重庆火锅圣地流行油碟+蒜泥+香菜。北京涮肉阵地坚守芝麻酱+韭菜花+腐乳。四川人说：不用油碟的都是异端。北京人说：火锅不配芝麻酱是犯罪。你选哪边？",
-                    "经典辩题",
-                    "别吵架精选",
-                    None,
-                    "永久有效",
-                    "classic",
-                ),
-                (
-                    "《哈利·波特》里，拿出魔杖是赫敏厉害，还是伏地魔厉害？",
-                    "赫敏派：全书最强技能实体，几乎每次危机都靠她解决，战斗力碾压大部分成年巫师。伏地魔派：恐吓整个魔法世界二十年，打死直接对决，差距明显。你觉得谁魔法更强？",
-                    "经典辩题",
-                    "别吵架精选",
-                    None,
-                    "永久有效",
-                    "classic",
-                ),
-            ]
-            await db.executemany(
-                """INSERT INTO hotspots (title, content, platform, source, image_url, published_at, category)
-                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
-                classic_debates,
-            )
-        await db.commit()
+        await _register_functions(db)
+        await db.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+        await _enable_incremental_vacuum(db)
+        await migrate(db)
@@ -1,14 +1,34 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
-from database import init_db
-from routers import articles, summaries, uploads, feynman, hotspots, settings, custom_sources, auth
+from database import init_db, init_pool, close_pool, PoolTimeout
+from services import (
+    http_client, scheduler, prefetch, extraction, data_migrations, article_state, retention, ai_service, streaming,
+)
+from routers import articles, summaries, uploads, feynman, hotspots, settings, custom_sources, auth, system, search
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_db()
+    await init_pool()
+    data_migrations.start()
+    article_state.start()
+    prefetch.start()
+    scheduler.start()
+    retention.start()
     yield
+    await retention.stop()
+    await scheduler.stop()
+    await prefetch.stop()
+    await data_migrations.stop()
+    await article_state.stop()
+    await streaming.stop()
+    await http_client.close_client()
+    await ai_service.close_clients()
+    extraction.shutdown()
+    await close_pool()
 
 
 app = FastAPI(title="Talking Skills API", lifespan=lifespan)
@@ -22,6 +42,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(PoolTimeout)
+async def pool_timeout_handler(request: Request, exc: PoolTimeout):
+    return JSONResponse(status_code=503, content={"detail": "服务繁忙，请稍后再试"}, headers={"Retry-After": "1"})
+
+
 app.include_router(articles.router)
 app.include_router(summaries.router)
 app.include_router(uploads.router)
@@ -30,6 +55,8 @@ app.include_router(hotspots.router)
 app.include_router(settings.router)
 app.include_router(custom_sources.router)
 app.include_router(auth.router)
+app.include_router(system.router)
+app.include_router(search.router)
 
 
 @app.get("/")
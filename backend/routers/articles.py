@@ -1,19 +1,52 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 import aiosqlite
-from database import get_db
-from services import rss_service
+import base64
+import json
+import time
+from database import get_db, connection
+from services import rss_service, scheduler, prefetch, bodies, article_state, retention, streaming
+from config import ARTICLE_PAGE_SIZE, ARTICLE_PAGE_MAX, LIST_SUMMARY_CHARS
 
 router = APIRouter(prefix="/api/articles", tags=["articles"])
 
+DETAIL_SQL = "SELECT * FROM articles WHERE id=?"
 
-@router.get("")
-async def get_articles(
-    category: str = "全部",
-    content_type: str = "全部",
-    status: str = "全部",  # 全部/未读/已读
-    db: aiosqlite.Connection = Depends(get_db)
-):
-    """获取文章列表，支持三维度筛选（话题分类 + 内容类型 + 阅读状态）"""
+
+# 列表只返回卡片用到的列，正文 / 译文只从详情接口取
+LIST_COLUMNS = (
+    f"id, title, substr(summary, 1, {LIST_SUMMARY_CHARS}) AS summary, source, category, content_type, "
+    "published_at, is_favorite, is_read, read_later"
+)
+
+
+def encode_cursor(*key) -> str:
+    """把排序键编码成不透明的翻页游标"""
+    return base64.urlsafe_b64encode(json.dumps(key, ensure_ascii=False).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        key = None
+    if not isinstance(key, list) or len(key) != size:
+        raise HTTPException(status_code=400, detail="cursor 无效")
+    return key
+
+
+def _page(rows, limit: int, key) -> dict:
+    """多查一行判断是否还有下一页；已读 / 收藏等状态叠加未落库的变更"""
+    items = [article_state.overlay(dict(row)) for row in rows[:limit]]
+    next_cursor = encode_cursor(*key(items[-1])) if len(rows) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def list_query(
+    category: str, content_type: str, status: str, cursor: str | None = None, limit: int = ARTICLE_PAGE_SIZE
+) -> tuple[str, list]:
+    """文章列表 SQL，按 (published_at, id) 倒序键集分页
+    （check_query_plans.py 也用它检查各筛选组合的查询计划）"""
     conditions = []
     params = []
     if category != "全部":
@@ -22,98 +55,145 @@ async def get_articles(
     if content_type != "全部":
         conditions.append("content_type=?")
         params.append(content_type)
-    
+
     if status == "未读":
         conditions.append("is_read=0")
     elif status == "已读":
         conditions.append("is_read=1")
 
+    if cursor:
+        conditions.append("(published_at, id) < (?, ?)")
+        params.extend(decode_cursor(cursor, 2))
+
     where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
-    cursor = await db.execute(
-        f"SELECT * FROM articles {where} ORDER BY published_at DESC, id DESC LIMIT 150",
-        params,
-    )
+    params.append(limit + 1)
+    return f"SELECT {LIST_COLUMNS} FROM articles {where} ORDER BY published_at DESC, id DESC LIMIT ?", params
+
+
+def flag_query(flag: str, cursor: str | None = None, limit: int = ARTICLE_PAGE_SIZE) -> tuple[str, list]:
+    """收藏 / 稍后读列表 SQL，按 id 倒序键集分页"""
+    conditions = [f"{flag}=1"]
+    params = []
+    if cursor:
+        conditions.append("id < ?")
+        params.extend(decode_cursor(cursor, 1))
+    params.append(limit + 1)
+    return f"SELECT {LIST_COLUMNS} FROM articles WHERE {' AND '.join(conditions)} ORDER BY id DESC LIMIT ?", params
+
+
+@router.get("")
+async def get_articles(
+    category: str = "全部",
+    content_type: str = "全部",
+    status: str = "全部",  # 全部/未读/已读
+    cursor: str | None = None,
+    limit: int = Query(ARTICLE_PAGE_SIZE, ge=1, le=ARTICLE_PAGE_MAX),
+    db: aiosqlite.Connection = Depends(get_db)
+):
+    """获取文章列表，支持三维度筛选（话题分类 + 内容类型 + 阅读状态）
+
+    返回 {"items", "next_cursor"}，把 next_cursor 原样传回即可取下一页，为 null 表示没有更多
+    """
+    if status != "全部" and article_state.has_pending("is_read"):
+        await article_state.flush()
+    sql, params = list_query(category, content_type, status, cursor, limit)
+    cursor = await db.execute(sql, params)
     rows = await cursor.fetchall()
-    return [dict(row) for row in rows]
+    return _page(rows, limit, lambda a: (a["published_at"], a["id"]))
 
 
 @router.post("/refresh")
-async def refresh_articles(db: aiosqlite.Connection = Depends(get_db)):
-    # 合并用户自定义来源
-    cursor = await db.execute("SELECT url, name, category, content_type FROM custom_sources")
-    custom_rows = await cursor.fetchall()
-    extra_sources = [dict(r) for r in custom_rows]
-    # extra_sources 里的 key 和 RSS_SOURCES 一致，type 字段用 content_type 代替
-    for s in extra_sources:
-        s["type"] = s.pop("content_type", "文章")
-
-    articles = await rss_service.fetch_all_articles(extra_sources=extra_sources)
-    added = 0
-    for a in articles:
-        try:
-            await db.execute(
-                """INSERT OR IGNORE INTO articles
-                   (title, summary, content, link, source, category, content_type, published_at)
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-                (a["title"], a["summary"], a["content"], a["link"],
-                 a["source"], a["category"], a.get("content_type", "文章"), a["published_at"]),
-            )
-            added += 1
-        except Exception:
-            pass
-    await db.commit()
-    return {"message": "内容已更新", "added": added}
+async def refresh_articles():
+    """触发后台立即轮询全部源，不等待抓取完成"""
+    if not scheduler.poll_now():
+        raise HTTPException(status_code=503, detail="后台抓取服务未启动")
+    return {"message": "已开始更新，新内容稍后出现", **scheduler.status()}
 
 
-@router.get("/favorites")
-async def get_favorites(db: aiosqlite.Connection = Depends(get_db)):
-    cursor = await db.execute(
-        "SELECT * FROM articles WHERE is_favorite=1 ORDER BY id DESC"
+@router.get("/refresh/stream")
+async def refresh_articles_stream():
+    """立即抓取全部源，逐源入库并以 SSE 推送进度（按完成顺序）
+
+    事件：source —— {source, url, added, latency_ms, error}；done —— {sources, added, elapsed_ms}
+    """
+    async def event_stream():
+        start = time.perf_counter()
+        sources = added = 0
+        async for result in scheduler.iter_poll(force=True):
+            sources += 1
+            added += result["added"]
+            yield f"event: source\ndata: {json.dumps(result, ensure_ascii=False)}\n\n"
+        elapsed_ms = int((time.perf_counter() - start) * 1000)
+        done = {"sources": sources, "added": added, "elapsed_ms": elapsed_ms}
+        yield f"event: done\ndata: {json.dumps(done)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
+
+
+@router.get("/favorites")
+async def get_favorites(
+    cursor: str | None = None,
+    limit: int = Query(ARTICLE_PAGE_SIZE, ge=1, le=ARTICLE_PAGE_MAX),
+    db: aiosqlite.Connection = Depends(get_db),
+):
+    if article_state.has_pending("is_favorite"):
+        await article_state.flush()
+    sql, params = flag_query("is_favorite", cursor, limit)
+    cursor = await db.execute(sql, params)
     rows = await cursor.fetchall()
-    return [dict(row) for row in rows]
+    return _page(rows, limit, lambda a: (a["id"],))
 
 
 @router.get("/read-later")
-async def get_read_later(db: aiosqlite.Connection = Depends(get_db)):
-    cursor = await db.execute(
-        "SELECT * FROM articles WHERE read_later=1 ORDER BY id DESC"
-    )
+async def get_read_later(
+    cursor: str | None = None,
+    limit: int = Query(ARTICLE_PAGE_SIZE, ge=1, le=ARTICLE_PAGE_MAX),
+    db: aiosqlite.Connection = Depends(get_db),
+):
+    if article_state.has_pending("read_later"):
+        await article_state.flush()
+    sql, params = flag_query("read_later", cursor, limit)
+    cursor = await db.execute(sql, params)
     rows = await cursor.fetchall()
-    return [dict(row) for row in rows]
+    return _page(rows, limit, lambda a: (a["id"],))
 
 
 @router.delete("/{article_id}")
 async def delete_article(article_id: int, db: aiosqlite.Connection = Depends(get_db)):
+    """删除文章并留墓碑，之后抓取到同一链接不再入库"""
+    cursor = await db.execute("SELECT id, link, url_key FROM articles WHERE id=?", (article_id,))
+    await retention.tombstone(db, await cursor.fetchall())
     await db.execute("DELETE FROM articles WHERE id=?", (article_id,))
     await db.commit()
     return {"ok": True}
 
 
 @router.get("/{article_id}")
-async def get_article(article_id: int, db: aiosqlite.Connection = Depends(get_db)):
-    cursor = await db.execute("SELECT * FROM articles WHERE id=?", (article_id,))
-    row = await cursor.fetchone()
-    if not row:
-        from fastapi import HTTPException
-        raise HTTPException(status_code=404, detail="文章不存在")
+async def get_article(article_id: int):
+    # 按需抓全文要走网络，期间不占用连接池，只在读库、写库时短暂借连接
+    async with connection() as db:
+        row, generation = await article_state.fetch_row(db, DETAIL_SQL, (article_id,))
+        if not row:
+            from fastapi import HTTPException
+            raise HTTPException(status_code=404, detail="文章不存在")
 
-    article = dict(row)
-    # 自动标记已读
-    await db.execute("UPDATE articles SET is_read=1 WHERE id=?", (article_id,))
-    await db.commit()
+        # 自动标记已读（写缓冲，已读的不产生写入）
+        article_state.change(article_id, "is_read", 1, row["is_read"], generation)
+        article = article_state.overlay(await bodies.fill_article(db, dict(row)))
 
     content = article.get("content") or ""
-    summary = article.get("summary") or ""
-    link = article.get("link") or ""
 
-    # 若无全文（content 与 summary 相同或过短），按需抓取并缓存
-    need_fetch = link and (not content or content == summary or len(content) < 300)
-    if need_fetch:
-        full = await rss_service.fetch_article_full_content(link)
+    # 全文通常已由后台预取；若仍无全文（content 与 summary 相同或过短），按需抓取并缓存
+    if prefetch.needs_full_content(article):
+        full = await rss_service.fetch_article_full_content(article["link"])
         if full and len(full) > len(content):
-            await db.execute("UPDATE articles SET content=? WHERE id=?", (full, article_id))
-            await db.commit()
+            async with connection() as db:
+                await bodies.put(db, bodies.ARTICLE, article_id, full)
+                await db.commit()
             article["content"] = full
 
     article["is_read"] = 1
@@ -122,33 +202,33 @@ async def get_article(article_id: int, db: aiosqlite.Connection = Depends(get_db
 
 @router.post("/{article_id}/read")
 async def mark_read(article_id: int, db: aiosqlite.Connection = Depends(get_db)):
-    await db.execute("UPDATE articles SET is_read=1 WHERE id=?", (article_id,))
-    await db.commit()
+    row, generation = await article_state.fetch_row(db, "SELECT is_read FROM articles WHERE id=?", (article_id,))
+    if row:
+        article_state.change(article_id, "is_read", 1, row["is_read"], generation)
     return {"is_read": True}
 
 
 @router.post("/{article_id}/read-later")
 async def toggle_read_later(article_id: int, db: aiosqlite.Connection = Depends(get_db)):
-    cursor = await db.execute("SELECT read_later FROM articles WHERE id=?", (article_id,))
-    row = await cursor.fetchone()
+    row, generation = await article_state.fetch_row(db, "SELECT read_later FROM articles WHERE id=?", (article_id,))
     if not row:
         from fastapi import HTTPException
         raise HTTPException(status_code=404, detail="文章不存在")
-    new_val = 0 if row["read_later"] else 1
-    await db.execute("UPDATE articles SET read_later=? WHERE id=?", (new_val, article_id))
-    await db.commit()
+    new_val = 0 if article_state.get(article_id, "read_later", row["read_later"]) else 1
+    article_state.change(article_id, "read_later", new_val, row["read_later"], generation)
     return {"read_later": bool(new_val)}
 
 
 @router.post("/{article_id}/translate")
-async def translate_article(article_id: int, db: aiosqlite.Connection = Depends(get_db)):
-    cursor = await db.execute("SELECT * FROM articles WHERE id=?", (article_id,))
-    row = await cursor.fetchone()
-    if not row:
-        from fastapi import HTTPException
-        raise HTTPException(status_code=404, detail="文章不存在")
-
-    article = dict(row)
+async def translate_article(article_id: int):
+    # 等待大模型期间不占用连接池
+    async with connection() as db:
+        cursor = await db.execute("SELECT * FROM articles WHERE id=?", (article_id,))
+        row = await cursor.fetchone()
+        if not row:
+            from fastapi import HTTPException
+            raise HTTPException(status_code=404, detail="文章不存在")
+        article = await bodies.fill_article(db, dict(row))
     if article.get("translated_content"):
         return {"translated_content": article["translated_content"]}
 
@@ -157,24 +237,47 @@ async def translate_article(article_id: int, db: aiosqlite.Connection = Depends(
     translated = await ai_service.translate_article(text)
 
     try:
-        await db.execute(
-            "UPDATE articles SET translated_content=? WHERE id=?", (translated, article_id)
-        )
-        await db.commit()
+        async with connection() as db:
+            await bodies.put(db, bodies.TRANSLATION, article_id, translated)
+            await db.commit()
     except Exception:
         pass
 
     return {"translated_content": translated}
 
 
+@router.post("/{article_id}/translate/stream")
+async def translate_article_stream(article_id: int, db: aiosqlite.Connection = Depends(get_db)):
+    """translate 的流式版本（SSE）：delta 为增量译文，done 为 {translated_content}（已保存）；
+    已有译文时直接在 done 里返回"""
+    cursor = await db.execute("SELECT * FROM articles WHERE id=?", (article_id,))
+    row = await cursor.fetchone()
+    if not row:
+        raise HTTPException(status_code=404, detail="文章不存在")
+
+    article = await bodies.fill_article(db, dict(row))
+    text = article.get("content") or article.get("summary") or ""
+    cached = article.get("translated_content")
+
+    async def job(emit):
+        if cached:
+            return {"translated_content": cached}
+        from services import ai_service
+        translated = await streaming.collect(ai_service.translate_article_stream(text), emit)
+        async with connection() as db:
+            await bodies.put(db, bodies.TRANSLATION, article_id, translated)
+            await db.commit()
+        return {"translated_content": translated}
+
+    return streaming.sse_job(job)
+
+
 @router.post("/{article_id}/favorite")
 async def toggle_favorite(article_id: int, db: aiosqlite.Connection = Depends(get_db)):
-    cursor = await db.execute("SELECT is_favorite FROM articles WHERE id=?", (article_id,))
-    row = await cursor.fetchone()
+    row, generation = await article_state.fetch_row(db, "SELECT is_favorite FROM articles WHERE id=?", (article_id,))
     if not row:
         from fastapi import HTTPException
         raise HTTPException(status_code=404, detail="文章不存在")
-    new_val = 0 if row["is_favorite"] else 1
-    await db.execute("UPDATE articles SET is_favorite=? WHERE id=?", (new_val, article_id))
-    await db.commit()
+    new_val = 0 if article_state.get(article_id, "is_favorite", row["is_favorite"]) else 1
+    article_state.change(article_id, "is_favorite", new_val, row["is_favorite"], generation)
     return {"is_favorite": bool(new_val)}
@@ -9,6 +9,8 @@ import os
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
+LOGIN_SQL = "SELECT id, email, nickname, hashed_password FROM users WHERE email=?"
+
 # JWT 配置
 SECRET_KEY = os.getenv("JWT_SECRET", "talking-skills-jwt-secret-change-in-production")
 ALGORITHM = "HS256"
@@ -111,10 +113,7 @@ async def register(body: UserRegister, db: aiosqlite.Connection = Depends(get_db
 
 @router.post("/login")
 async def login(body: UserLogin, response: Response, db: aiosqlite.Connection = Depends(get_db)):
-    cursor = await db.execute(
-        "SELECT id, email, nickname, hashed_password FROM users WHERE email=?",
-        (body.email,),
-    )
+    cursor = await db.execute(LOGIN_SQL, (body.email,))
     user = await cursor.fetchone()
     if not user or not verify_password(body.password, user["hashed_password"]):
         raise HTTPException(status_code=401, detail="邮箱或密码错误")
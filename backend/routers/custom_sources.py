@@ -1,10 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import xml.etree.ElementTree as ET
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import aiosqlite
-from database import get_db
+from database import get_db, connection
+from config import RSS_SOURCES, OPML_VALIDATE_CONCURRENCY, OPML_MAX_FEEDS, OPML_MAX_BYTES
+from services import opml, rss_service
 
 router = APIRouter(prefix="/api/custom-sources", tags=["custom_sources"])
 
+LIST_SQL = "SELECT * FROM custom_sources ORDER BY created_at DESC"
+
 
 class CustomSourceIn(BaseModel):
     url: str
@@ -15,9 +22,7 @@ class CustomSourceIn(BaseModel):
 
 @router.get("")
 async def list_custom_sources(db: aiosqlite.Connection = Depends(get_db)):
-    cursor = await db.execute(
-        "SELECT * FROM custom_sources ORDER BY created_at DESC"
-    )
+    cursor = await db.execute(LIST_SQL)
     rows = await cursor.fetchall()
     return [dict(row) for row in rows]
 
@@ -49,3 +54,88 @@ async def delete_custom_source(source_id: int, db: aiosqlite.Connection = Depend
     await db.execute("DELETE FROM custom_sources WHERE id=?", (source_id,))
     await db.commit()
     return {"ok": True}
+
+
+@router.post("/opml")
+async def import_opml(
+    file: UploadFile = File(...),
+    category: str = Form("科技"),
+):
+    """导入 OPML：并发校验所有订阅、识别类型并补全名称，有效的一次性批量写入
+
+    校验要逐个请求订阅地址，可能持续几分钟，期间不占用连接池，只在读已有订阅和写入时短暂借连接
+    """
+    data = await file.read()
+    if len(data) > OPML_MAX_BYTES:
+        raise HTTPException(status_code=400, detail="OPML 文件不能超过2MB")
+    try:
+        feeds = opml.parse_opml(data, default_category=category)
+    except (ET.ParseError, ValueError):
+        raise HTTPException(status_code=400, detail="OPML 解析失败，请确认文件格式")
+
+    unique = list({f["url"]: f for f in feeds}.values())
+    if len(unique) > OPML_MAX_FEEDS:
+        raise HTTPException(status_code=400, detail=f"单次最多导入{OPML_MAX_FEEDS}个订阅")
+
+    async with connection() as db:
+        cursor = await db.execute("SELECT url FROM custom_sources")
+        existing = {row["url"] for row in await cursor.fetchall()} | {s["url"] for s in RSS_SOURCES}
+
+    semaphore = asyncio.Semaphore(OPML_VALIDATE_CONCURRENCY)
+
+    async def validate(feed):
+        async with semaphore:
+            return feed, await rss_service.probe_feed(feed["url"])
+
+    to_check = [f for f in unique if f["url"] not in existing]
+    checked = await asyncio.gather(*(validate(f) for f in to_check))
+
+    results = [{"url": f["url"], "name": f["name"], "status": "exists"} for f in unique if f["url"] in existing]
+    rows = []
+    for feed, probe in checked:
+        if not probe["ok"]:
+            results.append({"url": feed["url"], "name": feed["name"], "status": "invalid", "error": probe["error"]})
+            continue
+        name = feed["name"] or probe["title"] or feed["url"].split("/")[2]
+        rows.append((feed["url"], name, feed["category"], probe["content_type"]))
+        results.append({
+            "url": feed["url"], "name": name, "status": "added",
+            "feed_type": probe["feed_type"], "content_type": probe["content_type"],
+        })
+
+    async with connection() as db:
+        await db.executemany(
+            """INSERT OR IGNORE INTO custom_sources (url, name, category, content_type)
+               VALUES (?, ?, ?, ?)""",
+            rows,
+        )
+        await db.commit()
+
+    counts = {status: sum(r["status"] == status for r in results) for status in ("added", "exists", "invalid")}
+    return {**counts, "results": results}
+
+
+@router.get("/opml")
+async def export_opml():
+    """导出自定义订阅为 OPML（按分类分组，流式输出）"""
+    async def generate():
+        yield opml.opml_header("别吵架 · 自定义订阅")
+        async with connection() as db:
+            cursor = await db.execute("SELECT url, name, category FROM custom_sources ORDER BY category, id")
+            current = None
+            async for url, name, category in cursor:
+                if category != current:
+                    if current is not None:
+                        yield opml.OPML_CATEGORY_CLOSE
+                    yield opml.opml_category_open(category or "未分类")
+                    current = category
+                yield opml.opml_feed(url, name)
+            if current is not None:
+                yield opml.OPML_CATEGORY_CLOSE
+        yield opml.OPML_FOOTER
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/x-opml; charset=utf-8",
+        headers={"Content-Disposition": 'attachment; filename="talking-skills.opml"'},
+    )
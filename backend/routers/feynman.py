@@ -1,11 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 import aiosqlite
-from database import get_db
-from services import ai_service
+from database import get_db, connection
+from services import ai_service, bodies, streaming
 
 router = APIRouter(prefix="/api/feynman", tags=["feynman"])
 
+MESSAGES_SQL = "SELECT * FROM feynman_messages WHERE session_id=? ORDER BY id ASC"
+HISTORY_SQL = "SELECT role, content FROM feynman_messages WHERE session_id=? ORDER BY id ASC"
+
 
 @router.post("/sessions")
 async def create_session(
@@ -35,10 +38,7 @@ async def create_session(
 
 @router.get("/sessions/{session_id}/messages")
 async def get_messages(session_id: int, db: aiosqlite.Connection = Depends(get_db)):
-    cursor = await db.execute(
-        "SELECT * FROM feynman_messages WHERE session_id=? ORDER BY id ASC",
-        (session_id,),
-    )
+    cursor = await db.execute(MESSAGES_SQL, (session_id,))
     rows = await cursor.fetchall()
     return [dict(row) for row in rows]
 
@@ -47,12 +47,8 @@ class MessageCreate(BaseModel):
     content: str
 
 
-@router.post("/sessions/{session_id}/messages")
-async def send_message(
-    session_id: int,
-    body: MessageCreate,
-    db: aiosqlite.Connection = Depends(get_db),
-):
+async def _prepare_message(session_id: int, body: MessageCreate, db) -> tuple[str, list[dict]]:
+    """校验会话、保存用户消息，返回 (学习内容, 之前的历史消息)"""
     # 获取会话信息
     cursor = await db.execute("SELECT * FROM feynman_sessions WHERE id=?", (session_id,))
     session = await cursor.fetchone()
@@ -62,25 +58,12 @@ async def send_message(
     # 获取文件/文章内容
     content = ""
     if session["file_id"]:
-        cursor = await db.execute(
-            "SELECT content, ai_summary FROM uploaded_files WHERE id=?", (session["file_id"],)
-        )
-        row = await cursor.fetchone()
-        if row:
-            content = row["content"] or row["ai_summary"] or ""
+        content = await bodies.upload_text(db, session["file_id"]) or ""
     elif session["article_id"]:
-        cursor = await db.execute(
-            "SELECT content, summary FROM articles WHERE id=?", (session["article_id"],)
-        )
-        row = await cursor.fetchone()
-        if row:
-            content = row["content"] or row["summary"] or ""
+        content = await bodies.article_text(db, session["article_id"]) or ""
 
     # 获取历史消息
-    cursor = await db.execute(
-        "SELECT role, content FROM feynman_messages WHERE session_id=? ORDER BY id ASC",
-        (session_id,),
-    )
+    cursor = await db.execute(HISTORY_SQL, (session_id,))
     history = [dict(r) for r in await cursor.fetchall()]
 
     # 保存用户消息
@@ -89,6 +72,25 @@ async def send_message(
         (session_id, "user", body.content),
     )
     await db.commit()
+    return content, history
+
+
+async def _save_reply(db, session_id: int, ai_reply: str):
+    await db.execute(
+        "INSERT INTO feynman_messages (session_id, role, content) VALUES (?, ?, ?)",
+        (session_id, "assistant", ai_reply),
+    )
+    await db.commit()
+
+
+@router.post("/sessions/{session_id}/messages")
+async def send_message(
+    session_id: int,
+    body: MessageCreate,
+):
+    # 等待大模型期间不占用连接池，只在读写时短暂借连接
+    async with connection() as db:
+        content, history = await _prepare_message(session_id, body, db)
 
     # 调用AI
     ai_reply = ""
@@ -99,10 +101,29 @@ async def send_message(
     except Exception as e:
         ai_reply = f"AI回复失败，请重试。({str(e)})"
 
-    await db.execute(
-        "INSERT INTO feynman_messages (session_id, role, content) VALUES (?, ?, ?)",
-        (session_id, "assistant", ai_reply),
-    )
-    await db.commit()
-
+    async with connection() as db:
+        await _save_reply(db, session_id, ai_reply)
     return {"role": "assistant", "content": ai_reply}
+
+
+@router.post("/sessions/{session_id}/messages/stream")
+async def send_message_stream(
+    session_id: int,
+    body: MessageCreate,
+    db: aiosqlite.Connection = Depends(get_db),
+):
+    """send_message 的流式版本（SSE）：delta 为增量文本，done 为完整回复（已保存）"""
+    content, history = await _prepare_message(session_id, body, db)
+
+    async def job(emit):
+        try:
+            ai_reply = await streaming.collect(ai_service.feynman_chat_stream(content, history, body.content), emit)
+        except ValueError as e:
+            ai_reply = f"请先配置智谱AI API Key 以启用此功能。({str(e)})"
+        except Exception as e:
+            ai_reply = f"AI回复失败，请重试。({str(e)})"
+        async with connection() as db:
+            await _save_reply(db, session_id, ai_reply)
+        return {"role": "assistant", "content": ai_reply}
+
+    return streaming.sse_job(job)
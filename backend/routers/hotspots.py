@@ -7,22 +7,26 @@ from services.moderation import check_content
 
 router = APIRouter(prefix="/api/hotspots", tags=["hotspots"])
 
+COMMENTS_SQL = "SELECT * FROM comments WHERE hotspot_id=? ORDER BY id DESC"
+COMMENT_IN_HOTSPOT_SQL = "SELECT id FROM comments WHERE id=? AND hotspot_id=?"
+
+
+def list_query(platform: str, category: str) -> tuple[str, tuple]:
+    """热点列表 SQL；老数据 category 为 NULL 视同 today，写成 IFNULL 以命中表达式索引"""
+    if category == "classic":
+        return "SELECT * FROM hotspots WHERE IFNULL(category, 'today')='classic' ORDER BY id DESC", ()
+    if platform == "全部":
+        return "SELECT * FROM hotspots WHERE IFNULL(category, 'today')='today' ORDER BY id DESC", ()
+    return (
+        "SELECT * FROM hotspots WHERE IFNULL(category, 'today')='today' AND platform=? ORDER BY id DESC",
+        (platform,),
+    )
+
 
 @router.get("")
 async def get_hotspots(platform: str = "全部", category: str = "today", db: aiosqlite.Connection = Depends(get_db)):
-    if category == "classic":
-        cursor = await db.execute(
-            "SELECT * FROM hotspots WHERE category='classic' ORDER BY id DESC"
-        )
-    elif platform == "全部":
-        cursor = await db.execute(
-            "SELECT * FROM hotspots WHERE category='today' OR category IS NULL ORDER BY id DESC"
-        )
-    else:
-        cursor = await db.execute(
-            "SELECT * FROM hotspots WHERE (category='today' OR category IS NULL) AND platform=? ORDER BY id DESC",
-            (platform,),
-        )
+    sql, params = list_query(platform, category)
+    cursor = await db.execute(sql, params)
     rows = await cursor.fetchall()
     return [dict(row) for row in rows]
 
@@ -38,9 +42,7 @@ async def get_hotspot(hotspot_id: int, db: aiosqlite.Connection = Depends(get_db
 
 @router.get("/{hotspot_id}/comments")
 async def get_comments(hotspot_id: int, db: aiosqlite.Connection = Depends(get_db)):
-    cursor = await db.execute(
-        "SELECT * FROM comments WHERE hotspot_id=? ORDER BY id DESC", (hotspot_id,)
-    )
+    cursor = await db.execute(COMMENTS_SQL, (hotspot_id,))
     rows = await cursor.fetchall()
     all_comments = [dict(row) for row in rows]
 
@@ -89,10 +91,7 @@ async def post_comment(
 
     # 检查 parent_id 合法性
     if body.parent_id:
-        cursor = await db.execute(
-            "SELECT id FROM comments WHERE id=? AND hotspot_id=?",
-            (body.parent_id, hotspot_id),
-        )
+        cursor = await db.execute(COMMENT_IN_HOTSPOT_SQL, (body.parent_id, hotspot_id))
         if not await cursor.fetchone():
             raise HTTPException(status_code=400, detail="回复的评论不存在")
 
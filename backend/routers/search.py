@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+import aiosqlite
+from database import get_db
+from services import search
+from routers.articles import encode_cursor, decode_cursor
+from config import SEARCH_PAGE_SIZE, ARTICLE_PAGE_MAX
+
+router = APIRouter(prefix="/api/search", tags=["search"])
+
+
+@router.get("")
+async def search_all(
+    q: str,
+    kind: str = "全部",  # 全部/article/upload/hotspot
+    cursor: str | None = None,
+    limit: int = Query(SEARCH_PAGE_SIZE, ge=1, le=ARTICLE_PAGE_MAX),
+    db: aiosqlite.Connection = Depends(get_db),
+):
+    """全文搜索文章、上传文件、热点，按相关度排序
+
+    返回 {"items": [{kind, id, title, snippet, score}], "next_cursor"}；title / snippet 中命中的词用 <mark> 包裹
+    """
+    if kind != "全部" and kind not in search.KINDS:
+        raise HTTPException(status_code=400, detail="kind 无效")
+    match = search.build_match(q.strip()[:200])
+    if not match:
+        raise HTTPException(status_code=400, detail="请输入搜索关键词")
+    after = decode_cursor(cursor, 2) if cursor else None
+    try:
+        items, next_key = await search.search(db, match, None if kind == "全部" else kind, after, limit)
+    except aiosqlite.OperationalError:
+        raise HTTPException(status_code=400, detail="搜索关键词无效")
+    return {"items": items, "next_cursor": encode_cursor(*next_key) if next_key else None}
@@ -1,12 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 import aiosqlite
-from database import get_db
-from services import ai_service
+from database import get_db, connection
+from services import ai_service, ai_parallel, bodies, streaming
 from services.moderation import check_content
 
 router = APIRouter(prefix="/api/summaries", tags=["summaries"])
 
+LIST_SQL = "SELECT * FROM summaries WHERE article_id=? ORDER BY id DESC"
+
 
 class SummaryCreate(BaseModel):
     article_id: int | None = None
@@ -14,33 +16,29 @@ class SummaryCreate(BaseModel):
 
 
 @router.post("")
-async def create_summary(body: SummaryCreate, db: aiosqlite.Connection = Depends(get_db)):
+async def create_summary(body: SummaryCreate):
     original_text = check_content(body.original_text, max_len=2000, field_name="总结")
 
+    # 等待大模型期间不占用连接池，只在读写时短暂借连接
     article_content = ""
     if body.article_id:
-        cursor = await db.execute("SELECT content, summary FROM articles WHERE id=?", (body.article_id,))
-        row = await cursor.fetchone()
-        if row:
-            article_content = row["content"] or row["summary"] or ""
-
-    ai_optimized = ""
-    ai_direct = ""
-    try:
-        ai_optimized = await ai_service.optimize_summary(article_content, original_text)
-        ai_direct = await ai_service.direct_summary(article_content)
-    except ValueError as e:
-        # API Key 未配置
-        ai_optimized = f"[AI功能未启用] {str(e)}"
-        ai_direct = f"[AI功能未启用] {str(e)}"
-    except Exception as e:
-        ai_optimized = f"[AI处理失败] {str(e)}"
-        ai_direct = f"[AI处理失败] {str(e)}"
+        async with connection() as db:
+            article_content = await bodies.article_text(db, body.article_id) or ""
+
+    results = await ai_parallel.run({
+        "ai_optimized": lambda: ai_service.optimize_summary(article_content, original_text),
+        "ai_direct": lambda: ai_service.direct_summary(article_content),
+    })
+
+    async with connection() as db:
+        return await _save_summary(db, body.article_id, original_text, **results)
+
 
+async def _save_summary(db, article_id, original_text: str, ai_optimized: str, ai_direct: str) -> dict:
     cursor = await db.execute(
         """INSERT INTO summaries (article_id, original_text, ai_optimized, ai_direct)
            VALUES (?, ?, ?, ?)""",
-        (body.article_id, original_text, ai_optimized, ai_direct),
+        (article_id, original_text, ai_optimized, ai_direct),
     )
     await db.commit()
     summary_id = cursor.lastrowid
@@ -52,12 +50,34 @@ async def create_summary(body: SummaryCreate, db: aiosqlite.Connection = Depends
     }
 
 
+@router.post("/stream")
+async def create_summary_stream(body: SummaryCreate, db: aiosqlite.Connection = Depends(get_db)):
+    """create_summary 的流式版本（SSE）：同时生成优化总结和标准总结，
+    delta 为 {field: ai_optimized / ai_direct, text}（两路交错到达），done 为保存后的总结"""
+    original_text = check_content(body.original_text, max_len=2000, field_name="总结")
+
+    article_content = ""
+    if body.article_id:
+        article_content = await bodies.article_text(db, body.article_id) or ""
+
+    async def job(emit):
+        results = await ai_parallel.run({
+            "ai_optimized": lambda: streaming.collect(
+                ai_service.optimize_summary_stream(article_content, original_text), emit, field="ai_optimized"
+            ),
+            "ai_direct": lambda: streaming.collect(
+                ai_service.direct_summary_stream(article_content), emit, field="ai_direct"
+            ),
+        })
+        async with connection() as db:
+            return await _save_summary(db, body.article_id, original_text, **results)
+
+    return streaming.sse_job(job)
+
+
 @router.get("/article/{article_id}")
 async def get_summaries(article_id: int, db: aiosqlite.Connection = Depends(get_db)):
-    cursor = await db.execute(
-        "SELECT * FROM summaries WHERE article_id=? ORDER BY id DESC",
-        (article_id,),
-    )
+    cursor = await db.execute(LIST_SQL, (article_id,))
     rows = await cursor.fetchall()
     return [dict(row) for row in rows]
 
@@ -0,0 +1,78 @@
+from fastapi import APIRouter, Depends, HTTPException
+import aiosqlite
+from database import get_db, schema_version
+from services import source_health, http_client, data_migrations, bodies, article_state, retention, llm_cache
+
+router = APIRouter(prefix="/api/system", tags=["system"])
+
+
+@router.get("/sources")
+async def get_source_health(db: aiosqlite.Connection = Depends(get_db)):
+    """各 RSS 源的健康度：熔断中的排最前，其次按连续失败次数、平均耗时倒序"""
+    cursor = await db.execute(
+        """SELECT *, (COALESCE(circuit_open_until, '') > datetime('now', 'localtime')) AS circuit_open
+           FROM source_health
+           ORDER BY circuit_open DESC, consecutive_failures DESC, avg_latency_ms DESC"""
+    )
+    rows = await cursor.fetchall()
+    return [dict(row) for row in rows]
+
+
+@router.post("/sources/reset")
+async def reset_source(body: dict, db: aiosqlite.Connection = Depends(get_db)):
+    """手动关闭某个源的熔断，下次轮询立即重试"""
+    url = (body.get("url") or "").strip()
+    if not url:
+        raise HTTPException(status_code=400, detail="url 不能为空")
+    await source_health.reset(db, url)
+    await db.execute("UPDATE feed_states SET next_poll_at=NULL WHERE url=?", (url,))
+    await db.commit()
+    return {"ok": True}
+
+
+@router.get("/hosts")
+async def get_host_limits():
+    """出站请求按站点限速的状态（被 429/503 限流的次数、剩余暂停时间）"""
+    return http_client.host_stats()
+
+
+@router.get("/migrations")
+async def get_migrations(db: aiosqlite.Connection = Depends(get_db)):
+    """结构迁移版本号与分批数据迁移进度"""
+    return {
+        "schema_version": await schema_version(db),
+        "data": await data_migrations.progress(db),
+        "status": data_migrations.status(),
+    }
+
+
+@router.get("/storage")
+async def get_storage(db: aiosqlite.Connection = Depends(get_db)):
+    """正文存储统计：各类正文的原始 / 压缩后大小，数据库文件与空闲页大小"""
+    return await bodies.stats(db)
+
+
+@router.get("/state-buffer")
+async def get_state_buffer():
+    """文章状态写缓冲：未落库的变更数，累计缓冲 / 跳过（无变化）/ 写入的次数"""
+    return article_state.status()
+
+
+@router.get("/retention")
+async def get_retention(db: aiosqlite.Connection = Depends(get_db)):
+    """文章保留策略、各策略当前可清理的篇数、墓碑数与上次清理结果"""
+    return await retention.stats(db)
+
+
+@router.post("/retention/run")
+async def run_retention():
+    """立即按保留策略清理一轮，不等待完成"""
+    if not retention.run_now():
+        raise HTTPException(status_code=409, detail="清理服务未启动或正在清理")
+    return {"message": "已开始清理"}
+
+
+@router.get("/llm-cache")
+async def get_llm_cache(db: aiosqlite.Connection = Depends(get_db)):
+    """AI 响应缓存：内存 / 库命中次数、未命中次数、命中率，以及各用途缓存的条数和大小"""
+    return await llm_cache.stats(db)
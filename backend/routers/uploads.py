@@ -3,11 +3,15 @@ import shutil
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
 from pydantic import BaseModel
 import aiosqlite
-from database import get_db
-from services import ai_service
+from database import get_db, connection
+from services import ai_service, ai_parallel, bodies
 
 router = APIRouter(prefix="/api/uploads", tags=["uploads"])
 
+LIST_SQL = "SELECT id, title, filename, file_path, file_type, ai_summary, upload_at FROM uploaded_files ORDER BY id DESC"
+SUMMARIES_SQL = "SELECT * FROM file_summaries WHERE file_id=? ORDER BY id DESC"
+DELETE_SUMMARIES_SQL = "DELETE FROM file_summaries WHERE file_id=?"
+
 UPLOAD_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "uploads")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
@@ -23,7 +27,7 @@ ALLOWED_TYPES = {
 
 @router.get("")
 async def list_uploads(db: aiosqlite.Connection = Depends(get_db)):
-    cursor = await db.execute("SELECT * FROM uploaded_files ORDER BY id DESC")
+    cursor = await db.execute(LIST_SQL)
     rows = await cursor.fetchall()
     return [dict(row) for row in rows]
 
@@ -34,7 +38,7 @@ async def get_upload(file_id: int, db: aiosqlite.Connection = Depends(get_db)):
     row = await cursor.fetchone()
     if not row:
         raise HTTPException(status_code=404, detail="文件不存在")
-    return dict(row)
+    return await bodies.fill_upload(db, dict(row))
 
 
 @router.delete("/{file_id}")
@@ -48,7 +52,7 @@ async def delete_upload(file_id: int, db: aiosqlite.Connection = Depends(get_db)
     if file_path and os.path.exists(file_path):
         os.remove(file_path)
     # 删除关联的总结
-    await db.execute("DELETE FROM file_summaries WHERE file_id=?", (file_id,))
+    await db.execute(DELETE_SUMMARIES_SQL, (file_id,))
     # 删除文件记录
     await db.execute("DELETE FROM uploaded_files WHERE id=?", (file_id,))
     await db.commit()
@@ -59,7 +63,6 @@ async def delete_upload(file_id: int, db: aiosqlite.Connection = Depends(get_db)
 async def upload_file(
     title: str = Form(...),
     file: UploadFile = File(...),
-    db: aiosqlite.Connection = Depends(get_db),
 ):
     # 文件大小检查（10MB）
     content_bytes = await file.read()
@@ -111,13 +114,16 @@ async def upload_file(
         except Exception as e:
             ai_summary = f"[摘要生成失败] {str(e)}"
 
-    cursor = await db.execute(
-        """INSERT INTO uploaded_files (title, filename, file_path, file_type, content, ai_summary)
-           VALUES (?, ?, ?, ?, ?, ?)""",
-        (title, file.filename, file_path, file_type, text_content, ai_summary),
-    )
-    await db.commit()
-    file_id = cursor.lastrowid
+    # 生成摘要期间不占用连接池，写库时再借
+    async with connection() as db:
+        cursor = await db.execute(
+            """INSERT INTO uploaded_files (title, filename, file_path, file_type, ai_summary)
+               VALUES (?, ?, ?, ?, ?)""",
+            (title, file.filename, file_path, file_type, ai_summary),
+        )
+        file_id = cursor.lastrowid
+        await bodies.put(db, bodies.UPLOAD, file_id, text_content)
+        await db.commit()
     return {"id": file_id, "message": "上传成功"}
 
 
@@ -131,34 +137,28 @@ from services.moderation import check_content
 async def create_file_summary(
     file_id: int,
     body: FileSummaryCreate,
-    db: aiosqlite.Connection = Depends(get_db),
 ):
     original_text = check_content(body.original_text, max_len=2000, field_name="总结")
 
-    cursor = await db.execute("SELECT content, ai_summary FROM uploaded_files WHERE id=?", (file_id,))
-    row = await cursor.fetchone()
-    if not row:
+    # 等待大模型期间不占用连接池，只在读写时短暂借连接
+    async with connection() as db:
+        file_content = await bodies.upload_text(db, file_id)
+    if file_content is None:
         raise HTTPException(status_code=404, detail="文件不存在")
-    file_content = row["content"] or row["ai_summary"] or ""
 
-    ai_optimized = ""
-    ai_direct = ""
-    try:
-        ai_optimized = await ai_service.optimize_summary(file_content, original_text)
-        ai_direct = await ai_service.direct_summary(file_content)
-    except ValueError as e:
-        ai_optimized = f"[AI功能未启用] {str(e)}"
-        ai_direct = f"[AI功能未启用] {str(e)}"
-    except Exception as e:
-        ai_optimized = f"[AI处理失败] {str(e)}"
-        ai_direct = f"[AI处理失败] {str(e)}"
-
-    cursor = await db.execute(
-        """INSERT INTO file_summaries (file_id, original_text, ai_optimized, ai_direct)
-           VALUES (?, ?, ?, ?)""",
-        (file_id, original_text, ai_optimized, ai_direct),
-    )
-    await db.commit()
+    results = await ai_parallel.run({
+        "ai_optimized": lambda: ai_service.optimize_summary(file_content, original_text),
+        "ai_direct": lambda: ai_service.direct_summary(file_content),
+    })
+    ai_optimized, ai_direct = results["ai_optimized"], results["ai_direct"]
+
+    async with connection() as db:
+        cursor = await db.execute(
+            """INSERT INTO file_summaries (file_id, original_text, ai_optimized, ai_direct)
+               VALUES (?, ?, ?, ?)""",
+            (file_id, original_text, ai_optimized, ai_direct),
+        )
+        await db.commit()
     summary_id = cursor.lastrowid
     return {
         "id": summary_id,
@@ -170,8 +170,6 @@ async def create_file_summary(
 
 @router.get("/{file_id}/summaries")
 async def get_file_summaries(file_id: int, db: aiosqlite.Connection = Depends(get_db)):
-    cursor = await db.execute(
-        "SELECT * FROM file_summaries WHERE file_id=? ORDER BY id DESC", (file_id,)
-    )
+    cursor = await db.execute(SUMMARIES_SQL, (file_id,))
     rows = await cursor.fetchall()
     return [dict(row) for row in rows]
@@ -0,0 +1,40 @@
+"""同一个请求里互不依赖的 AI 调用并发执行
+
+- 总耗时约等于最慢的一路，而不是各路相加
+- 每一路单独处理错误：一路失败只把这一路换成错误说明，其他路的结果照常返回
+- 整个请求有截止时间（AI_REQUEST_DEADLINE 秒），到时还没完成的路取消并标记超时
+"""
+
+import asyncio
+from typing import Awaitable, Callable
+from config import AI_REQUEST_DEADLINE
+
+
+def error_text(e: BaseException) -> str:
+    """AI 调用失败时代替结果保存的说明文字"""
+    if isinstance(e, ValueError):
+        # API Key 未配置
+        return f"[AI功能未启用] {str(e)}"
+    return f"[AI处理失败] {str(e)}"
+
+
+async def run(branches: dict[str, Callable[[], Awaitable[str]]], deadline: float = AI_REQUEST_DEADLINE) -> dict[str, str]:
+    """并发执行 {名字: 无参协程函数}，返回 {名字: 结果或错误说明}"""
+    tasks = {name: asyncio.create_task(make()) for name, make in branches.items()}
+    try:
+        _, pending = await asyncio.wait(tasks.values(), timeout=deadline)
+    finally:
+        # 超时或请求本身被取消时，不留下没人等的调用
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+    results = {}
+    for name, task in tasks.items():
+        if task in pending or task.cancelled():
+            results[name] = f"[AI处理超时] 超过 {deadline:g} 秒未完成"
+        elif task.exception() is not None:
+            results[name] = error_text(task.exception())
+        else:
+            results[name] = task.result()
+    return results
@@ -1,39 +1,116 @@
 import os
-import aiosqlite
-from openai import AsyncOpenAI
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
 from dotenv import load_dotenv
-from database import DB_PATH
+from database import connection
+from services import llm_cache
+from config import AI_MAX_CONNECTIONS, AI_MAX_KEEPALIVE, AI_KEEPALIVE_EXPIRY, AI_CONNECT_TIMEOUT, AI_READ_TIMEOUT
 
 load_dotenv()
 
+# 配置读一次后缓存，save_ai_config 写入时失效；
+# 当前配置的客户端长期复用，连接池保持 TLS 连接，不必每次请求重新握手。
+# 换了 base_url / api_key 后，旧客户端在没有请求使用时关闭（见 _borrow）
+_config: tuple[str, str, str] | None = None
+_clients: dict[tuple[str, str], AsyncOpenAI] = {}
+_current: tuple[str, str] | None = None
+_users: dict[AsyncOpenAI, int] = {}  # 客户端 -> 正在使用的请求数
+
+
+def _env_config():
+    """环境变量中的配置 (Render 等平台配置)"""
+    api_key = os.getenv("AI_API_KEY") or os.getenv("ZHIPU_API_KEY", "")
+    base_url = os.getenv("AI_BASE_URL", "https://open.bigmodel.cn/api/paas/v4/")
+    model_name = os.getenv("AI_MODEL_NAME", "glm-4-flash")
+    return api_key, base_url, model_name
+
+
 async def get_config():
-    """优先级：数据库 > 环境变量"""
-    # 1. 尝试从数据库读取
+    """优先级：数据库 > 环境变量；命中缓存时不读库"""
+    global _config
+    if _config is not None:
+        return _config
     try:
-        async with aiosqlite.connect(DB_PATH) as db:
-            db.row_factory = aiosqlite.Row
+        async with connection() as db:
             cursor = await db.execute("SELECT * FROM ai_config WHERE id = 1")
             row = await cursor.fetchone()
-            if row and row["api_key"]:
-                return row["api_key"], row["base_url"], row["model_name"]
     except Exception:
-        pass
+        # 读库失败不缓存，下次重试
+        return _env_config()
+    if row and row["api_key"]:
+        _config = row["api_key"], row["base_url"], row["model_name"]
+    else:
+        _config = _env_config()
+    return _config
 
-    # 2. 回退到环境变量 (Render 等平台配置)
-    api_key = os.getenv("AI_API_KEY") or os.getenv("ZHIPU_API_KEY", "")
-    base_url = os.getenv("AI_BASE_URL", "https://open.bigmodel.cn/api/paas/v4/")
-    model_name = os.getenv("AI_MODEL_NAME", "glm-4-flash")
-    return api_key, base_url, model_name
 
-async def get_client():
-    api_key, base_url, _ = await get_config()
+def invalidate_config():
+    global _config, _current
+    _config = None
+    _current = None
+
+
+async def get_client() -> tuple[AsyncOpenAI, str]:
+    """返回当前配置的 (客户端, 模型名)；发请求用 _borrow，免得客户端在使用中被关闭"""
+    global _current
+    api_key, base_url, model_name = await get_config()
     if not api_key or api_key == "your_api_key_here":
         raise ValueError("请先在设置页配置 AI API Key")
-    return AsyncOpenAI(api_key=api_key, base_url=base_url)
+    _current = (base_url, api_key)
+    client = _clients.get(_current)
+    if client is None:
+        http_client = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=AI_MAX_CONNECTIONS,
+                max_keepalive_connections=AI_MAX_KEEPALIVE,
+                keepalive_expiry=AI_KEEPALIVE_EXPIRY,
+            ),
+        )
+        client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            http_client=http_client,
+            timeout=httpx.Timeout(AI_READ_TIMEOUT, connect=AI_CONNECT_TIMEOUT),
+        )
+        _clients[_current] = client
+    return client, model_name
+
+
+async def _close_superseded():
+    """关闭不是当前配置、且没有请求在用的客户端"""
+    for key in [k for k, c in _clients.items() if k != _current and not _users.get(c)]:
+        await _clients.pop(key).close()
+
+
+@asynccontextmanager
+async def _borrow():
+    """借用当前配置的 (客户端, 模型名)，用完后顺带关闭已被替换的旧客户端"""
+    client, model_name = await get_client()
+    # get_client 返回到这里之间不会切换协程，计数前客户端不会被别处关闭
+    _users[client] = _users.get(client, 0) + 1
+    try:
+        await _close_superseded()
+        yield client, model_name
+    finally:
+        _users[client] -= 1
+        if not _users[client]:
+            del _users[client]
+        await _close_superseded()
+
+
+async def close_clients():
+    """应用关闭时释放各客户端的连接池"""
+    for client in _clients.values():
+        await client.close()
+    _clients.clear()
+    _users.clear()
+
 
 async def save_ai_config(api_key: str, base_url: str, model_name: str):
     """保存配置到数据库（持久化存储）"""
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connection() as db:
         await db.execute("""
             INSERT INTO ai_config (id, api_key, base_url, model_name, updated_at)
             VALUES (1, ?, ?, ?, datetime('now', 'localtime'))
@@ -44,6 +121,9 @@ async def save_ai_config(api_key: str, base_url: str, model_name: str):
                 updated_at=datetime('now', 'localtime')
         """, (api_key, base_url, model_name))
         await db.commit()
+    # 旧配置的客户端没人用就立即关闭，正在进行的请求用完后再关
+    invalidate_config()
+    await _close_superseded()
 
 async def get_ai_config_status() -> dict:
     api_key, base_url, model_name = await get_config()
@@ -75,11 +155,68 @@ async def get_ai_config_status() -> dict:
 
 # ================= 业务功能 =================
 
-async def optimize_summary(article_content: str, user_summary: str) -> str:
-    """基于金字塔原理优化用户总结"""
-    client = await get_client()
-    _, _, model_name = await get_config()
-    
+# 走响应缓存的用途及其提示词版本：改了提示词的措辞、格式要求等想让旧结果失效时把版本号加一。
+# 费曼对话是连续的交流，不缓存
+PROMPT_VERSIONS = {
+    "optimize_summary": 1,
+    "direct_summary": 1,
+    "translate_article": 1,
+}
+
+
+def _cache_key(kind: str | None, client: AsyncOpenAI, model_name: str, messages: list[dict], max_tokens: int):
+    if kind is None:
+        return None
+    return llm_cache.make_key(kind, PROMPT_VERSIONS[kind], str(client.base_url), model_name, messages, max_tokens)
+
+
+async def _complete(messages: list[dict], max_tokens: int, kind: str | None = None) -> str:
+    """生成完整回复；kind 在 PROMPT_VERSIONS 里时先查缓存"""
+    async with _borrow() as (client, model_name):
+        async def create() -> str:
+            response = await client.chat.completions.create(
+                model=model_name,
+                messages=messages,
+                max_tokens=max_tokens,
+            )
+            return response.choices[0].message.content.strip()
+
+        key = _cache_key(kind, client, model_name, messages, max_tokens)
+        if key is None:
+            return await create()
+        return await llm_cache.get_or_create(key, kind, create)
+
+
+async def _stream(messages: list[dict], max_tokens: int, kind: str | None = None) -> AsyncIterator[str]:
+    """流式生成，逐段产出增量文本；调用方停止迭代时关闭上游连接。
+    缓存命中时一次产出完整文本；完整生成后写入缓存，中途停止的不写"""
+    async with _borrow() as (client, model_name):
+        key = _cache_key(kind, client, model_name, messages, max_tokens)
+        if key is not None:
+            cached = await llm_cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+
+        stream = await client.chat.completions.create(
+            model=model_name,
+            messages=messages,
+            max_tokens=max_tokens,
+            stream=True,
+        )
+        parts = []
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+        finally:
+            await stream.close()
+        if key is not None:
+            await llm_cache.put(key, kind, "".join(parts).strip())
+
+
+def _optimize_summary_messages(article_content: str, user_summary: str) -> list[dict]:
     prompt = f"""你是一位专业的表达教练，擅长金字塔原理。
 
 用户对以下文章进行了总结，请基于金字塔原理对其总结进行优化，使其更加清晰、有条理。
@@ -99,20 +236,24 @@ async def optimize_summary(article_content: str, user_summary: str) -> str:
 6. 控制在200字以内
 
 请直接输出优化后的总结，不要有多余的前缀或解释。"""
+    return [{"role": "user", "content": prompt}]
+
 
-    response = await client.chat.completions.create(
-        model=model_name,
-        messages=[{"role": "user", "content": prompt}],
-        max_tokens=500,
+async def optimize_summary(article_content: str, user_summary: str) -> str:
+    """基于金字塔原理优化用户总结"""
+    return await _complete(
+        _optimize_summary_messages(article_content, user_summary), max_tokens=500, kind="optimize_summary"
     )
-    return response.choices[0].message.content.strip()
 
 
-async def direct_summary(article_content: str) -> str:
-    """直接对文章内容按金字塔原理生成标准总结"""
-    client = await get_client()
-    _, _, model_name = await get_config()
+def optimize_summary_stream(article_content: str, user_summary: str) -> AsyncIterator[str]:
+    """optimize_summary 的流式版本：逐段产出生成的文本"""
+    return _stream(
+        _optimize_summary_messages(article_content, user_summary), max_tokens=500, kind="optimize_summary"
+    )
 
+
+def _direct_summary_messages(article_content: str) -> list[dict]:
     prompt = f"""你是一位专业的内容分析师，请对以下文章按照金字塔原理生成一份结构化总结。
 
 ## 文章内容：
@@ -124,20 +265,20 @@ async def direct_summary(article_content: str) -> str:
 3. **重要细节**（可选）：关键数据、案例或补充信息
 
 请使用**Markdown格式**组织输出，清晰呈现层次结构，总字数控制在300字以内。"""
+    return [{"role": "user", "content": prompt}]
 
-    response = await client.chat.completions.create(
-        model=model_name,
-        messages=[{"role": "user", "content": prompt}],
-        max_tokens=600,
-    )
-    return response.choices[0].message.content.strip()
 
+async def direct_summary(article_content: str) -> str:
+    """直接对文章内容按金字塔原理生成标准总结"""
+    return await _complete(_direct_summary_messages(article_content), max_tokens=600, kind="direct_summary")
+
+
+def direct_summary_stream(article_content: str) -> AsyncIterator[str]:
+    """direct_summary 的流式版本：逐段产出生成的文本"""
+    return _stream(_direct_summary_messages(article_content), max_tokens=600, kind="direct_summary")
 
-async def feynman_chat(content: str, history: list[dict], user_message: str) -> str:
-    """费曼学习法对话：AI扮演导师角色"""
-    client = await get_client()
-    _, _, model_name = await get_config()
 
+def _feynman_chat_messages(content: str, history: list[dict], user_message: str) -> list[dict]:
     system_prompt = f"""你是一位善用费曼学习法的学习导师。你的任务是帮助用户深入理解以下内容，但不是直接讲解，而是通过提问引导用户自己思考和表达。
 
 ## 你要帮助用户理解的内容：
@@ -161,20 +302,20 @@ async def feynman_chat(content: str, history: list[dict], user_message: str) ->
     for msg in history:
         messages.append({"role": msg["role"], "content": msg["content"]})
     messages.append({"role": "user", "content": user_message})
+    return messages
 
-    response = await client.chat.completions.create(
-        model=model_name,
-        messages=messages,
-        max_tokens=400,
-    )
-    return response.choices[0].message.content.strip()
 
+async def feynman_chat(content: str, history: list[dict], user_message: str) -> str:
+    """费曼学习法对话：AI扮演导师角色"""
+    return await _complete(_feynman_chat_messages(content, history, user_message), max_tokens=400)
 
-async def translate_article(text: str) -> str:
-    """将英文文章翻译成中文，保留段落结构"""
-    client = await get_client()
-    _, _, model_name = await get_config()
-    
+
+def feynman_chat_stream(content: str, history: list[dict], user_message: str) -> AsyncIterator[str]:
+    """feynman_chat 的流式版本：逐段产出生成的文本"""
+    return _stream(_feynman_chat_messages(content, history, user_message), max_tokens=400)
+
+
+def _translate_article_messages(text: str) -> list[dict]:
     prompt = f"""请将以下英文内容翻译成流畅的中文。要求：
 1. 保留原文段落结构，每段之间空一行
 2. 专有名词（产品名、人名、公司名）保留英文
@@ -184,10 +325,14 @@ async def translate_article(text: str) -> str:
 
 原文：
 {text[:4000]}"""
+    return [{"role": "user", "content": prompt}]
 
-    response = await client.chat.completions.create(
-        model=model_name,
-        messages=[{"role": "user", "content": prompt}],
-        max_tokens=2000,
-    )
-    return response.choices[0].message.content.strip()
+
+async def translate_article(text: str) -> str:
+    """将英文文章翻译成中文，保留段落结构"""
+    return await _complete(_translate_article_messages(text), max_tokens=2000, kind="translate_article")
+
+
+def translate_article_stream(text: str) -> AsyncIterator[str]:
+    """translate_article 的流式版本：逐段产出生成的文本"""
+    return _stream(_translate_article_messages(text), max_tokens=2000, kind="translate_article")
@@ -0,0 +1,149 @@
+"""文章状态写缓冲：已读 / 收藏 / 稍后读的变更先记在内存里，定时合并成一个事务写库
+
+- 打开文章就是一次写，读的人一多，所有请求都排队等 SQLite 的写锁；
+  改为只改内存，每 STATE_FLUSH_INTERVAL 秒一批写入，停机时再写一次
+- 同一篇文章的多次变更合并为最终值，改回库里原值的变更直接丢弃，已读的文章再打开不产生写入；
+  “库里原值”只在读取之后没有 flush 提交过时才可信（按 flush 代数判断，见 fetch_row / change）
+- 读自己的写：详情、列表返回前用 overlay() 叠加未落库（含正在写入）的值；
+  按状态筛选的列表（未读 / 已读、收藏、稍后读）由 SQL 过滤，查询前先 flush()
+- 缓冲在进程内，多进程部署时各进程的未落库变更互相看不到（目前只跑单进程）
+"""
+
+import asyncio
+from database import connection
+from config import STATE_FLUSH_INTERVAL, STATE_FLUSH_MAX_PENDING
+
+FLAGS = ("is_read", "is_favorite", "read_later")
+
+# {文章 id: {字段: 新值}}，只存与库里不同的值
+_pending: dict[int, dict[str, int]] = {}
+# 正在写库的一批，写完前仍要叠加给读请求
+_inflight: dict[int, dict[str, int]] = {}
+_flush_lock: asyncio.Lock | None = None
+_wake: asyncio.Event | None = None
+_task: asyncio.Task | None = None
+# 每次 flush 提交后加一；路由读库时记下代数，代数变了说明读到的值可能已过时
+_generation = 0
+_stats = {"buffered": 0, "skipped": 0, "written": 0, "flushes": 0}
+
+
+def _changes(article_id: int) -> dict[str, int]:
+    return {**_inflight.get(article_id, {}), **_pending.get(article_id, {})}
+
+
+def get(article_id: int, flag: str, stored: int) -> int:
+    """当前值：有未落库的变更用变更，否则用库里的值"""
+    return _changes(article_id).get(flag, stored)
+
+
+async def fetch_row(db, sql: str, params) -> tuple:
+    """读一行文章数据，返回 (行, 代数)；读取期间有 flush 提交则重读，
+    保证返回时行里的状态与 get / overlay 叠加的缓冲一致"""
+    while True:
+        generation = _generation
+        cursor = await db.execute(sql, params)
+        row = await cursor.fetchone()
+        if generation == _generation:
+            return row, generation
+
+
+def change(article_id: int, flag: str, value: int, stored: int, generation: int):
+    """记录变更；stored 为 fetch_row 读到的库里的值（未叠加缓冲），generation 为同时返回的代数。
+    与 stored 相同、且读取后没有 flush 提交过、也没有在途写入时视为无变化；
+    否则 stored 可能已过时，照常记下（写库时值相同的行不会被改）"""
+    value = int(bool(value))
+    changes = _pending.setdefault(article_id, {})
+    if (
+        value == int(bool(stored))
+        and generation == _generation
+        and flag not in _inflight.get(article_id, {})
+    ):
+        changes.pop(flag, None)
+        _stats["skipped"] += 1
+    else:
+        changes[flag] = value
+        _stats["buffered"] += 1
+    if not changes:
+        del _pending[article_id]
+    elif len(_pending) >= STATE_FLUSH_MAX_PENDING and _wake is not None:
+        _wake.set()
+
+
+def overlay(article: dict) -> dict:
+    """把未落库的变更叠加到文章字典上（原地修改并返回）"""
+    changes = _changes(article.get("id"))
+    article.update((flag, value) for flag, value in changes.items() if flag in article)
+    return article
+
+
+def has_pending(flag: str) -> bool:
+    return any(flag in changes for changes in _pending.values())
+
+
+async def flush():
+    """把缓冲中的变更在一个事务里写库；失败时放回缓冲（不覆盖期间新的变更）"""
+    global _flush_lock, _inflight, _generation
+    if _flush_lock is None:
+        _flush_lock = asyncio.Lock()
+    async with _flush_lock:
+        if not _pending:
+            return
+        _inflight = dict(_pending)
+        _pending.clear()
+        updates = {flag: [] for flag in FLAGS}
+        for article_id, changes in _inflight.items():
+            for flag, value in changes.items():
+                updates[flag].append((value, article_id, value))
+        try:
+            async with connection() as db:
+                await db.execute("BEGIN IMMEDIATE")
+                for flag, rows in updates.items():
+                    if rows:
+                        await db.executemany(f"UPDATE articles SET {flag}=? WHERE id=? AND {flag}<>?", rows)
+                await db.commit()
+            _generation += 1
+        except BaseException:
+            for article_id, changes in _inflight.items():
+                for flag, value in changes.items():
+                    _pending.setdefault(article_id, {}).setdefault(flag, value)
+            raise
+        finally:
+            _inflight = {}
+        _stats["written"] += sum(len(rows) for rows in updates.values())
+        _stats["flushes"] += 1
+
+
+async def _loop():
+    while True:
+        try:
+            await asyncio.wait_for(_wake.wait(), STATE_FLUSH_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        _wake.clear()
+        try:
+            await flush()
+        except Exception as e:
+            print(f"[状态写入] 失败，下次重试: {e!r}")
+
+
+def start():
+    """在 lifespan 中启动（init_pool 之后）"""
+    global _task, _wake, _flush_lock
+    if _task is None or _task.done():
+        _wake = asyncio.Event()
+        _flush_lock = asyncio.Lock()
+        _task = asyncio.create_task(_loop())
+
+
+async def stop():
+    """停止定时写入并把剩余变更写库（close_pool 之前）"""
+    global _task
+    if _task is not None:
+        _task.cancel()
+        await asyncio.gather(_task, return_exceptions=True)
+        _task = None
+    await flush()
+
+
+def status() -> dict:
+    return {"pending": sum(len(changes) for changes in _pending.values()), **_stats}
@@ -0,0 +1,140 @@
+"""正文存储：文章全文、译文、上传文件文本放在 bodies 表，zlib 压缩
+
+articles / uploaded_files 的行里只留标题、摘要等小字段，列表和筛选扫描的页更少、更容易留在缓存里；
+正文只在详情、AI 处理等需要时按 id 读取并解压。
+迁移完成前旧行的正文仍在原列里，读取时先看原列再查 bodies 表。
+"""
+
+import zlib
+from config import BODY_COMPRESS_LEVEL
+
+ARTICLE = "article"          # articles.content（抓取的全文；与摘要相同时不存）
+TRANSLATION = "translation"  # articles.translated_content
+UPLOAD = "upload"            # uploaded_files.content
+
+GET_SQL = "SELECT data FROM bodies WHERE kind=? AND owner_id=?"
+# 待迁移的行由部分索引 idx_articles_inline_body 定位
+MIGRATE_SQL = """SELECT id, summary, content, translated_content FROM articles
+    WHERE (content IS NOT NULL OR translated_content IS NOT NULL) AND id > ? ORDER BY id LIMIT ?"""
+
+
+def compress(text: str) -> bytes | str:
+    """压缩后不比原文小的短文本（如短译文）直接存 TEXT，读取时按类型区分"""
+    raw = text.encode("utf-8")
+    packed = zlib.compress(raw, BODY_COMPRESS_LEVEL)
+    return packed if len(packed) < len(raw) else text
+
+
+def decompress(data: bytes | str) -> str:
+    return data if isinstance(data, str) else zlib.decompress(data).decode("utf-8")
+
+
+async def get(db, kind: str, owner_id: int) -> str | None:
+    cursor = await db.execute(GET_SQL, (kind, owner_id))
+    row = await cursor.fetchone()
+    return decompress(row[0]) if row else None
+
+
+async def put(db, kind: str, owner_id: int, text: str | None):
+    """写入（覆盖）正文，空文本则删除；不提交，由调用方控制事务"""
+    await put_many(db, kind, [(owner_id, text)])
+
+
+async def put_many(db, kind: str, rows: list[tuple[int, str | None]]):
+    await db.executemany(
+        """INSERT INTO bodies (kind, owner_id, data, raw_size) VALUES (?, ?, ?, ?)
+           ON CONFLICT(kind, owner_id) DO UPDATE SET data=excluded.data, raw_size=excluded.raw_size""",
+        [(kind, owner_id, compress(text), len(text.encode("utf-8"))) for owner_id, text in rows if text],
+    )
+    empty = [(kind, owner_id) for owner_id, text in rows if not text]
+    if empty:
+        await db.executemany("DELETE FROM bodies WHERE kind=? AND owner_id=?", empty)
+
+
+async def fill_article(db, article: dict) -> dict:
+    """补全文章详情的 content / translated_content（原地修改并返回）"""
+    if not article.get("content"):
+        article["content"] = await get(db, ARTICLE, article["id"])
+    if not article.get("translated_content"):
+        article["translated_content"] = await get(db, TRANSLATION, article["id"])
+    return article
+
+
+async def fill_upload(db, upload: dict) -> dict:
+    if not upload.get("content"):
+        upload["content"] = await get(db, UPLOAD, upload["id"])
+    return upload
+
+
+async def article_text(db, article_id: int) -> str | None:
+    """文章正文，没有全文时退回摘要；文章不存在返回 None"""
+    cursor = await db.execute("SELECT summary, content FROM articles WHERE id=?", (article_id,))
+    row = await cursor.fetchone()
+    if not row:
+        return None
+    return row[1] or await get(db, ARTICLE, article_id) or row[0] or ""
+
+
+async def upload_text(db, file_id: int) -> str | None:
+    """上传文件的文本，没有文本时退回 AI 摘要；文件不存在返回 None"""
+    cursor = await db.execute("SELECT ai_summary, content FROM uploaded_files WHERE id=?", (file_id,))
+    row = await cursor.fetchone()
+    if not row:
+        return None
+    return row[1] or await get(db, UPLOAD, file_id) or row[0] or ""
+
+
+async def migrate_articles(db, batch_size: int, after: int) -> tuple[int, int]:
+    """数据迁移：把一批文章的原列正文搬进 bodies 表并清空原列，返回 (本批条数, 最后一条 id)"""
+    cursor = await db.execute(MIGRATE_SQL, (after, batch_size))
+    rows = await cursor.fetchall()
+    if not rows:
+        return 0, after
+    # 与摘要相同的正文只是 RSS 摘要的副本，不再单独存
+    await put_many(db, ARTICLE, [(r[0], r[2]) for r in rows if r[2] and r[2] != r[1]])
+    await put_many(db, TRANSLATION, [(r[0], r[3]) for r in rows if r[3]])
+    await db.executemany(
+        "UPDATE articles SET content=NULL, translated_content=NULL WHERE id=?", [(r[0],) for r in rows]
+    )
+    await db.commit()
+    return len(rows), rows[-1][0]
+
+
+async def migrate_uploads(db, batch_size: int, after: int) -> tuple[int, int]:
+    cursor = await db.execute(
+        "SELECT id, content FROM uploaded_files WHERE content IS NOT NULL AND id > ? ORDER BY id LIMIT ?",
+        (after, batch_size),
+    )
+    rows = await cursor.fetchall()
+    if not rows:
+        return 0, after
+    await put_many(db, UPLOAD, [(r[0], r[1]) for r in rows])
+    await db.executemany("UPDATE uploaded_files SET content=NULL WHERE id=?", [(r[0],) for r in rows])
+    await db.commit()
+    return len(rows), rows[-1][0]
+
+
+async def stats(db) -> dict:
+    """各类正文的条数、原始大小、压缩后大小，以及数据库文件的页使用情况"""
+    cursor = await db.execute(
+        """SELECT kind, COUNT(*), COALESCE(SUM(raw_size), 0), COALESCE(SUM(length(CAST(data AS BLOB))), 0)
+           FROM bodies GROUP BY kind"""
+    )
+    kinds = {
+        row[0]: {
+            "count": row[1],
+            "raw_bytes": row[2],
+            "stored_bytes": row[3],
+            "ratio": round(row[3] / row[2], 3) if row[2] else None,
+        }
+        for row in await cursor.fetchall()
+    }
+    pragmas = {}
+    for name in ("page_size", "page_count", "freelist_count"):
+        cursor = await db.execute(f"PRAGMA {name}")
+        pragmas[name] = (await cursor.fetchone())[0]
+    return {
+        "bodies": kinds,
+        "db_bytes": pragmas["page_size"] * pragmas["page_count"],
+        "free_bytes": pragmas["page_size"] * pragmas["freelist_count"],
+    }
@@ -0,0 +1,101 @@
+"""分批数据迁移：启动后在后台按批执行，不阻塞服务启动
+
+- 结构迁移（建表、加列、建索引）在 database.migrate 里同步执行，数据回填放这里
+- 每批借一个连接、一个事务，批次之间让出写锁，请求和抓取不会被长事务卡住
+- 进度（已处理条数、按 id 推进的游标）记在 data_migrations 表，重启后从游标处继续，已完成的不再执行
+"""
+
+import asyncio
+from datetime import datetime
+from database import connection
+from config import DATA_MIGRATION_BATCH, DATA_MIGRATION_PAUSE
+from services import ingestion, bodies, search
+
+# (名称, 批处理函数)：函数签名 (db, batch_size, after) -> (本批条数, 新游标)，
+# 处理 id > after 的一批并提交，本批条数为 0 表示完成。只能追加
+STEPS = [
+    ("article_fingerprints", ingestion.backfill_fingerprints),
+    ("article_bodies", bodies.migrate_articles),
+    ("upload_bodies", bodies.migrate_uploads),
+    ("search_articles", search.backfill_articles),
+    ("search_uploads", search.backfill_uploads),
+    ("search_hotspots", search.backfill_hotspots),
+]
+
+_task: asyncio.Task | None = None
+_status = {"running": None, "finished": []}
+
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+async def _run_step(name: str, step) -> None:
+    async with connection() as db:
+        cursor = await db.execute("SELECT finished_at, cursor FROM data_migrations WHERE name=?", (name,))
+        row = await cursor.fetchone()
+        if row and row["finished_at"]:
+            return
+        after = (row["cursor"] or 0) if row else 0
+        await db.execute(
+            "INSERT OR IGNORE INTO data_migrations (name, started_at) VALUES (?, ?)", (name, _now())
+        )
+        await db.commit()
+
+    _status["running"] = name
+    total = 0
+    while True:
+        async with connection() as db:
+            # 先拿写锁再读：读到的行在本批提交前不会被并发删除（保留策略清理、手动删除）
+            await db.execute("BEGIN IMMEDIATE")
+            count, after = await step(db, DATA_MIGRATION_BATCH, after)
+            if count:
+                await db.execute(
+                    "UPDATE data_migrations SET processed=processed+?, cursor=? WHERE name=?", (count, after, name)
+                )
+            else:
+                await db.execute("UPDATE data_migrations SET finished_at=? WHERE name=?", (_now(), name))
+            await db.commit()
+        if not count:
+            break
+        total += count
+        await asyncio.sleep(DATA_MIGRATION_PAUSE)
+    _status["running"] = None
+    if total:
+        print(f"[数据迁移] {name} 完成，处理 {total} 条")
+
+
+async def _run():
+    for name, step in STEPS:
+        try:
+            await _run_step(name, step)
+        except Exception as e:
+            # 失败的步骤下次启动时从剩余部分重试
+            _status["running"] = None
+            print(f"[数据迁移] {name} 失败: {e!r}")
+            return
+        _status["finished"].append(name)
+
+
+def start():
+    """在 lifespan 中启动（init_pool 之后）"""
+    global _task
+    if _task is None or _task.done():
+        _task = asyncio.create_task(_run())
+
+
+async def stop():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        await asyncio.gather(_task, return_exceptions=True)
+        _task = None
+
+
+async def progress(db) -> list[dict]:
+    cursor = await db.execute("SELECT * FROM data_migrations ORDER BY started_at")
+    return [dict(row) for row in await cursor.fetchall()]
+
+
+def status() -> dict:
+    return {"running": _status["running"], "finished": list(_status["finished"])}
@@ -0,0 +1,94 @@
+"""正文提取：在独立进程池中用预编译正则从 HTML 提取段落文本，不占用事件循环
+
+提取函数在子进程中执行，并用 ITIMER_PROF 限制单个任务的 CPU 时间；
+父进程另有一个墙钟超时兜底，超时或进程池损坏时重建进程池。
+"""
+
+import asyncio
+import html as html_lib
+import multiprocessing
+import re
+import signal
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from config import EXTRACT_WORKERS, EXTRACT_CPU_TIMEOUT
+
+_NOISE_RE = re.compile(
+    r"<(script|style|nav|header|footer|aside|noscript)[^>]*>.*?</\1>", re.DOTALL | re.IGNORECASE
+)
+_PARAGRAPH_RE = re.compile(r"<p[^>]*>(.*?)</p>", re.DOTALL | re.IGNORECASE)
+_TAG_RE = re.compile(r"<[^>]+>")
+_SPACE_RE = re.compile(r"\s+")
+
+_pool: ProcessPoolExecutor | None = None
+
+
+class ExtractionTimeout(Exception):
+    pass
+
+
+def _on_cpu_timeout(signum, frame):
+    raise ExtractionTimeout("正文提取超过 CPU 时间上限")
+
+
+def extract_paragraphs(raw: str) -> str:
+    """从 HTML 中提取正文段落（纯函数，可在任意进程调用）"""
+    # 删除 script / style / nav / header / footer / aside
+    raw = _NOISE_RE.sub("", raw)
+    texts = []
+    for p in _PARAGRAPH_RE.findall(raw):
+        text = html_lib.unescape(_TAG_RE.sub("", p))
+        text = _SPACE_RE.sub(" ", text).strip()
+        if len(text) > 30:
+            texts.append(text)
+
+    result = "\n\n".join(texts)
+    return result if len(result) > 100 else ""
+
+
+def _extract_job(raw: str, cpu_limit: float) -> str:
+    """子进程入口：带 CPU 时间上限地执行提取"""
+    if not hasattr(signal, "setitimer"):  # Windows 无 ITIMER_PROF，只靠父进程的墙钟超时
+        return extract_paragraphs(raw)
+    signal.signal(signal.SIGPROF, _on_cpu_timeout)
+    signal.setitimer(signal.ITIMER_PROF, cpu_limit)
+    try:
+        return extract_paragraphs(raw)
+    finally:
+        signal.setitimer(signal.ITIMER_PROF, 0)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn：不从带事件循环和数据库线程的父进程 fork
+        _pool = ProcessPoolExecutor(
+            max_workers=EXTRACT_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+
+def _reset_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def extract_text(raw: str) -> str:
+    """在进程池中提取正文；超时或失败返回空字符串"""
+    loop = asyncio.get_running_loop()
+    try:
+        future = loop.run_in_executor(_get_pool(), _extract_job, raw, EXTRACT_CPU_TIMEOUT)
+        return await asyncio.wait_for(future, timeout=EXTRACT_CPU_TIMEOUT * 5)
+    except ExtractionTimeout as e:
+        print(f"[提取] {e}")
+    except (asyncio.TimeoutError, BrokenProcessPool) as e:
+        print(f"[提取] 进程池无响应，重建: {e!r}")
+        _reset_pool()
+    return ""
+
+
+def shutdown():
+    """应用关闭时回收进程池"""
+    _reset_pool()
@@ -0,0 +1,75 @@
+"""文章指纹：URL 归一化 + 标题/摘要的 64 位 SimHash，用于跨源近似判重
+
+SimHash 的特征取去掉空白和标点后的字符三元组，中英文都不需要分词，标题里改动一两个字
+对指纹影响也较小。指纹分成 5 段（13/13/13/13/12 位）存入 article_simhash_bands 并建索引：
+汉明距离 ≤ 4 的两个指纹至少有一段完全相同（抽屉原理），所以每篇文章只需按 5 个段值查候选，
+再精确比较距离。
+"""
+
+import hashlib
+import re
+from urllib.parse import urlsplit, parse_qsl, urlencode
+from config import SIMHASH_MIN_TOKENS
+
+_BAND_WIDTHS = (13, 13, 13, 13, 12)
+
+# 常见的跟踪参数，不影响页面内容
+_TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "igshid", "yclid",
+    "spm", "ref", "ref_src", "from", "share_source", "share_medium", "source", "via",
+}
+_NON_WORD_RE = re.compile(r"[\W_]+")
+
+
+def normalize_url(url: str) -> str:
+    """归一化链接：忽略协议、www、锚点、跟踪参数、参数顺序和结尾斜杠"""
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip("/") or "/"
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in _TRACKING_PARAMS
+    )
+    return f"{host}{path}" + (f"?{urlencode(query)}" if query else "")
+
+
+def _tokens(text: str) -> list[str]:
+    """字符三元组（去掉空白和标点）"""
+    text = _NON_WORD_RE.sub("", text.lower())
+    return [text[i:i + 3] for i in range(len(text) - 2)]
+
+
+def simhash(text: str) -> int | None:
+    """计算 64 位 SimHash（转为有符号整数以便存入 SQLite）；词元过少时返回 None"""
+    tokens = _tokens(text)
+    if len(tokens) < SIMHASH_MIN_TOKENS:
+        return None
+    weights = [0] * 64
+    for token in tokens:
+        h = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    value = sum(1 << bit for bit in range(64) if weights[bit] > 0)
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def bands(value: int) -> list[tuple[int, int]]:
+    """把指纹切成 (段号, 段值) 列表"""
+    unsigned = value & ((1 << 64) - 1)
+    result, shift = [], 0
+    for i, width in enumerate(_BAND_WIDTHS):
+        result.append((i, unsigned >> shift & ((1 << width) - 1)))
+        shift += width
+    return result
+
+
+def distance(a: int, b: int) -> int:
+    return bin((a ^ b) & ((1 << 64) - 1)).count("1")
+
+
+def article_text(article: dict) -> str:
+    return f"{article.get('title') or ''} {article.get('summary') or ''}"
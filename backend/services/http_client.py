@@ -0,0 +1,159 @@
+"""共享的出站 HTTP 客户端
+
+- 全进程复用一个 httpx.AsyncClient（按主机复用连接池）
+- request / stream 按站点走令牌桶限速（HOST_RATE / HOST_BURST，可按站点覆盖），
+  遇到 429/503 时遵守 Retry-After：暂停该站点的所有请求，等待时间不长则重试一次
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+import httpx
+from config import (
+    HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE,
+    HOST_RATE, HOST_BURST, HOST_RATE_OVERRIDES, RETRY_AFTER_DEFAULT, RETRY_AFTER_MAX_WAIT,
+)
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/120.0"
+
+_client: httpx.AsyncClient | None = None
+
+
+class _TokenBucket:
+    """单个站点的令牌桶；blocked_until 用于 Retry-After 期间整体暂停"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.throttled = 0
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:  # 同一站点的等待者按先来后到取令牌
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def block(self, seconds: float):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.throttled += 1
+
+
+_buckets: dict[str, _TokenBucket] = {}
+
+
+def _host_key(url: str) -> str:
+    """限速按注册域聚合：xxx.substack.com 都算 substack.com（仅限配置了覆盖的站点）"""
+    host = (urlsplit(url).hostname or "").lower()
+    for suffix in HOST_RATE_OVERRIDES:
+        if host == suffix or host.endswith("." + suffix):
+            return suffix
+    return host
+
+
+def _bucket(url: str) -> _TokenBucket:
+    key = _host_key(url)
+    if key not in _buckets:
+        rate, burst = HOST_RATE_OVERRIDES.get(key, (HOST_RATE, HOST_BURST))
+        _buckets[key] = _TokenBucket(rate, burst)
+    return _buckets[key]
+
+
+def _retry_after(resp: httpx.Response) -> float | None:
+    """429/503 时返回需要暂停的秒数，其他状态返回 None"""
+    if resp.status_code not in (429, 503):
+        return None
+    value = resp.headers.get("retry-after", "").strip()
+    if value.isdigit():
+        return float(value)
+    if value:
+        try:
+            return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            pass
+    return RETRY_AFTER_DEFAULT
+
+
+def get_client() -> httpx.AsyncClient:
+    """获取共享客户端（首次调用时创建）"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            follow_redirects=True,
+            headers={"User-Agent": USER_AGENT},
+            timeout=httpx.Timeout(15.0, connect=5.0),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=30.0,
+            ),
+        )
+    return _client
+
+
+async def request(method: str, url: str, **kwargs) -> httpx.Response:
+    """按站点限速发送请求（读完整响应体）"""
+    bucket = _bucket(url)
+    for attempt in range(2):
+        await bucket.acquire()
+        resp = await get_client().request(method, url, **kwargs)
+        wait = _retry_after(resp)
+        if wait is None:
+            return resp
+        bucket.block(wait)
+        if attempt or wait > RETRY_AFTER_MAX_WAIT:
+            return resp
+    return resp
+
+
+@asynccontextmanager
+async def stream(method: str, url: str, **kwargs):
+    """按站点限速的流式请求，用法同 httpx.AsyncClient.stream"""
+    bucket = _bucket(url)
+    for attempt in range(2):
+        await bucket.acquire()
+        async with get_client().stream(method, url, **kwargs) as resp:
+            wait = _retry_after(resp)
+            if wait is not None:
+                bucket.block(wait)
+            if wait is None or attempt or wait > RETRY_AFTER_MAX_WAIT:
+                yield resp
+                return
+
+
+def host_stats() -> list[dict]:
+    """各站点限速状态"""
+    now = time.monotonic()
+    return [
+        {
+            "host": host,
+            "rate": b.rate,
+            "burst": b.capacity,
+            "throttled": b.throttled,
+            "blocked_for": round(max(0.0, b.blocked_until - now), 1),
+        }
+        for host, b in sorted(_buckets.items(), key=lambda kv: -kv[1].throttled)
+    ]
+
+
+async def close_client():
+    """应用关闭时释放连接池"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+    _buckets.clear()
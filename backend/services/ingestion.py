@@ -0,0 +1,196 @@
+"""文章入库：汇总订阅源、写入抓取结果"""
+
+from config import RSS_SOURCES, INGEST_CHUNK_SIZE, SIMHASH_MAX_DISTANCE
+from services import fingerprint, bodies
+
+
+async def load_sources(db) -> list[dict]:
+    """内置 RSS 源 + 用户自定义源"""
+    cursor = await db.execute("SELECT url, name, category, content_type FROM custom_sources")
+    custom_rows = await cursor.fetchall()
+    extra_sources = [dict(r) for r in custom_rows]
+    # extra_sources 里的 key 和 RSS_SOURCES 一致，type 字段用 content_type 代替
+    for s in extra_sources:
+        s["type"] = s.pop("content_type", "文章")
+    return RSS_SOURCES + extra_sources
+
+
+BACKFILL_SQL = "SELECT id, link, title, summary FROM articles WHERE url_key IS NULL AND id > ? ORDER BY id LIMIT ?"
+
+
+def near_duplicate_query(value: int) -> tuple[str, list]:
+    """SimHash 与 value 有任一分段相同的已有文章（check_query_plans.py 也用它检查查询计划）"""
+    band_list = fingerprint.bands(value)
+    conditions = " OR ".join("(b.band=? AND b.value=?)" for _ in band_list)
+    sql = f"""SELECT a.simhash FROM article_simhash_bands b JOIN articles a ON a.id = b.article_id
+              WHERE {conditions}"""
+    return sql, [x for pair in band_list for x in pair]
+
+
+def seen_keys_query(keys: list[str]) -> tuple[str, list]:
+    """已入库或留有墓碑的归一化链接（check_query_plans.py 也用它检查查询计划）"""
+    placeholders = ",".join("?" * len(keys))
+    sql = f"""SELECT url_key FROM articles WHERE url_key IN ({placeholders})
+              UNION ALL SELECT url_key FROM article_tombstones WHERE url_key IN ({placeholders})"""
+    return sql, keys + keys
+
+
+async def _has_near_duplicate(db, value: int) -> bool:
+    """按 SimHash 分段索引查候选，再精确比较汉明距离"""
+    cursor = await db.execute(*near_duplicate_query(value))
+    return any(
+        fingerprint.distance(value, row[0]) <= SIMHASH_MAX_DISTANCE for row in await cursor.fetchall()
+    )
+
+
+async def _drop_near_duplicates(db, candidates: list[dict]) -> list[dict]:
+    """去掉归一化链接已存在（含已被保留策略清理、留有墓碑的）、或与已有/同批文章 SimHash 相近的条目
+    （原地补充 url_key / simhash）"""
+    for a in candidates:
+        a["url_key"] = fingerprint.normalize_url(a["link"])
+        a["simhash"] = fingerprint.simhash(fingerprint.article_text(a))
+    if not candidates:
+        return []
+
+    cursor = await db.execute(*seen_keys_query(list({a["url_key"] for a in candidates})))
+    seen_keys = {row[0] for row in await cursor.fetchall()}
+
+    kept = []
+    batch_bands: dict[tuple[int, int], list[int]] = {}
+    for a in candidates:
+        if a["url_key"] in seen_keys:
+            continue
+        value = a["simhash"]
+        if value is not None:
+            band_list = fingerprint.bands(value)
+            in_batch = any(
+                fingerprint.distance(value, other) <= SIMHASH_MAX_DISTANCE
+                for band in band_list for other in batch_bands.get(band, [])
+            )
+            if in_batch or await _has_near_duplicate(db, value):
+                continue
+            for band in band_list:
+                batch_bands.setdefault(band, []).append(value)
+        seen_keys.add(a["url_key"])
+        kept.append(a)
+    return kept
+
+
+async def store_articles(db, articles: list[dict]) -> dict:
+    """批量写入文章（按 link 去重，并丢弃跨源近似重复），每 INGEST_CHUNK_SIZE 条一组
+
+    调用方已开启事务时只在其中写入，提交或回滚由调用方负责（如调度器把一轮抓取的写入合成一个事务）；
+    否则每组自己开一个写事务并提交。
+
+    返回 {"inserted", "updated", "duplicates", "near_duplicates", "new_ids"}：
+    - inserted: 真正新增的条数，new_ids 为其 id，供后续流程（全文预取等）使用
+    - updated: 已存在但标题/摘要有变化而被更新的条数
+    - duplicates: 已存在且无变化（或同批重复）的条数
+    - near_duplicates: 链接归一化后相同（含已清理的）或内容指纹相近而被丢弃的条数
+    """
+    result = {"inserted": 0, "updated": 0, "duplicates": 0, "near_duplicates": 0, "new_ids": []}
+    for i in range(0, len(articles), INGEST_CHUNK_SIZE):
+        chunk = articles[i:i + INGEST_CHUNK_SIZE]
+        by_link = {}
+        for a in chunk:
+            by_link.setdefault(a["link"], a)
+        result["duplicates"] += len(chunk) - len(by_link)
+
+        owns_transaction = not db.in_transaction
+        if owns_transaction:
+            await db.execute("BEGIN IMMEDIATE")
+        try:
+            links = list(by_link)
+            placeholders = ",".join("?" * len(links))
+            cursor = await db.execute(
+                f"SELECT id, link, title, summary FROM articles WHERE link IN ({placeholders})", links
+            )
+            existing = {row[1]: row for row in await cursor.fetchall()}
+
+            candidates = [a for link, a in by_link.items() if link not in existing]
+            kept = await _drop_near_duplicates(db, candidates)
+            new_rows = [
+                (a["title"], a["summary"], a["link"], a["source"], a["category"],
+                 a.get("content_type", "文章"), a["published_at"], a["url_key"], a["simhash"])
+                for a in kept
+            ]
+            changed_rows = [
+                (a["title"], a["summary"], a["summary"], existing[link][0])
+                for link, a in by_link.items()
+                if link in existing and (a["title"], a["summary"]) != (existing[link][2], existing[link][3])
+            ]
+
+            # rowcount 只计语句本身插入的行（total_changes 还会算上全文索引触发器写入的行）
+            cursor = await db.executemany(
+                """INSERT OR IGNORE INTO articles
+                   (title, summary, link, source, category, content_type, published_at,
+                    url_key, simhash)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                new_rows,
+            )
+            inserted = cursor.rowcount
+            # 正文存在 bodies 表（见 services/bodies.py），这里只清掉未迁移旧行里与旧摘要相同的正文副本，
+            # 已抓取的全文不动
+            await db.executemany(
+                """UPDATE articles SET
+                       content=CASE WHEN content=summary THEN NULL ELSE content END,
+                       title=?, summary=?
+                   WHERE id=?""",
+                [(r[0], r[1], r[3]) for r in changed_rows],
+            )
+
+            if inserted and kept:
+                placeholders = ",".join("?" * len(kept))
+                cursor = await db.execute(
+                    f"SELECT id, simhash, link FROM articles WHERE link IN ({placeholders}) ORDER BY id",
+                    [a["link"] for a in kept],
+                )
+                new_rows = await cursor.fetchall()
+                result["new_ids"].extend(row[0] for row in new_rows)
+                # 订阅里带全文（与摘要不同）时才单独存正文，否则详情页直接用摘要
+                by_kept_link = {a["link"]: a for a in kept}
+                await bodies.put_many(db, bodies.ARTICLE, [
+                    (row[0], by_kept_link[row[2]]["content"])
+                    for row in new_rows
+                    if by_kept_link[row[2]].get("content") not in (None, "", by_kept_link[row[2]]["summary"])
+                ])
+                await db.executemany(
+                    "INSERT OR IGNORE INTO article_simhash_bands (band, value, article_id) VALUES (?, ?, ?)",
+                    [
+                        (band, value, row[0])
+                        for row in new_rows if row[1] is not None
+                        for band, value in fingerprint.bands(row[1])
+                    ],
+                )
+            if owns_transaction:
+                await db.commit()
+        except BaseException:
+            if owns_transaction:
+                await db.rollback()
+            raise
+
+        result["inserted"] += inserted
+        result["updated"] += len(changed_rows)
+        result["near_duplicates"] += len(candidates) - len(kept)
+        result["duplicates"] += len(by_link) - len(candidates) - len(changed_rows) + len(kept) - inserted
+    return result
+
+
+async def backfill_fingerprints(db, batch_size: int, after: int) -> tuple[int, int]:
+    """为一批没有指纹的旧文章补算 url_key / simhash 并提交，返回 (本批条数, 最后一条 id)"""
+    cursor = await db.execute(BACKFILL_SQL, (after, batch_size))
+    rows = await cursor.fetchall()
+    if not rows:
+        return 0, after
+    updates, band_rows = [], []
+    for row in rows:
+        value = fingerprint.simhash(fingerprint.article_text({"title": row[2], "summary": row[3]}))
+        updates.append((fingerprint.normalize_url(row[1] or ""), value, row[0]))
+        if value is not None:
+            band_rows.extend((band, v, row[0]) for band, v in fingerprint.bands(value))
+    await db.executemany("UPDATE articles SET url_key=?, simhash=? WHERE id=?", updates)
+    await db.executemany(
+        "INSERT OR IGNORE INTO article_simhash_bands (band, value, article_id) VALUES (?, ?, ?)", band_rows
+    )
+    await db.commit()
+    return len(rows), rows[-1][0]
@@ -0,0 +1,140 @@
+"""AI 响应缓存：同样的输入不重复调用大模型
+
+- 键：sha256(用途, 提示词版本, base_url, 模型, messages, max_tokens)，内容寻址，输入或模板一变自然不命中
+- 两级：进程内 LRU（LLM_CACHE_MEMORY_ITEMS 条）+ SQLite 表 llm_cache（LLM_CACHE_TTL_DAYS 天过期，压缩存储）
+- 同一个键并发未命中时只调用一次模型，其余等待同一结果
+- 过期行读取时视为未命中，由保留策略的定期清理删除（见 services/retention.py）
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable
+from database import connection
+from config import LLM_CACHE_MEMORY_ITEMS, LLM_CACHE_TTL_DAYS
+from services import bodies
+
+GET_SQL = "SELECT data, expires_at FROM llm_cache WHERE key=? AND expires_at > ?"
+PURGE_SQL = "DELETE FROM llm_cache WHERE expires_at <= ?"
+
+_memory: OrderedDict[str, tuple[str, float]] = OrderedDict()  # 键 -> (响应, 过期时间戳)
+_inflight: dict[str, asyncio.Future] = {}
+# misses 为实际调用模型的次数；coalesced 为等待同一键进行中的生成、没有重复调用的次数
+_stats = {"memory_hits": 0, "db_hits": 0, "coalesced": 0, "misses": 0, "stores": 0}
+
+
+def make_key(kind: str, version: int, base_url: str, model: str, messages: list[dict], max_tokens: int) -> str:
+    payload = json.dumps([kind, version, base_url, model, messages, max_tokens], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _remember(key: str, text: str, expires_at: float):
+    _memory[key] = (text, expires_at)
+    _memory.move_to_end(key)
+    while len(_memory) > LLM_CACHE_MEMORY_ITEMS:
+        _memory.popitem(last=False)
+
+
+async def get(key: str) -> str | None:
+    """先查内存再查库，库里命中的放回内存；未命中返回 None（计入 misses）"""
+    now = time.time()
+    entry = _memory.get(key)
+    if entry and entry[1] > now:
+        _memory.move_to_end(key)
+        _stats["memory_hits"] += 1
+        return entry[0]
+    if entry:
+        del _memory[key]
+
+    async with connection() as db:
+        cursor = await db.execute(GET_SQL, (key, now))
+        row = await cursor.fetchone()
+    if not row:
+        _stats["misses"] += 1
+        return None
+    text = bodies.decompress(row[0])
+    _remember(key, text, row[1])
+    _stats["db_hits"] += 1
+    return text
+
+
+async def put(key: str, kind: str, text: str):
+    """写入两级缓存；空响应不缓存"""
+    if not text:
+        return
+    now = time.time()
+    expires_at = now + LLM_CACHE_TTL_DAYS * 86400
+    _remember(key, text, expires_at)
+    try:
+        async with connection() as db:
+            await db.execute(
+                """INSERT OR REPLACE INTO llm_cache (key, kind, data, created_at, expires_at)
+                   VALUES (?, ?, ?, ?, ?)""",
+                (key, kind, bodies.compress(text), now, expires_at),
+            )
+            await db.commit()
+    except Exception as e:
+        # 写库失败只影响缓存，不影响本次结果
+        print(f"[AI缓存] 写入失败: {e!r}")
+        return
+    _stats["stores"] += 1
+
+
+async def get_or_create(key: str, kind: str, create: Callable[[], Awaitable[str]]) -> str:
+    """命中直接返回；未命中调用 create() 生成并写入缓存。同一个键同时只生成一次"""
+    pending = _inflight.get(key)
+    if pending is not None:
+        _stats["coalesced"] += 1
+        return await asyncio.shield(pending)
+    cached = await get(key)
+    if cached is not None:
+        return cached
+    # get 期间可能已有别的请求开始生成
+    pending = _inflight.get(key)
+    if pending is not None:
+        _stats["misses"] -= 1
+        _stats["coalesced"] += 1
+        return await asyncio.shield(pending)
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        text = await create()
+        await put(key, kind, text)
+        future.set_result(text)
+        return text
+    except asyncio.CancelledError:
+        # 生成方被取消（如请求超时）不应把取消传给等待同一结果的其他请求
+        future.set_exception(RuntimeError("生成被中断，请重试"))
+        future.exception()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # 没有其他等待者时避免 "exception was never retrieved" 警告
+        future.exception()
+        raise
+    finally:
+        del _inflight[key]
+
+
+async def purge_expired(db) -> int:
+    """删除过期的缓存行（不提交，由调用方控制事务）"""
+    cursor = await db.execute(PURGE_SQL, (time.time(),))
+    return cursor.rowcount
+
+
+async def stats(db) -> dict:
+    cursor = await db.execute(
+        "SELECT kind, COUNT(*), COALESCE(SUM(length(CAST(data AS BLOB))), 0) FROM llm_cache GROUP BY kind"
+    )
+    kinds = {row[0]: {"count": row[1], "stored_bytes": row[2]} for row in await cursor.fetchall()}
+    hits = _stats["memory_hits"] + _stats["db_hits"] + _stats["coalesced"]
+    lookups = hits + _stats["misses"]
+    return {
+        **_stats,
+        "hit_rate": round(hits / lookups, 3) if lookups else None,
+        "memory_items": len(_memory),
+        "stored": kinds,
+    }
@@ -0,0 +1,52 @@
+"""OPML 解析与生成（订阅列表导入/导出）"""
+
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from xml.sax.saxutils import escape, quoteattr
+from config import CATEGORIES
+
+
+def parse_opml(data: bytes, default_category: str = "科技") -> list[dict]:
+    """提取所有带 xmlUrl 的 outline；上级 outline 的名称若是已知分类则作为分类"""
+    root = ET.fromstring(data)
+    body = root.find("body")
+    if body is None:
+        raise ValueError("不是有效的 OPML 文件")
+
+    feeds = []
+
+    def walk(node, category):
+        for outline in node.findall("outline"):
+            url = (outline.get("xmlUrl") or "").strip()
+            label = (outline.get("title") or outline.get("text") or "").strip()
+            if url:
+                feeds.append({"url": url, "name": label, "category": category})
+            else:
+                walk(outline, label if label in CATEGORIES and label != "全部" else category)
+
+    walk(body, default_category)
+    return feeds
+
+
+def opml_header(title: str) -> str:
+    now = format_datetime(datetime.now(timezone.utc))
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<opml version="2.0">\n'
+        f"  <head>\n    <title>{escape(title)}</title>\n    <dateCreated>{now}</dateCreated>\n  </head>\n"
+        "  <body>\n"
+    )
+
+
+def opml_category_open(category: str) -> str:
+    return f"    <outline text={quoteattr(category)} title={quoteattr(category)}>\n"
+
+
+def opml_feed(url: str, name: str) -> str:
+    label = quoteattr(name or url)
+    return f'      <outline type="rss" text={label} title={label} xmlUrl={quoteattr(url)}/>\n'
+
+
+OPML_CATEGORY_CLOSE = "    </outline>\n"
+OPML_FOOTER = "  </body>\n</opml>\n"
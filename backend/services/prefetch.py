@@ -0,0 +1,88 @@
+"""全文预取：新入库的文章在后台抓取全文，打开文章时直接读库
+
+- PREFETCH_WORKERS 个 worker 并发消费队列
+- 按站点限速由 http_client 的令牌桶统一负责
+- 队列满时直接丢弃，阅读时的按需抓取仍然兜底
+"""
+
+import asyncio
+from database import connection
+from config import PREFETCH_WORKERS, PREFETCH_QUEUE_MAX
+from services import rss_service, bodies
+
+_queue: asyncio.Queue | None = None
+_workers: list[asyncio.Task] = []
+
+
+def needs_full_content(article: dict) -> bool:
+    """正文为空、等于摘要或过短时需要抓取全文"""
+    content = article.get("content") or ""
+    return bool(article.get("link")) and (
+        not content or content == (article.get("summary") or "") or len(content) < 300
+    )
+
+
+def enqueue(article_ids: list[int]) -> int:
+    """把文章加入预取队列，返回实际入队数量"""
+    if _queue is None:
+        return 0
+    queued = 0
+    for article_id in article_ids:
+        try:
+            _queue.put_nowait(article_id)
+            queued += 1
+        except asyncio.QueueFull:
+            break
+    return queued
+
+
+async def _prefetch_one(article_id: int):
+    async with connection() as db:
+        cursor = await db.execute("SELECT id, link, content, summary FROM articles WHERE id=?", (article_id,))
+        row = await cursor.fetchone()
+        article = await bodies.fill_article(db, dict(row)) if row else None
+    if not article or not needs_full_content(article):
+        return
+
+    full = await rss_service.fetch_article_full_content(article["link"])
+    if full and len(full) > len(article["content"] or ""):
+        async with connection() as db:
+            # 只在正文未被其他请求写入更长内容时覆盖
+            await db.execute("BEGIN IMMEDIATE")
+            current = await bodies.get(db, bodies.ARTICLE, article_id)
+            if len(current or "") < len(full):
+                await bodies.put(db, bodies.ARTICLE, article_id, full)
+            await db.commit()
+
+
+async def _worker():
+    while True:
+        article_id = await _queue.get()
+        try:
+            await _prefetch_one(article_id)
+        except Exception as e:
+            print(f"[预取] 文章 {article_id} 失败: {e!r}")
+        finally:
+            _queue.task_done()
+
+
+def start():
+    """在 lifespan 中启动预取 worker"""
+    global _queue
+    if _workers:
+        return
+    _queue = asyncio.Queue(maxsize=PREFETCH_QUEUE_MAX)
+    _workers.extend(asyncio.create_task(_worker()) for _ in range(PREFETCH_WORKERS))
+
+
+async def stop():
+    global _queue
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    _queue = None
+
+
+def status() -> dict:
+    return {"queued": _queue.qsize() if _queue else 0, "workers": len(_workers)}
@@ -0,0 +1,182 @@
+"""文章保留：按策略清理旧文章，留墓碑防止重新入库，增量回收空间
+
+- 策略见 config.RETENTION_POLICIES，默认不清理任何文章；收藏、稍后读、写过总结或做过费曼练习的文章永不清理
+- 每批删除 RETENTION_BATCH 篇、一个事务，批次之间让出写锁；正文、指纹、搜索索引由触发器一并删除
+- 被清理文章的归一化链接记入 article_tombstones，入库去重时视为已存在；墓碑过期后删除
+- 顺带删除过期的 AI 响应缓存（见 services/llm_cache.py）
+- 删除后用 PRAGMA incremental_vacuum 分批把空闲页还给文件系统（auto_vacuum=INCREMENTAL：新库建库时设置，旧库用 compact_db.py 切换）
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from database import connection
+from config import (
+    RETENTION_POLICIES, RETENTION_INTERVAL, RETENTION_START_DELAY, RETENTION_BATCH,
+    RETENTION_PAUSE, RETENTION_VACUUM_PAGES, RETENTION_TOMBSTONE_DAYS,
+)
+from services import fingerprint, article_state, llm_cache
+
+# 不论哪条策略都要保留的文章
+_PROTECTED = """is_favorite=0 AND read_later=0
+    AND NOT EXISTS (SELECT 1 FROM summaries s WHERE s.article_id = articles.id)
+    AND NOT EXISTS (SELECT 1 FROM feynman_sessions f WHERE f.article_id = articles.id)"""
+
+TOMBSTONE_EXPIRE_SQL = "DELETE FROM article_tombstones WHERE deleted_at < ?"
+
+_task: asyncio.Task | None = None
+_wake: asyncio.Event | None = None
+_status = {"running": False, "last_run_at": None, "last_deleted": {}, "last_vacuumed_pages": 0}
+
+
+def _cutoff(days: int) -> str:
+    return (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def candidate_query(condition: str, days: int, limit: int = RETENTION_BATCH) -> tuple[str, list]:
+    """某条策略下可清理的一批文章（check_query_plans.py 也用它检查查询计划）。
+    published_at 只有日期，按日期比较；created_at 防止刚入库的旧文章被立即清理"""
+    cutoff = _cutoff(days)
+    sql = f"""SELECT id, link, url_key FROM articles
+              WHERE published_at < ? AND created_at < ? AND {condition} AND {_PROTECTED}
+              ORDER BY published_at LIMIT ?"""
+    return sql, [cutoff[:10], cutoff, limit]
+
+
+async def tombstone(db, rows) -> None:
+    """为将要删除的文章（id, link, url_key）记墓碑；不提交，由调用方控制事务"""
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    await db.executemany(
+        "INSERT OR REPLACE INTO article_tombstones (url_key, deleted_at) VALUES (?, ?)",
+        [(row[2] or fingerprint.normalize_url(row[1]), now) for row in rows if row[1]],
+    )
+
+
+async def _purge(condition: str, days: int) -> int:
+    deleted = 0
+    while True:
+        # 先把未落库的收藏 / 稍后读写进去，免得刚收藏的文章按旧状态被删
+        await article_state.flush()
+        async with connection() as db:
+            await db.execute("BEGIN IMMEDIATE")
+            try:
+                sql, params = candidate_query(condition, days)
+                cursor = await db.execute(sql, params)
+                rows = await cursor.fetchall()
+                if rows:
+                    await tombstone(db, rows)
+                    await db.execute(
+                        f"DELETE FROM articles WHERE id IN ({','.join('?' * len(rows))})", [row[0] for row in rows]
+                    )
+                await db.commit()
+            except BaseException:
+                await db.rollback()
+                raise
+        deleted += len(rows)
+        if len(rows) < RETENTION_BATCH:
+            return deleted
+        await asyncio.sleep(RETENTION_PAUSE)
+
+
+async def _vacuum() -> int:
+    """分批回收空闲页，返回回收的页数"""
+    freed = 0
+    while True:
+        async with connection() as db:
+            cursor = await db.execute("PRAGMA freelist_count")
+            before = (await cursor.fetchone())[0]
+            if not before:
+                return freed
+            # 每回收一页是语句的一步，execute 只执行第一步，executescript 才会执行到底
+            await db.executescript(f"PRAGMA incremental_vacuum({RETENTION_VACUUM_PAGES});")
+            cursor = await db.execute("PRAGMA freelist_count")
+            after = (await cursor.fetchone())[0]
+        freed += before - after
+        if after == before:
+            # auto_vacuum 未开启（旧库切换失败等），回收不了
+            return freed
+        await asyncio.sleep(RETENTION_PAUSE)
+
+
+async def run() -> dict:
+    """按全部策略清理一轮，返回 {策略名: 删除篇数}"""
+    _status["running"] = True
+    try:
+        deleted = {}
+        for name, condition, days in RETENTION_POLICIES:
+            if days is not None:
+                deleted[name] = await _purge(condition, days)
+        async with connection() as db:
+            await db.execute(TOMBSTONE_EXPIRE_SQL, (_cutoff(RETENTION_TOMBSTONE_DAYS),))
+            await llm_cache.purge_expired(db)
+            await db.commit()
+        vacuumed = await _vacuum()
+        _status.update(
+            last_run_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            last_deleted=deleted,
+            last_vacuumed_pages=vacuumed,
+        )
+        if any(deleted.values()):
+            print(f"[保留] 清理文章 {deleted}，回收 {vacuumed} 页")
+        return deleted
+    finally:
+        _status["running"] = False
+
+
+async def _loop():
+    try:
+        await asyncio.wait_for(_wake.wait(), timeout=RETENTION_START_DELAY)
+    except asyncio.TimeoutError:
+        pass
+    while True:
+        _wake.clear()
+        try:
+            await run()
+        except Exception as e:
+            print(f"[保留] 清理出错: {e!r}")
+        try:
+            await asyncio.wait_for(_wake.wait(), timeout=RETENTION_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start():
+    """在 lifespan 中启动定期清理（init_pool 之后）"""
+    global _task, _wake
+    if _task is None or _task.done():
+        _wake = asyncio.Event()
+        _task = asyncio.create_task(_loop())
+
+
+async def stop():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        await asyncio.gather(_task, return_exceptions=True)
+        _task = None
+
+
+def run_now() -> bool:
+    """立即清理一轮（不等待结果）；返回 False 表示未启动或正在清理"""
+    if _task is None or _task.done() or _status["running"]:
+        return False
+    _wake.set()
+    return True
+
+
+async def stats(db) -> dict:
+    """各策略当前可清理的篇数、墓碑数，以及上次清理的结果"""
+    candidates = {}
+    for name, condition, days in RETENTION_POLICIES:
+        if days is None:
+            continue
+        sql, params = candidate_query(condition, days, -1)
+        cursor = await db.execute(f"SELECT COUNT(*) FROM ({sql})", params)
+        candidates[name] = (await cursor.fetchone())[0]
+    cursor = await db.execute("SELECT COUNT(*) FROM article_tombstones")
+    tombstones = (await cursor.fetchone())[0]
+    return {
+        "policies": [{"name": n, "condition": c, "days": d} for n, c, d in RETENTION_POLICIES],
+        "candidates": candidates,
+        "tombstones": tombstones,
+        **_status,
+    }
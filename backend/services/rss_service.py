@@ -1,109 +1,335 @@
 import feedparser
 import asyncio
-from datetime import datetime
-from config import RSS_SOURCES
+import hashlib
+import re
 import time
+from datetime import datetime
+from config import (
+    RSS_SOURCES, FEED_CONCURRENCY, FEED_TIMEOUT, REFRESH_DEADLINE,
+    FULLTEXT_TIMEOUT, FULLTEXT_MAX_BYTES, FULLTEXT_ENOUGH_BYTES,
+    FEED_MAX_ENTRIES, FEED_FIRST_POLL_ENTRIES,
+)
+from services import http_client, extraction
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_feed_semaphore = asyncio.Semaphore(FEED_CONCURRENCY)
+
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
 
 def _parse_date(entry) -> str:
     """从RSS entry解析发布日期"""
+    ts = _entry_timestamp(entry)
+    return ts[:10] if ts else datetime.now().strftime("%Y-%m-%d")
+
+
+def _entry_timestamp(entry) -> str | None:
+    """从RSS entry解析完整发布时间（YYYY-mm-dd HH:MM:SS），无法解析时返回 None"""
     for field in ("published_parsed", "updated_parsed", "created_parsed"):
         val = getattr(entry, field, None)
         if val:
             try:
-                return datetime(*val[:6]).strftime("%Y-%m-%d")
+                return datetime(*val[:6]).strftime("%Y-%m-%d %H:%M:%S")
             except Exception:
                 pass
-    return datetime.now().strftime("%Y-%m-%d")
+    return None
 
 
-def _fetch_feed(source: dict) -> list[dict]:
-    """同步获取单个RSS源的文章（feedparser是同步的）"""
-    articles = []
-    try:
-        feed = feedparser.parse(source["url"])
-        entries = feed.entries[:5]  # 每源最多5篇
-        for entry in entries:
-            title = getattr(entry, "title", "").strip()
-            link = getattr(entry, "link", "").strip()
-            if not title or not link:
+def _entry_guid(entry) -> str:
+    return (getattr(entry, "id", "") or getattr(entry, "link", "")).strip()
+
+
+def _new_entries(feed, state: dict) -> tuple[list, dict]:
+    """按游标取出上次之后的新条目（最新的在前），返回 (条目列表, 新游标)
+
+    遇到上次的 guid 即停止。发布时间只在源里的条目都没有 guid / 链接时才用来过滤，且只跳过早于游标的：
+    只有日期的 pubDate、同一秒发布、补发的旧日期都会出现等于或早于游标的新条目，
+    按时间过滤会把它们永久漏掉；多取的旧条目由入库时的链接去重挡掉。
+    数量上限为 FEED_MAX_ENTRIES（首次抓取为 FEED_FIRST_POLL_ENTRIES）。
+    """
+    entries = list(feed.entries)
+    # 少数源按时间正序输出，统一成最新在前，游标才能在遇到旧条目时停下
+    first_ts = _entry_timestamp(entries[0]) if entries else None
+    last_ts = _entry_timestamp(entries[-1]) if entries else None
+    if first_ts and last_ts and first_ts < last_ts:
+        entries.reverse()
+
+    cursor_guid = state.get("cursor_guid")
+    cursor_ts = state.get("cursor_published")
+    limit = FEED_MAX_ENTRIES if cursor_guid or cursor_ts else FEED_FIRST_POLL_ENTRIES
+    by_time = cursor_ts and not any(map(_entry_guid, entries))
+
+    fresh = []
+    for entry in entries:
+        if len(fresh) >= limit:
+            break
+        if cursor_guid and _entry_guid(entry) == cursor_guid:
+            break
+        if by_time:
+            ts = _entry_timestamp(entry)
+            if ts and ts < cursor_ts:
                 continue
-            summary = getattr(entry, "summary", "") or getattr(entry, "description", "")
-            # 清理HTML标签（简单处理）
-            import re
-            summary = re.sub(r"<[^>]+>", "", summary).strip()
-            summary = summary[:500] if summary else ""
-
-            articles.append({
-                "title": title,
-                "summary": summary,
-                "content": summary,
-                "link": link,
-                "source": source["name"],
-                "category": source["category"],
-                "content_type": source.get("type") or ("简讯" if len(summary) < 400 else "文章"),
-                "published_at": _parse_date(entry),
-            })
-    except Exception as e:
-        print(f"[RSS] 获取失败 {source['name']}: {e}")
+        fresh.append(entry)
+
+    if not fresh:
+        return [], {}
+    timestamps = [ts for ts in map(_entry_timestamp, fresh) if ts]
+    return fresh, {
+        "cursor_guid": _entry_guid(fresh[0]),
+        "cursor_published": max(timestamps + ([cursor_ts] if cursor_ts else []), default=None),
+    }
+
+
+def _entries_to_articles(entries: list, source: dict) -> list[dict]:
+    """把解析后的 feed 条目转换为文章字典"""
+    articles = []
+    for entry in entries:
+        title = getattr(entry, "title", "").strip()
+        link = getattr(entry, "link", "").strip()
+        if not title or not link:
+            continue
+        summary = getattr(entry, "summary", "") or getattr(entry, "description", "")
+        # 清理HTML标签（简单处理）
+        summary = _TAG_RE.sub("", summary).strip()
+        summary = summary[:500] if summary else ""
+
+        articles.append({
+            "title": title,
+            "summary": summary,
+            "content": summary,
+            "link": link,
+            "source": source["name"],
+            "category": source["category"],
+            "content_type": source.get("type") or ("简讯" if len(summary) < 400 else "文章"),
+            "published_at": _parse_date(entry),
+        })
+    return articles
+
+
+async def _fetch_feed(source: dict, state: dict) -> list[dict]:
+    """获取单个RSS源的文章（条件请求 + 内容哈希，未变化时跳过解析），失败时抛出异常
+
+    state 为该源的抓取状态（etag / last_modified / content_hash / 游标），仅在成功处理后原地更新，
+    这样超时取消或解析失败都不会留下“已抓取”的假状态。
+    """
+    headers = {}
+    if state.get("etag"):
+        headers["If-None-Match"] = state["etag"]
+    if state.get("last_modified"):
+        headers["If-Modified-Since"] = state["last_modified"]
+
+    resp = await http_client.request("GET", source["url"], headers=headers, timeout=FEED_TIMEOUT)
+    checked_at = _now()
+    if resp.status_code == 304:
+        state["checked_at"] = checked_at
+        return []  # 未修改
+    resp.raise_for_status()
+
+    new_state = {
+        "etag": resp.headers.get("etag") or state.get("etag"),
+        "last_modified": resp.headers.get("last-modified") or state.get("last_modified"),
+        "checked_at": checked_at,
+    }
+    body = resp.content
+    content_hash = hashlib.sha1(body).hexdigest()
+    if content_hash == state.get("content_hash"):
+        state.update(new_state)
+        return []  # 服务端不支持条件请求，但内容未变
+
+    # feedparser 只负责解析已下载的字节，放到线程里避免阻塞事件循环
+    feed = await asyncio.to_thread(
+        feedparser.parse, body, response_headers={"content-type": resp.headers.get("content-type", "")}
+    )
+    entries, cursor = _new_entries(feed, state)
+    articles = _entries_to_articles(entries, source)
+    new_state.update(cursor, content_hash=content_hash, updated_at=checked_at)
+    state.update(new_state)
     return articles
 
 
-async def fetch_all_articles(extra_sources=None) -> list[dict]:
-    """并发获取所有RSS源的文章（含用户自定义源）"""
+async def _fetch_timed(source: dict, state: dict) -> tuple[dict, list[dict], int, str | None]:
+    """抓取单个源并计时，返回 (source, 文章列表, 耗时毫秒, 错误信息)"""
+    async with _feed_semaphore:
+        start = time.perf_counter()
+        try:
+            articles, error = await _fetch_feed(source, state), None
+        except Exception as e:
+            articles, error = [], str(e) or type(e).__name__
+            print(f"[RSS] 获取失败 {source['name']}: {error}")
+        return source, articles, int((time.perf_counter() - start) * 1000), error
+
+
+async def iter_feeds(sources: list[dict], feed_states: dict):
+    """并发抓取一组源，按完成顺序逐个产出 (source, 文章列表, 耗时毫秒, 错误信息)
+
+    并发数受 FEED_CONCURRENCY 限制，整轮不超过 REFRESH_DEADLINE，超时未完成的源以错误形式产出。
+    feed_states: {url: state}，由 load_feed_states 读出，抓取后原地更新，再交给 save_feed_states 持久化。
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + REFRESH_DEADLINE
+    tasks = {
+        asyncio.create_task(_fetch_timed(source, feed_states.setdefault(source["url"], {}))): source
+        for source in sources
+    }
+    pending = set(tasks)
+    try:
+        while pending:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+    if pending:
+        print(f"[RSS] {len(pending)} 个源超过刷新时限 {REFRESH_DEADLINE}s，本轮跳过")
+    for task in pending:
+        yield tasks[task], [], int(REFRESH_DEADLINE * 1000), "超过刷新时限"
+
+
+async def fetch_feeds(sources: list[dict], feed_states: dict) -> dict[str, list[dict]]:
+    """并发抓取一组源，返回 {url: 文章列表}（失败或超时的源不出现在结果中）"""
+    return {
+        source["url"]: articles
+        async for source, articles, _, error in iter_feeds(sources, feed_states)
+        if error is None
+    }
+
+
+async def fetch_all_articles(extra_sources=None, feed_states: dict | None = None) -> list[dict]:
+    """并发获取所有RSS源的文章（含用户自定义源），按链接去重、按日期倒序"""
     all_sources = RSS_SOURCES + (extra_sources or [])
-    loop = asyncio.get_event_loop()
-    tasks = [
-        loop.run_in_executor(None, _fetch_feed, source)
-        for source in all_sources
-    ]
-    results = await asyncio.gather(*tasks, return_exceptions=True)
+    results = await fetch_feeds(all_sources, feed_states if feed_states is not None else {})
 
     all_articles = []
     seen_links = set()
-    for result in results:
-        if isinstance(result, list):
-            for article in result:
-                if article["link"] not in seen_links:
-                    seen_links.add(article["link"])
-                    all_articles.append(article)
+    for articles in results.values():
+        for article in articles:
+            if article["link"] not in seen_links:
+                seen_links.add(article["link"])
+                all_articles.append(article)
 
     # 按发布日期倒序
     all_articles.sort(key=lambda x: x.get("published_at", ""), reverse=True)
     return all_articles
 
 
-async def fetch_article_full_content(url: str) -> str:
-    """按需抓取文章完整正文（httpx + 正则，无额外依赖）"""
-    import httpx, re, html as html_lib
-
+async def probe_feed(url: str) -> dict:
+    """校验订阅链接并识别类型，返回 {ok, feed_type, title, content_type, error}"""
     try:
-        async with httpx.AsyncClient(
-            timeout=12.0,
-            follow_redirects=True,
-            headers={"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/120.0"}
-        ) as client:
-            resp = await client.get(url)
-            raw = resp.text
-
-        # 删除 script / style / nav / header / footer / aside
-        raw = re.sub(
-            r"<(script|style|nav|header|footer|aside|noscript)[^>]*>.*?</\1>",
-            "", raw, flags=re.DOTALL | re.IGNORECASE
+        resp = await http_client.request("GET", url, timeout=FEED_TIMEOUT)
+        resp.raise_for_status()
+        feed = await asyncio.to_thread(
+            feedparser.parse, resp.content, response_headers={"content-type": resp.headers.get("content-type", "")}
         )
-        # 提取段落
-        paragraphs = re.findall(r"<p[^>]*>(.*?)</p>", raw, flags=re.DOTALL | re.IGNORECASE)
-        texts = []
-        for p in paragraphs:
-            text = re.sub(r"<[^>]+>", "", p).strip()
-            text = html_lib.unescape(text)
-            text = re.sub(r"\s+", " ", text).strip()
-            if len(text) > 30:
-                texts.append(text)
-
-        result = "\n\n".join(texts)
-        return result if len(result) > 100 else ""
+        if not feed.version and not feed.entries:
+            return {"ok": False, "feed_type": None, "title": "", "content_type": None, "error": "不是有效的 RSS/Atom 订阅"}
+        summaries = [
+            _TAG_RE.sub("", getattr(e, "summary", "") or getattr(e, "description", ""))
+            for e in feed.entries[:10]
+        ]
+        avg_len = sum(map(len, summaries)) / len(summaries) if summaries else 0
+        return {
+            "ok": True,
+            "feed_type": feed.version or "unknown",
+            "title": (feed.feed.get("title") or "").strip(),
+            "content_type": "简讯" if avg_len < 400 else "文章",
+            "error": None,
+        }
+    except Exception as e:
+        return {"ok": False, "feed_type": None, "title": "", "content_type": None, "error": str(e) or type(e).__name__}
+
+
+async def load_feed_states(db) -> dict:
+    """读取所有源的抓取状态 {url: state}"""
+    cursor = await db.execute(
+        """SELECT url, etag, last_modified, content_hash, checked_at, updated_at,
+                  poll_interval, next_poll_at, cursor_guid, cursor_published
+           FROM feed_states"""
+    )
+    rows = await cursor.fetchall()
+    return {row["url"]: dict(row) for row in rows}
+
+
+async def save_feed_states(db, feed_states: dict):
+    """批量写回抓取状态（调用方负责 commit）"""
+    await db.executemany(
+        """INSERT INTO feed_states
+               (url, etag, last_modified, content_hash, checked_at, updated_at, poll_interval, next_poll_at,
+                cursor_guid, cursor_published)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+           ON CONFLICT(url) DO UPDATE SET
+               etag=excluded.etag,
+               last_modified=excluded.last_modified,
+               content_hash=excluded.content_hash,
+               checked_at=excluded.checked_at,
+               updated_at=excluded.updated_at,
+               poll_interval=excluded.poll_interval,
+               next_poll_at=excluded.next_poll_at,
+               cursor_guid=excluded.cursor_guid,
+               cursor_published=excluded.cursor_published""",
+        [
+            (url, st.get("etag"), st.get("last_modified"), st.get("content_hash"),
+             st.get("checked_at"), st.get("updated_at"), st.get("poll_interval"), st.get("next_poll_at"),
+             st.get("cursor_guid"), st.get("cursor_published"))
+            for url, st in feed_states.items()
+            if st.get("checked_at") or st.get("next_poll_at")
+        ],
+    )
+
+
+def _paragraph_len(low: bytearray, start: int, close: int) -> int:
+    """low[start:close] 中最后一个 <p ...> 开始标签到 close（</p> 的位置）之间的字节数，没有开始标签时为 0"""
+    pos = close
+    while (pos := low.rfind(b"<p", start, pos)) != -1:
+        # 排除 <pre>、<path> 等同样以 <p 开头的标签
+        if low[pos + 2:pos + 3] in (b">", b" ", b"\t", b"\n", b"\r", b"/"):
+            tag_end = low.find(b">", pos, close)
+            return close - tag_end - 1 if tag_end != -1 else 0
+    return 0
+
+
+async def _download_page(url: str) -> str:
+    """流式下载文章页面：只接受 HTML/文本，最多读 FULLTEXT_MAX_BYTES，段落内容足够时提前停止"""
+    async with http_client.stream("GET", url, timeout=FULLTEXT_TIMEOUT) as resp:
+        resp.raise_for_status()
+        content_type = resp.headers.get("content-type", "").lower()
+        if content_type and not any(t in content_type for t in ("html", "xml", "text/plain")):
+            return ""  # PDF、图片等非网页内容
+
+        # 这段在事件循环上跑：每块只在新收到的字节里找 </p>，每个字节最多看两遍，
+        # 不能每块都对整个缓冲区跑正则（遇到没闭合的 <p 会反复扫到上限，变成平方级）
+        buf = bytearray()
+        low = bytearray()    # buf 的小写副本，用于不区分大小写地查找标签
+        prev_end = 0         # 上一个 </p> 之后的位置，开始标签只在这之后找
+        search_from = 0
+        paragraph_bytes = 0
+        async for chunk in resp.aiter_bytes():
+            buf += chunk
+            low += chunk.lower()
+            if len(buf) >= FULLTEXT_MAX_BYTES:
+                del buf[FULLTEXT_MAX_BYTES:]
+                break
+            while (close := low.find(b"</p>", search_from)) != -1:
+                paragraph_bytes += _paragraph_len(low, prev_end, close)
+                prev_end = search_from = close + 4
+            # </p> 可能跨块，留 3 个字节下次重看
+            search_from = max(search_from, len(low) - 3)
+            if paragraph_bytes >= FULLTEXT_ENOUGH_BYTES:
+                break
+        return bytes(buf).decode(resp.charset_encoding or "utf-8", errors="replace")
+
+
+async def fetch_article_full_content(url: str) -> str:
+    """按需抓取文章完整正文（流式限量下载，正文提取交给 extraction 进程池）"""
+    try:
+        raw = await _download_page(url)
+        return await extraction.extract_text(raw) if raw else ""
     except Exception as e:
         print(f"[RSS] 抓取全文失败 {url}: {e}")
         return ""
-
@@ -0,0 +1,182 @@
+"""后台抓取调度：每个源按自己的间隔轮询，间隔随源的实际更新频率自适应
+
+- 本轮有新文章：间隔减半（不低于 POLL_MIN_INTERVAL）
+- 本轮无新文章：间隔放大 1.5 倍（不超过 POLL_MAX_INTERVAL）
+- 每轮最多处理 SCHEDULER_MAX_PER_TICK 个到期源，下次时间带少量随机抖动，避免所有源同时到期
+- 熔断中的源（见 source_health）直接跳过，不占用抓取名额
+- 同一时间只跑一轮（后台轮询、手动刷新互相排队）；手动刷新顺带抓了未到期的源、又没有新文章时不改它的间隔
+- 后台轮询一轮抓完后，文章、抓取状态、健康记录在同一个写事务里入库，一轮只拿一次写锁；
+  手动刷新的进度推送逐源入库，新文章尽快可见
+"""
+
+import asyncio
+import random
+from datetime import datetime, timedelta
+from database import connection
+from config import (
+    SCHEDULER_TICK, SCHEDULER_MAX_PER_TICK,
+    POLL_MIN_INTERVAL, POLL_MAX_INTERVAL, POLL_DEFAULT_INTERVAL,
+)
+from services import rss_service, ingestion, source_health, prefetch
+
+_task: asyncio.Task | None = None
+_poll_lock: asyncio.Lock | None = None
+_wake: asyncio.Event | None = None
+_force = False
+_status = {"running": False, "last_poll_at": None, "last_sources": 0, "last_added": 0}
+
+
+def _fmt(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _next_interval(source: dict, state: dict, added: int) -> int:
+    interval = state.get("poll_interval") or POLL_DEFAULT_INTERVAL.get(source.get("type"), 3600)
+    if added > 0:
+        interval = interval / 2
+    else:
+        interval = interval * 1.5
+    return int(min(POLL_MAX_INTERVAL, max(POLL_MIN_INTERVAL, interval)))
+
+
+async def _store_result(db, item, feed_states: dict, health: dict, due: set[str]) -> tuple[dict, list[int]]:
+    """写入一个源的抓取结果：文章、下次轮询时间、健康记录（不提交）。
+    due 为本轮本来就到期的源，不在其中又没有新文章的源保持原来的间隔和下次时间。
+    返回 (产出的结果, 新文章 id)"""
+    source, articles, latency_ms, error = item
+    url = source["url"]
+    state = feed_states[url]
+    added, new_ids = 0, []
+    if articles:
+        stored = await ingestion.store_articles(db, articles)
+        added, new_ids = stored["inserted"], stored["new_ids"]
+    if url in due or added:
+        interval = _next_interval(source, state, added)
+        state["poll_interval"] = interval
+        state["next_poll_at"] = _fmt(datetime.now() + timedelta(seconds=interval * random.uniform(0.9, 1.1)))
+    await source_health.save_health(
+        db, source_health.record(health.setdefault(url, {}), source, latency_ms, error)
+    )
+    return {"source": source["name"], "url": url, "added": added, "latency_ms": latency_ms, "error": error}, new_ids
+
+
+async def _store_batch(items: list, feed_states: dict, health: dict, due: set[str]) -> list[tuple[dict, list[int]]]:
+    """在一个写事务里写入一组源的抓取结果和抓取状态并提交，返回各源的 (结果, 新文章 id)"""
+    async with connection() as db:
+        await db.execute("BEGIN IMMEDIATE")
+        try:
+            stored = [await _store_result(db, item, feed_states, health, due) for item in items]
+            urls = [source["url"] for source, *_ in items]
+            await rss_service.save_feed_states(db, {url: feed_states[url] for url in urls})
+            await db.commit()
+        except BaseException:
+            await db.rollback()
+            raise
+    return stored
+
+
+async def iter_poll(force: bool = False, batch: bool = False):
+    """见 _poll。同一时间只有一轮在跑，后来的等前一轮结束再开始：
+    重叠的轮询会把每个源重复抓一遍，后一轮还会用“没有新文章”覆盖前一轮刚调小的间隔"""
+    global _poll_lock
+    if _poll_lock is None:
+        _poll_lock = asyncio.Lock()
+    async with _poll_lock:
+        async for result in _poll(force, batch):
+            yield result
+
+
+async def _poll(force: bool, batch: bool):
+    """抓取到期的源（force=True 时抓取全部），按完成顺序逐源产出结果
+
+    batch=False（手动刷新的进度推送）：每个源抓完立即入库并产出，新文章尽快可见；
+    batch=True（后台定时轮询）：一轮抓完后，文章、抓取状态、健康记录在同一个写事务里入库，一轮只拿一次写锁。
+    每个结果：{"source", "url", "added", "latency_ms", "error"}
+    """
+    async with connection() as db:
+        sources = await ingestion.load_sources(db)
+        feed_states = await rss_service.load_feed_states(db)
+        health = await source_health.load_health(db)
+
+    now = _fmt(datetime.now())
+    sources = [s for s in sources if not source_health.is_open(health.get(s["url"]), now)]
+    is_due = {s["url"] for s in sources if (feed_states.get(s["url"], {}).get("next_poll_at") or "") <= now}
+    due = [s for s in sources if force or s["url"] in is_due]
+    if not force:
+        due.sort(key=lambda s: feed_states.get(s["url"], {}).get("next_poll_at") or "")
+        due = due[:SCHEDULER_MAX_PER_TICK]
+    if not due:
+        return
+
+    _status["running"] = True
+    added_total = 0
+    try:
+        # 抓取期间不占用连接，入库时再从连接池借用
+        feeds = rss_service.iter_feeds(due, feed_states)
+
+        async def batches():
+            if batch:
+                yield [item async for item in feeds]
+            else:
+                async for item in feeds:
+                    yield [item]
+
+        async for items in batches():
+            for result, new_ids in await _store_batch(items, feed_states, health, is_due):
+                # 提交后新文章才对预取可见
+                prefetch.enqueue(new_ids)
+                added_total += result["added"]
+                yield result
+    finally:
+        _status.update(running=False, last_poll_at=_fmt(datetime.now()), last_sources=len(due), last_added=added_total)
+        if added_total:
+            print(f"[调度] 抓取 {len(due)} 个源，新增 {added_total} 篇")
+
+
+async def _run():
+    global _force
+    while True:
+        force, _force = _force, False
+        try:
+            async for _ in iter_poll(force=force, batch=True):
+                pass
+        except Exception as e:
+            print(f"[调度] 轮询出错: {e!r}")
+        try:
+            await asyncio.wait_for(_wake.wait(), timeout=SCHEDULER_TICK)
+        except asyncio.TimeoutError:
+            pass
+        _wake.clear()
+
+
+def start():
+    """在 lifespan 中启动后台轮询"""
+    global _task, _wake
+    if _task is None or _task.done():
+        _wake = asyncio.Event()
+        _task = asyncio.create_task(_run())
+
+
+async def stop():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+
+
+def poll_now() -> bool:
+    """立即轮询全部源（不等待结果）；返回 False 表示调度器未运行"""
+    global _force
+    if _task is None or _task.done():
+        return False
+    _force = True
+    _wake.set()
+    return True
+
+
+def status() -> dict:
+    return dict(_status)
@@ -0,0 +1,139 @@
+"""全文搜索：FTS5 索引覆盖文章、上传文件、热点，由触发器与源表保持同步
+
+- 分词：unicode61 按空白和标点切词，中文没有空格会整句成一个词，所以入索引前用 search_text()
+  在每个中日韩字符两侧插入不可见分隔符 U+2063（单字成词），查询时把关键词同样处理后作为短语匹配，
+  两个字的词（如“金融”）也能搜到；英文按单词匹配，支持末尾 * 前缀匹配
+- search_text() / body_text() 注册为 SQL 函数（见 database._register_functions），触发器里直接调用
+- rowid = 源表 id * 4 + 类型编号，同一张 FTS 表里三类内容互不冲突
+- 排序按 bm25（标题 > 摘要 > 正文），翻页游标为 (得分, rowid)
+"""
+
+import html
+import re
+from config import SEARCH_BODY_CHARS, SEARCH_SNIPPET_TOKENS
+
+KINDS = {"article": 1, "upload": 2, "hotspot": 3}
+
+_CJK = "぀-ヿ㐀-䶿一-鿿豈-﫿가-힯"
+_CJK_EDGE_RE = re.compile(f"(?<=[{_CJK}])(?=\\S)|(?<=\\S)(?=[{_CJK}])")
+# unicode61 把 Cf 类字符当分隔符；展示时直接删掉即可还原原文
+_SEPARATOR = "\u2063"
+_MARK_START, _MARK_END = "\x02", "\x03"
+
+# bm25 列权重：kind, owner_id（不索引）, title, summary, body
+_RANK = "bm25(search_index, 0, 0, 10.0, 3.0, 1.0)"
+
+
+def search_text(text: str | None) -> str | None:
+    """入索引 / 查询前的文本处理：中日韩字符与相邻字符之间插入分隔符"""
+    if not text:
+        return text
+    return _CJK_EDGE_RE.sub(_SEPARATOR, text[:SEARCH_BODY_CHARS])
+
+
+def _display(fragment: str | None) -> str:
+    """把 FTS 返回的片段还原成展示文本：去掉分隔符，转义后把标记换成 <mark>"""
+    if not fragment:
+        return ""
+    text = html.escape(fragment.replace(_SEPARATOR, "").strip())
+    return text.replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
+
+
+def build_match(query: str) -> str | None:
+    """用户输入 → FTS5 MATCH 表达式：每个空白分隔的词作为短语，词之间 AND；末尾 * 保留为前缀匹配"""
+    phrases = []
+    for term in query.split():
+        prefix = term.endswith("*") and len(term) > 1
+        term = term.rstrip("*")
+        if not term:
+            continue
+        phrase = '"' + search_text(term).replace('"', '""') + '"'
+        phrases.append(phrase + ("*" if prefix else ""))
+    return " ".join(phrases) or None
+
+
+def query(match: str, kind: str | None, after: list | None, limit: int) -> tuple[str, list]:
+    """搜索 SQL（check_query_plans.py 也用它检查查询计划），多取一行用于判断是否有下一页"""
+    conditions = ["search_index MATCH ?"]
+    params = [match]
+    if kind:
+        conditions.append("kind = ?")
+        params.append(kind)
+    if after:
+        conditions.append(f"({_RANK}, rowid) > (?, ?)")
+        params.extend(after)
+    params.append(limit + 1)
+    sql = f"""SELECT rowid, kind, owner_id, {_RANK} AS score,
+                     highlight(search_index, 2, char(2), char(3)) AS title,
+                     snippet(search_index, -1, char(2), char(3), '…', {SEARCH_SNIPPET_TOKENS}) AS snippet
+              FROM search_index
+              WHERE {' AND '.join(conditions)}
+              ORDER BY score, rowid
+              LIMIT ?"""
+    return sql, params
+
+
+async def search(db, match: str, kind: str | None, after: list | None, limit: int) -> tuple[list[dict], list | None]:
+    """返回 (结果列表, 下一页的排序键)；结果为 {kind, id, title, snippet, score}，title/snippet 已高亮"""
+    sql, params = query(match, kind, after, limit)
+    cursor = await db.execute(sql, params)
+    rows = await cursor.fetchall()
+    items = [
+        {
+            "kind": row["kind"],
+            "id": row["owner_id"],
+            "title": _display(row["title"]),
+            "snippet": _display(row["snippet"]),
+            "score": round(-row["score"], 4),
+        }
+        for row in rows[:limit]
+    ]
+    next_key = [rows[limit - 1]["score"], rows[limit - 1]["rowid"]] if len(rows) > limit else None
+    return items, next_key
+
+
+async def _backfill(db, kind: str, sql: str, batch_size: int, after: int) -> tuple[int, int]:
+    """为已有数据补建索引（sql 按 id 升序返回 id, title, summary, body），已在索引里的行先删再写"""
+    cursor = await db.execute(sql, (after, batch_size))
+    rows = await cursor.fetchall()
+    if not rows:
+        return 0, after
+    code = KINDS[kind]
+    await db.executemany("DELETE FROM search_index WHERE rowid=?", [(row[0] * 4 + code,) for row in rows])
+    await db.executemany(
+        "INSERT INTO search_index (rowid, kind, owner_id, title, summary, body) VALUES (?, ?, ?, ?, ?, ?)",
+        [
+            (row[0] * 4 + code, kind, row[0], search_text(row[1]), search_text(row[2]), search_text(row[3]))
+            for row in rows
+        ],
+    )
+    await db.commit()
+    return len(rows), rows[-1][0]
+
+
+async def backfill_articles(db, batch_size: int, after: int) -> tuple[int, int]:
+    return await _backfill(
+        db, "article",
+        """SELECT a.id, a.title, a.summary, COALESCE(a.content, body_text(b.data))
+           FROM articles a LEFT JOIN bodies b ON b.kind = 'article' AND b.owner_id = a.id
+           WHERE a.id > ? ORDER BY a.id LIMIT ?""",
+        batch_size, after,
+    )
+
+
+async def backfill_uploads(db, batch_size: int, after: int) -> tuple[int, int]:
+    return await _backfill(
+        db, "upload",
+        """SELECT f.id, f.title, f.ai_summary, COALESCE(f.content, body_text(b.data))
+           FROM uploaded_files f LEFT JOIN bodies b ON b.kind = 'upload' AND b.owner_id = f.id
+           WHERE f.id > ? ORDER BY f.id LIMIT ?""",
+        batch_size, after,
+    )
+
+
+async def backfill_hotspots(db, batch_size: int, after: int) -> tuple[int, int]:
+    return await _backfill(
+        db, "hotspot",
+        "SELECT id, title, NULL, content FROM hotspots WHERE id > ? ORDER BY id LIMIT ?",
+        batch_size, after,
+    )
@@ -0,0 +1,84 @@
+"""RSS 源健康度：记录成功/失败、耗时与最近错误，连续失败后熔断（指数退避）"""
+
+from datetime import datetime, timedelta
+from config import HEALTH_FAILURE_THRESHOLD, HEALTH_BACKOFF_BASE, HEALTH_BACKOFF_MAX
+
+LOAD_SQL = "SELECT * FROM source_health"
+
+_LATENCY_ALPHA = 0.3  # 平均耗时的指数滑动系数
+
+
+def _fmt(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%d %H:%M:%S")
+
+
+async def load_health(db) -> dict:
+    """读取所有源的健康记录 {url: row}"""
+    cursor = await db.execute(LOAD_SQL)
+    rows = await cursor.fetchall()
+    return {row["url"]: dict(row) for row in rows}
+
+
+def is_open(health: dict | None, now: str | None = None) -> bool:
+    """熔断是否生效（生效期间跳过该源）"""
+    if not health or not health.get("circuit_open_until"):
+        return False
+    return health["circuit_open_until"] > (now or _fmt(datetime.now()))
+
+
+def record(health: dict, source: dict, latency_ms: int, error: str | None) -> dict:
+    """根据一次抓取结果更新健康记录（原地修改并返回）"""
+    now = datetime.now()
+    health.setdefault("url", source["url"])
+    health["name"] = source.get("name")
+    health["last_latency_ms"] = latency_ms
+    avg = health.get("avg_latency_ms")
+    health["avg_latency_ms"] = latency_ms if avg is None else int(avg + _LATENCY_ALPHA * (latency_ms - avg))
+
+    if error is None:
+        health["success_count"] = (health.get("success_count") or 0) + 1
+        health["consecutive_failures"] = 0
+        health["last_success_at"] = _fmt(now)
+        health["circuit_open_until"] = None
+    else:
+        failures = (health.get("consecutive_failures") or 0) + 1
+        health["failure_count"] = (health.get("failure_count") or 0) + 1
+        health["consecutive_failures"] = failures
+        health["last_error"] = error[:500]
+        health["last_failure_at"] = _fmt(now)
+        if failures >= HEALTH_FAILURE_THRESHOLD:
+            backoff = min(HEALTH_BACKOFF_MAX, HEALTH_BACKOFF_BASE * 2 ** (failures - HEALTH_FAILURE_THRESHOLD))
+            health["circuit_open_until"] = _fmt(now + timedelta(seconds=backoff))
+    return health
+
+
+async def save_health(db, health: dict):
+    """写回一条健康记录（调用方负责 commit）"""
+    await db.execute(
+        """INSERT INTO source_health
+               (url, name, success_count, failure_count, consecutive_failures, last_latency_ms,
+                avg_latency_ms, last_error, last_success_at, last_failure_at, circuit_open_until)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+           ON CONFLICT(url) DO UPDATE SET
+               name=excluded.name,
+               success_count=excluded.success_count,
+               failure_count=excluded.failure_count,
+               consecutive_failures=excluded.consecutive_failures,
+               last_latency_ms=excluded.last_latency_ms,
+               avg_latency_ms=excluded.avg_latency_ms,
+               last_error=excluded.last_error,
+               last_success_at=excluded.last_success_at,
+               last_failure_at=excluded.last_failure_at,
+               circuit_open_until=excluded.circuit_open_until""",
+        (health["url"], health.get("name"), health.get("success_count") or 0,
+         health.get("failure_count") or 0, health.get("consecutive_failures") or 0,
+         health.get("last_latency_ms"), health.get("avg_latency_ms"), health.get("last_error"),
+         health.get("last_success_at"), health.get("last_failure_at"), health.get("circuit_open_until")),
+    )
+
+
+async def reset(db, url: str):
+    """手动关闭熔断"""
+    await db.execute(
+        "UPDATE source_health SET consecutive_failures=0, circuit_open_until=NULL WHERE url=?", (url,)
+    )
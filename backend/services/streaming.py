@@ -0,0 +1,73 @@
+"""AI 生成结果的流式推送（SSE）
+
+生成放在独立的后台任务里跑，请求只负责把任务发出的事件转给客户端：
+客户端中途断开时任务照常跑完、把完整结果写库，下次打开页面能看到；停机时等进行中的任务写完再退出。
+
+事件：delta —— 增量文本；done —— 最终结果（已写库）；error —— {detail}
+"""
+
+import asyncio
+import json
+from typing import Awaitable, Callable
+from fastapi.responses import StreamingResponse
+from config import STREAM_SHUTDOWN_GRACE
+
+# job(emit) -> done 事件的数据；emit(event, data) 推送一个事件
+Emit = Callable[[str, dict], None]
+
+_jobs: set[asyncio.Task] = set()
+
+
+def _event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def sse_job(job: Callable[[Emit], Awaitable[dict]]) -> StreamingResponse:
+    """在后台任务里运行 job，并把它推送的事件作为 SSE 响应返回。
+    job 不能使用请求的数据库连接（响应开始前就已归还），写库用 database.connection()"""
+    queue: asyncio.Queue[str | None] = asyncio.Queue()
+
+    def emit(event: str, data: dict):
+        queue.put_nowait(_event(event, data))
+
+    async def run():
+        try:
+            emit("done", await job(emit))
+        except Exception as e:
+            emit("error", {"detail": str(e) or type(e).__name__})
+        finally:
+            queue.put_nowait(None)
+
+    task = asyncio.create_task(run())
+    _jobs.add(task)
+    task.add_done_callback(_jobs.discard)
+
+    async def events():
+        # 客户端断开时这个生成器被关闭，任务不受影响
+        while (item := await queue.get()) is not None:
+            yield item
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def collect(chunks, emit: Emit, **fields) -> str:
+    """把流式生成的文本逐段作为 delta 推送（附带 fields），返回去掉首尾空白的完整文本"""
+    parts = []
+    async for chunk in chunks:
+        parts.append(chunk)
+        emit("delta", {**fields, "text": chunk})
+    return "".join(parts).strip()
+
+
+async def stop():
+    """停机时等待进行中的生成写库（最多 STREAM_SHUTDOWN_GRACE 秒），超时的取消（close_pool 之前）"""
+    if not _jobs:
+        return
+    _, pending = await asyncio.wait(set(_jobs), timeout=STREAM_SHUTDOWN_GRACE)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 测试直接导入 backend 下的模块（与 uvicorn 在 backend 目录启动时一致）
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,51 @@
+import asyncio
+
+import database
+from services import article_state
+
+
+def _run(tmp_path, monkeypatch, scenario):
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "test.db"))
+
+    async def main():
+        await database.init_db()
+        async with database.connection() as db:
+            await db.execute(
+                "INSERT INTO articles (id, title, summary, link, source, category, published_at)"
+                " VALUES (1, 't', 's', 'https://example.com/1', 'src', 'AI', '2026-10-05')"
+            )
+            await db.commit()
+        await scenario()
+        async with database.connection() as db:
+            cursor = await db.execute("SELECT is_favorite FROM articles WHERE id=1")
+            return (await cursor.fetchone())[0]
+
+    return asyncio.run(main())
+
+
+async def _read(flag):
+    async with database.connection() as db:
+        return await article_state.fetch_row(db, f"SELECT {flag} FROM articles WHERE id=1", ())
+
+
+def test_toggle_read_before_flush_commit_is_not_lost(tmp_path, monkeypatch):
+    async def scenario():
+        row, generation = await _read("is_favorite")
+        article_state.change(1, "is_favorite", 1, row[0], generation)
+        # 另一个请求在 flush 提交前读到了旧值 0……
+        stale, stale_generation = await _read("is_favorite")
+        await article_state.flush()
+        # ……flush 提交、在途写入清空后才记录“取消收藏”，不能被当成无变化丢掉
+        article_state.change(1, "is_favorite", 0, stale[0], stale_generation)
+        await article_state.flush()
+
+    assert _run(tmp_path, monkeypatch, scenario) == 0
+
+
+def test_unchanged_value_is_skipped(tmp_path, monkeypatch):
+    async def scenario():
+        row, generation = await _read("is_favorite")
+        article_state.change(1, "is_favorite", 0, row[0], generation)
+        assert not article_state.has_pending("is_favorite")
+
+    assert _run(tmp_path, monkeypatch, scenario) == 0
@@ -0,0 +1,75 @@
+import asyncio
+
+import database
+from services import ingestion
+
+
+def _article(link, title, summary):
+    return {
+        "title": title, "summary": summary, "content": summary, "link": link, "source": "src",
+        "category": "科技", "content_type": "文章", "published_at": "2026-10-05T08:00:00",
+    }
+
+
+OLD = _article("https://example.com/old", "Rust 编译器发布新版本", "借用检查器的报错信息大幅改进，增量编译速度提升三成")
+EDITED = _article("https://example.com/edited", "央行公布九月金融数据", "社会融资规模增量低于市场预期")
+
+
+def _run(tmp_path, monkeypatch, scenario):
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "test.db"))
+
+    async def main():
+        await database.init_db()
+        async with database.connection() as db:
+            await ingestion.store_articles(db, [OLD, EDITED])
+            return await scenario(db)
+
+    return asyncio.run(main())
+
+
+def _batch():
+    new = _article("https://example.com/new", "火星车发现古代河床痕迹", "探测器在陨石坑边缘拍到层状沉积岩，疑似曾有流水")
+    return [
+        new,
+        dict(new, title="同批重复"),  # 同一链接在批内第二次出现
+        OLD,  # 已存在且无变化
+        dict(EDITED, title="央行公布九月金融数据（更正）"),  # 已存在、标题有变化
+        # 去掉跟踪参数后与已有文章链接相同
+        _article("https://example.com/old?utm_source=rss", "完全不同的标题", "讲的是另一件关于天气预报模型的事情"),
+    ]
+
+
+def test_store_articles_counts(tmp_path, monkeypatch):
+    async def scenario(db):
+        result = await ingestion.store_articles(db, _batch())
+        cursor = await db.execute("SELECT id, link, title FROM articles ORDER BY id")
+        return result, [tuple(row) for row in await cursor.fetchall()]
+
+    result, rows = _run(tmp_path, monkeypatch, scenario)
+    assert {k: result[k] for k in ("inserted", "updated", "duplicates", "near_duplicates")} == {
+        "inserted": 1, "updated": 1, "duplicates": 2, "near_duplicates": 1,
+    }
+    assert rows == [
+        (1, OLD["link"], OLD["title"]),
+        (2, EDITED["link"], "央行公布九月金融数据（更正）"),
+        (3, "https://example.com/new", "火星车发现古代河床痕迹"),
+    ]
+    assert result["new_ids"] == [3]
+
+
+def test_caller_transaction_rollback_discards_writes(tmp_path, monkeypatch):
+    async def scenario(db):
+        await db.execute("BEGIN IMMEDIATE")
+        result = await ingestion.store_articles(db, _batch())
+        # 调用方开启的事务由调用方决定提交或回滚，store_articles 不能自己提交
+        assert db.in_transaction
+        await db.rollback()
+        cursor = await db.execute("SELECT link, title FROM articles ORDER BY id")
+        rows = [tuple(row) for row in await cursor.fetchall()]
+        cursor = await db.execute("SELECT COUNT(*) FROM article_simhash_bands WHERE article_id > 2")
+        return result, rows, (await cursor.fetchone())[0]
+
+    result, rows, bands = _run(tmp_path, monkeypatch, scenario)
+    assert result["inserted"] == 1 and result["updated"] == 1
+    assert rows == [(OLD["link"], OLD["title"]), (EDITED["link"], EDITED["title"])]
+    assert bands == 0
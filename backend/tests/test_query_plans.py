@@ -0,0 +1,45 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+import check_query_plans
+import database
+
+
+@pytest.fixture(scope="module")
+def conn(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("plans") / "plans.db")
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(database, "DB_PATH", path)
+        asyncio.run(database.init_db())
+    conn = sqlite3.connect(path)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture(scope="module")
+def partial(conn):
+    return check_query_plans.partial_indexes(conn)
+
+
+@pytest.mark.parametrize(
+    "sql, params, allow", [q[1:] for q in check_query_plans.QUERIES], ids=[q[0] for q in check_query_plans.QUERIES]
+)
+def test_query_plan(conn, partial, sql, params, allow):
+    plan, bad = check_query_plans.check(conn, sql, params, allow, partial)
+    assert not bad, " | ".join(plan)
+
+
+def test_filtered_scan_over_plain_index_is_flagged(conn, partial):
+    # 按 published_at 顺序走普通索引、再逐行过滤 title，计划里是 SCAN … USING INDEX，不能放过
+    sql = "SELECT id FROM articles WHERE title<>'' ORDER BY published_at DESC LIMIT 20"
+    plan, bad = check_query_plans.check(conn, sql, (), None, partial)
+    assert bad == ["SCAN articles USING INDEX idx_articles_published"], plan
+
+
+def test_partial_index_scan_is_allowed(conn, partial):
+    assert "idx_articles_read" in partial
+    sql = "SELECT id FROM articles WHERE is_read=1 ORDER BY published_at DESC LIMIT 20"
+    plan, bad = check_query_plans.check(conn, sql, (), None, partial)
+    assert bad == [], plan
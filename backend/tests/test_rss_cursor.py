@@ -0,0 +1,31 @@
+import feedparser
+from services import rss_service
+
+
+def _feed(*items):
+    xml = "".join(
+        f"<item><title>{guid}</title><link>https://example.com/{guid}</link>"
+        f"<guid>{guid}</guid><pubDate>{date}</pubDate></item>"
+        for guid, date in items
+    )
+    return feedparser.parse(f"<rss><channel>{xml}</channel></rss>")
+
+
+def test_same_day_entry_after_cursor_is_not_skipped():
+    # 只有日期的 pubDate：第二篇与游标条目时间戳相同
+    first, state = rss_service._new_entries(_feed(("a", "Mon, 05 Oct 2026")), {})
+    assert [e.id for e in first] == ["a"]
+
+    fresh, new_state = rss_service._new_entries(
+        _feed(("b", "Mon, 05 Oct 2026"), ("a", "Mon, 05 Oct 2026")), state
+    )
+    assert [e.id for e in fresh] == ["b"]
+    assert new_state["cursor_guid"] == "b"
+
+
+def test_backdated_entry_is_not_skipped():
+    _, state = rss_service._new_entries(_feed(("a", "Mon, 05 Oct 2026")), {})
+    fresh, _ = rss_service._new_entries(
+        _feed(("new", "Tue, 06 Oct 2026"), ("old", "Thu, 01 Oct 2026"), ("a", "Mon, 05 Oct 2026")), state
+    )
+    assert [e.id for e in fresh] == ["new", "old"]
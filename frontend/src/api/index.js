@@ -12,32 +12,93 @@ async function req(path, options = {}) {
     return res.json()
 }
 
+// POST 并按 SSE 读取流式响应（EventSource 只支持 GET）：每个 delta 事件调用 onDelta，返回 done 事件的数据
+async function postStream(path, body, onDelta) {
+    const res = await fetch(BASE + path, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(body),
+    })
+    if (!res.ok) {
+        const err = await res.json().catch(() => ({ detail: res.statusText }))
+        throw new Error(err.detail || '请求失败')
+    }
+    const reader = res.body.pipeThrough(new TextDecoderStream()).getReader()
+    let buffer = ''
+    while (true) {
+        const { value, done } = await reader.read()
+        if (done) break
+        buffer += value
+        let end
+        while ((end = buffer.indexOf('\n\n')) >= 0) {
+            const block = buffer.slice(0, end)
+            buffer = buffer.slice(end + 2)
+            const event = block.match(/^event: (.*)$/m)?.[1]
+            const data = JSON.parse(block.match(/^data: (.*)$/m)?.[1] || '{}')
+            if (event === 'delta') onDelta && onDelta(data)
+            else if (event === 'done') return data
+            else if (event === 'error') throw new Error(data.detail || '生成失败')
+        }
+    }
+    throw new Error('连接中断')
+}
+
 // 文章
 export const api = {
     // 文章模块
-    getArticles: (category = '全部', contentType = '全部', status = '全部') =>
-        req(`/articles?category=${encodeURIComponent(category)}&content_type=${encodeURIComponent(contentType)}&status=${encodeURIComponent(status)}`),
+    // 列表接口按游标分页，返回 { items, next_cursor }，next_cursor 为 null 表示没有更多
+    getArticles: (category = '全部', contentType = '全部', status = '全部', cursor = null) =>
+        req(`/articles?category=${encodeURIComponent(category)}&content_type=${encodeURIComponent(contentType)}&status=${encodeURIComponent(status)}${cursor ? `&cursor=${encodeURIComponent(cursor)}` : ''}`),
     refreshArticles: () =>
         req('/articles/refresh', { method: 'POST', body: JSON.stringify({}) }),
+    // 流式刷新：逐源推送进度，返回 EventSource（调用方负责 close）
+    refreshArticlesStream: ({ onSource, onDone, onError }) => {
+        const es = new EventSource(BASE + '/articles/refresh/stream')
+        es.addEventListener('source', (e) => onSource && onSource(JSON.parse(e.data)))
+        es.addEventListener('done', (e) => {
+            es.close()
+            onDone && onDone(JSON.parse(e.data))
+        })
+        es.onerror = () => {
+            es.close()
+            onError && onError(new Error('连接中断'))
+        }
+        return es
+    },
     getArticle: (id) => req(`/articles/${id}`),
     toggleFavorite: (id) =>
         req(`/articles/${id}/favorite`, { method: 'POST', body: JSON.stringify({}) }),
-    getFavorites: () => req('/articles/favorites'),
+    getFavorites: (cursor = null) =>
+        req(`/articles/favorites${cursor ? `?cursor=${encodeURIComponent(cursor)}` : ''}`),
     translateArticle: (id) =>
         req(`/articles/${id}/translate`, { method: 'POST', body: JSON.stringify({}) }),
-    getReadLater: () => req('/articles/read-later'),
+    // 流式翻译：onDelta({ text }) 逐段返回译文，resolve 为 { translated_content }
+    translateArticleStream: (id, onDelta) => postStream(`/articles/${id}/translate/stream`, {}, onDelta),
+    getReadLater: (cursor = null) =>
+        req(`/articles/read-later${cursor ? `?cursor=${encodeURIComponent(cursor)}` : ''}`),
     markRead: (id) => req(`/articles/${id}/read`, { method: 'POST', body: JSON.stringify({}) }),
     toggleReadLater: (id) =>
         req(`/articles/${id}/read-later`, { method: 'POST', body: JSON.stringify({}) }),
     deleteArticle: (id) =>
         req(`/articles/${id}`, { method: 'DELETE' }),
 
+    // 全文搜索：kind 为 全部 / article / upload / hotspot，返回 { items, next_cursor }，
+    // items 的 title / snippet 已转义，命中词用 <mark> 包裹
+    search: (q, kind = '全部', cursor = null) =>
+        req(`/search?q=${encodeURIComponent(q)}&kind=${encodeURIComponent(kind)}${cursor ? `&cursor=${encodeURIComponent(cursor)}` : ''}`),
+
     // 自定义 RSS 订阅
     getCustomSources: () => req('/custom-sources'),
     addCustomSource: (data) =>
         req('/custom-sources', { method: 'POST', body: JSON.stringify(data) }),
     deleteCustomSource: (id) =>
         req(`/custom-sources/${id}`, { method: 'DELETE' }),
+    importOpml: (formData) =>
+        fetch(BASE + '/custom-sources/opml', { method: 'POST', body: formData }).then((r) => {
+            if (!r.ok) return r.json().then((e) => { throw new Error(e.detail) })
+            return r.json()
+        }),
+    exportOpmlUrl: () => BASE + '/custom-sources/opml',
 
     // Auth
     register: (data) => req('/auth/register', { method: 'POST', body: JSON.stringify(data) }),
@@ -51,6 +112,9 @@ export const api = {
             method: 'POST',
             body: JSON.stringify({ article_id: articleId, original_text: originalText }),
         }),
+    // 流式总结：onDelta({ field: 'ai_optimized' | 'ai_direct', text })，resolve 为保存后的总结
+    createSummaryStream: (articleId, originalText, onDelta) =>
+        postStream('/summaries/stream', { article_id: articleId, original_text: originalText }, onDelta),
     getArticleSummaries: (articleId) => req(`/summaries/article/${articleId}`),
     deleteSummary: (id) => req(`/summaries/${id}`, { method: 'DELETE' }),
 
@@ -79,6 +143,9 @@ export const api = {
             method: 'POST',
             body: JSON.stringify({ content }),
         }),
+    // 流式回复：onDelta({ text })，resolve 为 { role, content }
+    sendFeynmanMessageStream: (sessionId, content, onDelta) =>
+        postStream(`/feynman/sessions/${sessionId}/messages/stream`, { content }, onDelta),
 
     // 热点
     getHotspots: (platform = '全部', category = 'today') =>
@@ -0,0 +1,31 @@
+import { ref } from 'vue'
+
+// 游标分页列表：fetchPage(cursor) 返回 { items, next_cursor }；keyOf 取条目的唯一键，用于追加时去重
+export function useCursorList(fetchPage, keyOf = (a) => a.id) {
+    const items = ref([])
+    const nextCursor = ref(null)
+    const loadingMore = ref(false)
+
+    // 从第一页重新加载
+    async function reload() {
+        const page = await fetchPage(null)
+        items.value = page.items
+        nextCursor.value = page.next_cursor
+    }
+
+    // 追加下一页
+    async function loadMore() {
+        if (!nextCursor.value || loadingMore.value) return
+        loadingMore.value = true
+        try {
+            const page = await fetchPage(nextCursor.value)
+            const seen = new Set(items.value.map(keyOf))
+            items.value.push(...page.items.filter(a => !seen.has(keyOf(a))))
+            nextCursor.value = page.next_cursor
+        } finally {
+            loadingMore.value = false
+        }
+    }
+
+    return { items, nextCursor, loadingMore, reload, loadMore }
+}
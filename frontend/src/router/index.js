@@ -20,6 +20,7 @@ const routes = [
     { path: '/hotspots/:id', component: HotspotDetail },
     { path: '/favorites', component: Favorites },
     { path: '/read-later', component: ReadLater },
+    { path: '/search', component: () => import('../views/Search.vue') },
     { path: '/settings', component: Settings },
 ]
 